@@ -0,0 +1,182 @@
+"""Admission control and load shedding by route class.
+
+Every endpoint belongs to a priority class, set next to the route with
+``@route_class(name)`` (``default`` when it has none). Each class has its
+own concurrency limit, so a burst of searches can only hold the ``bulk``
+slots, and its own maximum queue wait.
+Queue wait is tracked per class as a time-decayed moving average. Once a
+higher-priority class waits longer than ``ADMISSION_TARGET_MS``, lower
+classes are refused straight away with a 503 and ``Retry-After``, leaving
+the workers to the traffic that matters.
+
+Limits apply per process. Stats are served from ``/admission/stats``.
+"""
+import math
+import threading
+import time
+
+from flask import g, jsonify, request
+
+PRIORITIES = ('critical', 'default', 'bulk')  # highest first
+
+# Never queued or shed
+EXEMPT = frozenset({'static', 'get_admission_stats'})
+
+DECAY_SECONDS = 5.0  # how quickly a class's wait average forgets old waits
+
+
+def route_class(name):
+    """Route decorator: priority class for this endpoint.
+
+    ``critical`` for cheap calls users are actively waiting on, ``bulk`` for
+    expensive or crawler-heavy reads. Place it directly below ``@app.route``.
+    """
+    if name not in PRIORITIES:
+        raise ValueError(f"unknown route class {name!r}, expected one of {PRIORITIES}")
+
+    def decorate(view):
+        view.admission_class = name
+        return view
+    return decorate
+
+
+class RouteClass:
+    """Concurrency slots, wait tracking and counters for one priority class"""
+
+    def __init__(self, name, limit, max_wait_ms):
+        self.name = name
+        self.limit = limit
+        self.max_wait = max_wait_ms / 1000.0
+        self._slots = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self._wait_avg = 0.0
+        self._wait_at = time.monotonic()
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.shed = 0
+        self.timed_out = 0
+        self.max_wait_seen = 0.0
+
+    def wait_avg(self, now=None):
+        """Average queue wait in seconds, decayed for the time since the last sample"""
+        now = now or time.monotonic()
+        with self._lock:
+            return self._wait_avg * math.exp(-(now - self._wait_at) / DECAY_SECONDS)
+
+    def _observe(self, wait):
+        now = time.monotonic()
+        with self._lock:
+            decayed = self._wait_avg * math.exp(-(now - self._wait_at) / DECAY_SECONDS)
+            self._wait_avg = 0.8 * decayed + 0.2 * wait
+            self._wait_at = now
+            self.max_wait_seen = max(self.max_wait_seen, wait)
+
+    def acquire(self):
+        """Wait for a slot; returns False if none freed up within max_wait"""
+        with self._lock:
+            self.queued += 1
+        started = time.monotonic()
+        got = self._slots.acquire(timeout=self.max_wait)
+        wait = time.monotonic() - started
+        self._observe(wait)
+        with self._lock:
+            self.queued -= 1
+            if got:
+                self.in_flight += 1
+                self.admitted += 1
+            else:
+                self.timed_out += 1
+        return got
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def count_shed(self):
+        with self._lock:
+            self.shed += 1
+
+    def stats(self):
+        wait = self.wait_avg()
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "in_flight": self.in_flight,
+                "queued": self.queued,
+                "admitted": self.admitted,
+                "shed": self.shed,
+                "timed_out": self.timed_out,
+                "wait_avg_ms": round(wait * 1000, 3),
+                "wait_max_ms": round(self.max_wait_seen * 1000, 3),
+            }
+
+
+def _parse_limits(value):
+    """'critical=64,bulk=8' -> {'critical': 64, 'bulk': 8}"""
+    limits = {}
+    for part in (value or '').split(','):
+        name, _, number = part.partition('=')
+        if name.strip() in PRIORITIES and number.strip().isdigit():
+            limits[name.strip()] = int(number)
+    return limits
+
+
+def _overloaded_above(classes, name, target):
+    """True if a class with higher priority than ``name`` is over its wait target"""
+    now = time.monotonic()
+    for higher in PRIORITIES[:PRIORITIES.index(name)]:
+        if classes[higher].wait_avg(now) > target:
+            return True
+    # The lowest class also sheds on its own queueing
+    return name == PRIORITIES[-1] and classes[name].wait_avg(now) > target
+
+
+def _unavailable(route_class, retry_after):
+    response = jsonify({"message": "Server busy, retry shortly", "class": route_class.name})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+
+def register_admission(app):
+    """Queue and shed requests by route class; call before registering routes"""
+    if not app.config['ADMISSION_CONTROL']:
+        return
+
+    limits = {'critical': 64, 'default': 32, 'bulk': 8}
+    limits.update(_parse_limits(app.config['ADMISSION_LIMITS']))
+    max_waits = {'critical': 2000, 'default': 1000, 'bulk': 250}
+    max_waits.update(_parse_limits(app.config['ADMISSION_MAX_WAIT_MS']))
+    classes = {name: RouteClass(name, limits[name], max_waits[name]) for name in PRIORITIES}
+    target = app.config['ADMISSION_TARGET_MS'] / 1000.0
+
+    @app.before_request
+    def admit():
+        endpoint = request.endpoint
+        # CORS preflights are answered without touching the app
+        if endpoint is None or endpoint in EXEMPT or request.method == 'OPTIONS':
+            return
+        view = app.view_functions.get(endpoint)
+        route_class = classes[getattr(view, 'admission_class', 'default')]
+        if _overloaded_above(classes, route_class.name, target):
+            route_class.count_shed()
+            return _unavailable(route_class, 1)
+        if not route_class.acquire():
+            return _unavailable(route_class, max(1, math.ceil(route_class.max_wait)))
+        g.admission_class = route_class
+
+    @app.teardown_request
+    def release(exc):
+        route_class = g.pop('admission_class', None)
+        if route_class is not None:
+            route_class.release()
+
+    @app.route("/admission/stats", methods=["GET"])
+    def get_admission_stats():
+        """Per-class queue metrics for this worker process"""
+        return jsonify({
+            "target_ms": app.config['ADMISSION_TARGET_MS'],
+            "classes": {name: classes[name].stats() for name in PRIORITIES},
+        })
@@ -0,0 +1,202 @@
+"""Optional ASGI deployment with an asyncio read path.
+
+``uvicorn asgi:app`` serves the hot public reads below from an event loop,
+using async SQLAlchemy over an asyncpg pool. A request holds a database
+connection only while its queries run, never while a slow client sends or
+reads, so one process can keep thousands of connections open. Every other
+request, including all writes and authenticated routes, goes to the regular
+Flask app through asgiref's WSGI adapter, which runs it in a thread pool.
+
+The async handlers share the models and serializers of the sync routes, so
+both deployments return identical bodies. Each handler is named after its
+Flask endpoint and gets the same statement timeout (``@statement_timeout``
+or ``STATEMENT_TIMEOUTS``), applied with ``SET LOCAL`` on Postgres. Timeouts
+answer 504 and pool exhaustion 503, counted in ``/timeouts/stats``. The async
+path skips the Flask-only layers: the per-worker read cache, admission control,
+profiling and cancellation on client disconnect.
+
+Needs ``pip install uvicorn asgiref "sqlalchemy[asyncio]" asyncpg`` (and
+``aiosqlite`` for a SQLite ``DATABASE_URL``). None of these are imported by
+the Flask app itself.
+"""
+import json
+import re
+from urllib.parse import parse_qs
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeout
+from sqlalchemy.orm import selectinload
+from app import create_app
+from app.models import Blog, Comment, Question, Tag
+from app.readcache import question_payload
+from app.routes import blog_summary, comment_tree, search_results
+from app.timeouts import is_query_canceled
+
+
+def async_database_url(url):
+    """The same database through an asyncio driver"""
+    for sync, driver in (('postgresql+psycopg2://', 'postgresql+asyncpg://'),
+                         ('postgresql+psycopg://', 'postgresql+asyncpg://'),
+                         ('postgresql://', 'postgresql+asyncpg://'),
+                         ('postgres://', 'postgresql+asyncpg://'),
+                         ('sqlite://', 'sqlite+aiosqlite://')):
+        if url.startswith(sync):
+            return driver + url[len(sync):]
+    return url
+
+
+# -------------------- Handlers --------------------
+# Each takes (session, params, query) and returns (status, body)
+
+async def get_blogs(session, params, query):
+    blogs = await session.scalars(
+        select(Blog).options(selectinload(Blog.author), selectinload(Blog.tags))
+    )
+    return 200, [blog_summary(b) for b in blogs]
+
+
+async def get_question(session, params, query):
+    q = await session.get(Question, int(params['id']), options=[selectinload(Question.author)])
+    if q is None:
+        return 404, {"message": "Question not found"}
+    return 200, question_payload(q)
+
+
+async def get_comments(session, params, query):
+    q = await session.get(Question, int(params['qid']))
+    if q is None:
+        return 404, {"message": "Question not found"}
+    comments = (await session.scalars(
+        select(Comment).options(selectinload(Comment.author))
+        .where(Comment.question_id == q.id, Comment.created_at >= q.created_at)
+        .order_by(Comment.id)
+    )).all()
+    return 200, comment_tree(comments)
+
+
+async def search(session, params, query):
+    q = query.get("q", [""])[0]
+    if not q:
+        return 400, {"message": "Query parameter 'q' required"}
+    questions = (await session.scalars(
+        select(Question).options(selectinload(Question.author))
+        .where(Question.title.ilike(f"%{q}%") | Question.description.ilike(f"%{q}%"))
+    )).all()
+    blogs = (await session.scalars(
+        select(Blog).options(selectinload(Blog.author))
+        .where(Blog.title.ilike(f"%{q}%") | Blog.content.ilike(f"%{q}%"))
+    )).all()
+    return 200, search_results(questions, blogs)
+
+
+async def get_tags(session, params, query):
+    tags = await session.scalars(select(Tag))
+    return 200, [{"id": t.id, "name": t.name} for t in tags]
+
+
+ROUTES = [
+    (re.compile(r'^/blogs$'), get_blogs),
+    (re.compile(r'^/questions/(?P<id>\d+)$'), get_question),
+    (re.compile(r'^/questions/(?P<qid>\d+)/comments$'), get_comments),
+    (re.compile(r'^/search$'), search),
+    (re.compile(r'^/tags$'), get_tags),
+]
+
+
+# -------------------- ASGI App --------------------
+
+def _cors_headers(scope, allowed_origins):
+    origin = dict(scope['headers']).get(b'origin', b'').decode('latin-1')
+    if origin not in allowed_origins:
+        return []
+    return [
+        (b'access-control-allow-origin', origin.encode('latin-1')),
+        (b'access-control-allow-credentials', b'true'),
+        (b'vary', b'Origin'),
+    ]
+
+
+def create_asgi_app():
+    from asgiref.wsgi import WsgiToAsgi
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    flask_app = create_app()
+    config = flask_app.config
+    engine = create_async_engine(
+        async_database_url(config['SQLALCHEMY_DATABASE_URI']),
+        pool_size=config['ASYNC_POOL_SIZE'],
+        max_overflow=config['ASYNC_POOL_OVERFLOW'],
+        pool_timeout=config['ASYNC_POOL_TIMEOUT'],
+        pool_pre_ping=True,
+    )
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    postgres = engine.dialect.name == 'postgresql'
+    limits = flask_app.extensions['studenthub.timeouts']
+
+    async def run(handler, params, query):
+        """(status, body, extra headers) of a handler, with the sync route's limits"""
+        endpoint = handler.__name__
+        try:
+            async with sessions() as session:
+                ms = limits.timeout_for(endpoint)
+                if ms and postgres:
+                    # SET LOCAL for the transaction the handler's queries run in
+                    await session.execute(select(func.set_config('statement_timeout', str(ms), True)))
+                status, body = await handler(session, params, query)
+            return status, body, []
+        except PoolTimeout as e:
+            limits.count(endpoint, "pool_timeouts")
+            print(f"Connection pool exhausted in {endpoint}: {e}")
+            return 503, {"message": "Database busy, retry shortly"}, [(b'retry-after', b'1')]
+        except DBAPIError as e:
+            if not is_query_canceled(e):
+                raise
+            limits.count(endpoint, "statement_timeouts")
+            print(f"Statement timeout in {endpoint} ({limits.timeout_for(endpoint)} ms)")
+            return 504, {"message": "The database took too long to answer"}, []
+    # The same origins the Flask app's CORS setup allows
+    allowed_origins = frozenset(config['CORS_ORIGINS'])
+    fallback = WsgiToAsgi(flask_app)
+
+    async def app(scope, receive, send):
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    await engine.dispose()
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+
+        if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD'):
+            for pattern, handler in ROUTES:
+                match = pattern.match(scope['path'])
+                if match:
+                    query = parse_qs(scope['query_string'].decode('latin-1'))
+                    try:
+                        status, body, headers = await run(handler, match.groupdict(), query)
+                    except Exception as e:
+                        print(f"Async read error ({scope['path']}): {e}")
+                        status, body, headers = 500, {"message": "Internal Server Error"}, []
+                    # Byte-for-byte what Flask's jsonify produces
+                    payload = (json.dumps(body, sort_keys=True, separators=(',', ':')) + '\n').encode()
+                    await send({
+                        'type': 'http.response.start',
+                        'status': status,
+                        'headers': [
+                            (b'content-type', b'application/json'),
+                            (b'content-length', str(len(payload)).encode()),
+                            *headers,
+                            *_cors_headers(scope, allowed_origins),
+                        ],
+                    })
+                    await send({
+                        'type': 'http.response.body',
+                        'body': b'' if scope['method'] == 'HEAD' else payload,
+                    })
+                    return
+
+        await fallback(scope, receive, send)
+
+    return app
@@ -1,12 +1,16 @@
 import os
 import random
+import re
 import string
 from datetime import datetime, timedelta
 from flask import request, jsonify, redirect, url_for
 from flask_login import login_user, logout_user, current_user
-from flask_mail import Message
 from werkzeug.security import generate_password_hash, check_password_hash
-from app import db, mail, oauth
+from sqlalchemy.exc import IntegrityError
+from app import avatars, db, hotqueries
+from app.admission import route_class
+from app.outbox import record
+from app.providers import get_mail, get_oauth_client
 from app.models import User, OTPVerification
 
 
@@ -18,6 +22,8 @@ def generate_otp():
 def send_otp_email(email, otp):
     """Send OTP to user's email"""
     try:
+        from flask_mail import Message
+        mail = get_mail()  # registers the extension Message reads its default sender from
         msg = Message(
             subject='StudentHub - Verify Your Email',
             recipients=[email],
@@ -40,6 +46,59 @@ def send_otp_email(email, otp):
         return False
 
 
+def unique_username(base):
+    """Return base, or base<N> with the smallest free N, using a single query"""
+    escaped = base.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    taken = {
+        name for (name,) in db.session.query(User.username)
+        .filter(User.username.like(f"{escaped}%", escape='\\'))
+    }
+    if base not in taken:
+        return base
+
+    # Only the names this function generates: ASCII digits, no leading zero
+    # ('john²' and 'john007' don't claim a suffix)
+    suffixes = {
+        int(name[len(base):]) for name in taken
+        if re.fullmatch(r'[1-9][0-9]*', name[len(base):])
+    }
+    counter = 1
+    while counter in suffixes:
+        counter += 1
+    return f"{base}{counter}"
+
+
+def sync_avatar(user, url):
+    """Store a provider avatar URL that changed; the proxy cache is refreshed
+    in the background from the outbox (see app/avatars.py)"""
+    if not url or url == user.avatar_url:
+        return
+    user.avatar_url = url
+    record("user.avatar_changed", user.id)
+    db.session.commit()
+
+
+def create_oauth_user(base_username, **fields):
+    """Create an OAuth user under a free username.
+
+    Two concurrent signups can pick the same name; the unique constraint
+    settles it and the loser retries with a freshly allocated suffix.
+    """
+    for _ in range(5):
+        user = User(username=unique_username(base_username), **fields)
+        try:
+            with db.session.begin_nested():
+                db.session.add(user)
+            db.session.commit()
+            return user
+        except IntegrityError:
+            # The same account may have been created by a parallel callback
+            existing = hotqueries.user_by_email(fields['email'])
+            if existing:
+                return existing
+    raise RuntimeError(f"Could not allocate a username for {base_username!r}")
+
+
 def register_auth_routes(app):
     """Register authentication routes"""
 
@@ -48,6 +107,7 @@ def register_auth_routes(app):
     # -------------------- Email OTP Routes --------------------
 
     @app.route("/auth/send-otp", methods=["POST"])
+    @route_class('critical')
     def send_otp():
         """Send OTP to email for verification"""
         data = request.json
@@ -57,7 +117,7 @@ def register_auth_routes(app):
             return jsonify({"error": "Email is required"}), 400
 
         # Check if email already registered
-        existing_user = User.query.filter_by(email=email).first()
+        existing_user = hotqueries.email_status(email)
         if existing_user and existing_user.email_verified:
             return jsonify({"error": "Email already registered"}), 400
 
@@ -84,6 +144,7 @@ def register_auth_routes(app):
             return jsonify({"error": "Failed to send OTP. Check email configuration."}), 500
 
     @app.route("/auth/verify-otp", methods=["POST"])
+    @route_class('critical')
     def verify_otp():
         """Verify OTP and complete signup"""
         data = request.json
@@ -141,23 +202,26 @@ def register_auth_routes(app):
     # -------------------- OAuth Routes --------------------
 
     @app.route("/auth/github")
+    @route_class('critical')
     def github_login():
         """Initiate GitHub OAuth"""
         redirect_uri = url_for('github_callback', _external=True)
-        return oauth.github.authorize_redirect(redirect_uri)
+        return get_oauth_client('github').authorize_redirect(redirect_uri)
 
     @app.route("/auth/github/callback")
+    @route_class('critical')
     def github_callback():
         """Handle GitHub OAuth callback"""
         try:
-            token = oauth.github.authorize_access_token()
-            resp = oauth.github.get('user', token=token)
+            github = get_oauth_client('github')
+            token = github.authorize_access_token()
+            resp = github.get('user', token=token)
             profile = resp.json()
 
             # Get email (might need separate request)
             email = profile.get('email')
             if not email:
-                emails_resp = oauth.github.get('user/emails', token=token)
+                emails_resp = github.get('user/emails', token=token)
                 emails = emails_resp.json()
                 primary_email = next((e for e in emails if e.get('primary')), None)
                 email = primary_email['email'] if primary_email else None
@@ -166,28 +230,18 @@ def register_auth_routes(app):
                 return redirect(f"{FRONTEND_URL}/login?error=no_email")
 
             # Find or create user
-            user = User.query.filter_by(email=email).first()
+            user = hotqueries.user_by_email(email)
 
             if not user:
                 # Create new user
-                username = profile.get('login', email.split('@')[0])
-                # Ensure unique username
-                base_username = username
-                counter = 1
-                while User.query.filter_by(username=username).first():
-                    username = f"{base_username}{counter}"
-                    counter += 1
-
-                user = User(
-                    username=username,
+                user = create_oauth_user(
+                    profile.get('login', email.split('@')[0]),
                     email=email,
                     oauth_provider='github',
                     oauth_id=str(profile.get('id')),
-                    avatar_url=profile.get('avatar_url'),
                     email_verified=True
                 )
-                db.session.add(user)
-                db.session.commit()
+            sync_avatar(user, profile.get('avatar_url'))
 
             login_user(user)
             return redirect(f"{FRONTEND_URL}?login=success")
@@ -197,16 +251,18 @@ def register_auth_routes(app):
             return redirect(f"{FRONTEND_URL}/login?error=oauth_failed")
 
     @app.route("/auth/google")
+    @route_class('critical')
     def google_login():
         """Initiate Google OAuth"""
         redirect_uri = url_for('google_callback', _external=True)
-        return oauth.google.authorize_redirect(redirect_uri)
+        return get_oauth_client('google').authorize_redirect(redirect_uri)
 
     @app.route("/auth/google/callback")
+    @route_class('critical')
     def google_callback():
         """Handle Google OAuth callback"""
         try:
-            token = oauth.google.authorize_access_token()
+            token = get_oauth_client('google').authorize_access_token()
             user_info = token.get('userinfo')
 
             if not user_info:
@@ -217,28 +273,18 @@ def register_auth_routes(app):
                 return redirect(f"{FRONTEND_URL}/login?error=no_email")
 
             # Find or create user
-            user = User.query.filter_by(email=email).first()
+            user = hotqueries.user_by_email(email)
 
             if not user:
                 # Create new user
-                username = user_info.get('name', email.split('@')[0]).replace(' ', '_').lower()
-                # Ensure unique username
-                base_username = username
-                counter = 1
-                while User.query.filter_by(username=username).first():
-                    username = f"{base_username}{counter}"
-                    counter += 1
-
-                user = User(
-                    username=username,
+                user = create_oauth_user(
+                    user_info.get('name', email.split('@')[0]).replace(' ', '_').lower(),
                     email=email,
                     oauth_provider='google',
                     oauth_id=user_info.get('sub'),
-                    avatar_url=user_info.get('picture'),
                     email_verified=True
                 )
-                db.session.add(user)
-                db.session.commit()
+            sync_avatar(user, user_info.get('picture'))
 
             login_user(user)
             return redirect(f"{FRONTEND_URL}?login=success")
@@ -250,6 +296,7 @@ def register_auth_routes(app):
     # -------------------- Session Check --------------------
 
     @app.route("/auth/me")
+    @route_class('critical')
     def get_current_user():
         """Get current logged-in user"""
         if current_user.is_authenticated:
@@ -259,6 +306,7 @@ def register_auth_routes(app):
                     "username": current_user.username,
                     "email": current_user.email,
                     "avatar_url": current_user.avatar_url,
+                    "avatar": avatars.avatar_path(current_user),
                     "oauth_provider": current_user.oauth_provider
                 }
             })
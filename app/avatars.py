@@ -0,0 +1,341 @@
+"""Local avatar proxy with resized thumbnails.
+
+``/avatars/<user_id>`` serves a user's OAuth avatar as a square PNG
+thumbnail in one of the fixed ``AVATAR_SIZES``. Clients no longer load the
+provider's full-size image on every page.
+
+The source is fetched once per URL. Concurrent requests for the same URL
+share one fetch. All sizes are made in one job on a process pool, so
+decoding and resampling don't hold the web worker's GIL. Files are
+content-addressed under ``AVATAR_DIR``:
+
+    blobs/ab/<sha256 of source>-<size>.png   thumbnails, shared by equal sources
+    refs/cd/<sha256 of url>                  the source digest for a URL
+
+Every worker on the host can share the cache. It is bounded by
+``AVATAR_CACHE_MAX_MB``: the least recently served thumbnails (by mtime,
+touched at most hourly) are evicted first. A ref whose blobs were evicted
+is simply a miss.
+
+The OAuth callbacks record ``user.avatar_changed`` when a provider returns
+a new URL. The outbox consumer only notes the URL. Once the dispatch
+transaction commits, the fetch and resize are handed to a background
+thread, so a slow avatar host never holds the outbox batch's row locks or
+its pooled connection. A refresh that fails there is not retried by the
+outbox. The first request for the avatar then builds it instead.
+"""
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+MAX_PIXELS = 40_000_000  # refuse decompression bombs before resampling
+TOUCH_INTERVAL = 3600  # seconds between LRU mtime updates of a served file
+FAILURE_TTL = 300  # seconds a failed source isn't refetched
+
+_lock = threading.Lock()
+_pending = {}
+_failures = {}
+
+
+class AvatarError(Exception):
+    pass
+
+
+# -------------------- Thumbnails (process pool) --------------------
+
+def make_thumbnails(data, sizes):
+    """Square PNG thumbnails of an image, one per size; runs in a pool process"""
+    from PIL import Image, ImageOps
+
+    image = Image.open(io.BytesIO(data))
+    if image.width * image.height > MAX_PIXELS:
+        raise ValueError(f"image too large: {image.width}x{image.height}")
+    image = ImageOps.exif_transpose(image).convert('RGBA')
+    thumbs = {}
+    for size in sizes:
+        out = io.BytesIO()
+        ImageOps.fit(image, (size, size), Image.LANCZOS).save(out, 'PNG', optimize=True)
+        thumbs[size] = out.getvalue()
+    return thumbs
+
+
+def get_pool():
+    """This process's thumbnail pool, started on first use"""
+    app = current_app._get_current_object()
+    pool = app.extensions.get('studenthub.avatar_pool')
+    if pool is None:
+        with _lock:
+            pool = app.extensions.get('studenthub.avatar_pool')
+            if pool is None:
+                # Spawned, not forked: forking a threaded web worker can copy held locks
+                pool = app.extensions['studenthub.avatar_pool'] = ProcessPoolExecutor(
+                    app.config['AVATAR_WORKERS'], mp_context=multiprocessing.get_context('spawn')
+                )
+    return pool
+
+
+# -------------------- Disk Cache --------------------
+
+class AvatarStore:
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._bytes = None  # running total, scanned on first write
+        self._lock = threading.Lock()
+
+    def blob_path(self, digest, size):
+        return os.path.join(self.root, 'blobs', digest[:2], f"{digest}-{size}.png")
+
+    def _ref_path(self, url):
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return os.path.join(self.root, 'refs', key[:2], key)
+
+    def lookup(self, url, size):
+        """(digest, path) of a cached thumbnail for ``url``, or None"""
+        try:
+            with open(self._ref_path(url)) as f:
+                digest = f.read().strip()
+            path = self.blob_path(digest, size)
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return None
+        if time.time() - mtime > TOUCH_INTERVAL:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        return digest, path
+
+    def has_all(self, digest, sizes):
+        return all(os.path.exists(self.blob_path(digest, size)) for size in sizes)
+
+    def _write(self, path, data):
+        """Write atomically so concurrent workers never serve a torn file"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def put(self, url, digest, thumbs):
+        written = 0
+        for size, data in thumbs.items():
+            self._write(self.blob_path(digest, size), data)
+            written += len(data)
+        self.link(url, digest)
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = self._scan()[1]
+            else:
+                self._bytes += written
+            over = self._bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def link(self, url, digest):
+        self._write(self._ref_path(url), digest.encode())
+
+    def _scan(self):
+        files, total = [], 0
+        for dirpath, _, names in os.walk(os.path.join(self.root, 'blobs')):
+            for name in names:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        return files, total
+
+    def evict(self):
+        """Drop least recently served thumbnails until 90% of the budget"""
+        with self._lock:
+            files, total = self._scan()
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes * 0.9:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+            self._bytes = total
+
+
+def get_store():
+    app = current_app._get_current_object()
+    store = app.extensions.get('studenthub.avatar_store')
+    if store is None:
+        with _lock:
+            store = app.extensions.get('studenthub.avatar_store')
+            if store is None:
+                store = app.extensions['studenthub.avatar_store'] = AvatarStore(
+                    app.config['AVATAR_DIR'], app.config['AVATAR_CACHE_MAX_MB'] * 1024 * 1024
+                )
+    return store
+
+
+# -------------------- Fetching --------------------
+
+def allowed_source(url, hosts):
+    """Only http(s) URLs on a configured host (or a subdomain of one)"""
+    parts = urlsplit(url)
+    host = (parts.hostname or '').lower()
+    return parts.scheme in ('http', 'https') and any(
+        host == allowed or host.endswith('.' + allowed) for allowed in hosts
+    )
+
+
+def fetch_source(url):
+    import requests
+
+    config = current_app.config
+    if not allowed_source(url, config['AVATAR_ALLOWED_HOSTS']):
+        raise AvatarError(f"avatar host not allowed: {url}")
+    limit = config['AVATAR_MAX_SOURCE_BYTES']
+    # Redirects aren't followed: they could lead off the allowed hosts
+    with requests.get(url, timeout=config['AVATAR_FETCH_TIMEOUT'], stream=True,
+                      allow_redirects=False) as resp:
+        if resp.status_code != 200:
+            raise AvatarError(f"avatar source answered {resp.status_code}")
+        if not resp.headers.get('Content-Type', '').startswith('image/'):
+            raise AvatarError(f"not an image: {resp.headers.get('Content-Type')}")
+        data = bytearray()
+        for chunk in resp.iter_content(64 * 1024):
+            data += chunk
+            if len(data) > limit:
+                raise AvatarError(f"avatar larger than {limit} bytes")
+    return bytes(data)
+
+
+def _build(url):
+    config = current_app.config
+    sizes = config['AVATAR_SIZES']
+    store = get_store()
+    data = fetch_source(url)
+    digest = hashlib.sha256(data).hexdigest()
+    if store.has_all(digest, sizes):
+        store.link(url, digest)  # same image under a new URL
+    else:
+        thumbs = get_pool().submit(make_thumbnails, data, sizes).result(
+            timeout=config['AVATAR_FETCH_TIMEOUT'] * 2
+        )
+        store.put(url, digest, thumbs)
+    return digest
+
+
+def refresh(url):
+    """Fetch and thumbnail ``url`` now; concurrent callers share one build"""
+    with _lock:
+        future = _pending.get(url)
+        leader = future is None
+        if leader:
+            future = _pending[url] = Future()
+    if leader:
+        try:
+            future.set_result(_build(url))
+            _failures.pop(url, None)
+        except Exception as e:
+            _failures[url] = time.monotonic() + FAILURE_TTL
+            future.set_exception(e)
+        finally:
+            with _lock:
+                _pending.pop(url, None)
+    return future.result()
+
+
+def thumbnail(url, size):
+    """(digest, path) of a thumbnail, building it on a miss"""
+    store = get_store()
+    found = store.lookup(url, size)
+    if found is None:
+        if _failures.get(url, 0) > time.monotonic():
+            raise AvatarError(f"recently failed: {url}")
+        refresh(url)
+        found = store.lookup(url, size)
+        if found is None:
+            raise AvatarError(f"thumbnail missing after refresh: {url}")
+    return found
+
+
+def version(url):
+    return hashlib.sha256(url.encode()).hexdigest()[:12]
+
+
+def avatar_path(user):
+    """Versioned proxy path for a user's avatar, or None without one"""
+    if not user.avatar_url:
+        return None
+    return f"/avatars/{user.id}?v={version(user.avatar_url)}"
+
+
+def refresh_user(user_id):
+    """Queue thumbnails for a user's current avatar URL (outbox consumer).
+
+    Nothing is fetched here: the work starts after the caller's transaction
+    commits, on the background refresher.
+    """
+    from app.models import User
+    from app import db
+
+    user = db.session.get(User, user_id)
+    if user is not None and user.avatar_url and get_store().lookup(
+        user.avatar_url, current_app.config['AVATAR_DEFAULT_SIZE']
+    ) is None:
+        db.session.info.setdefault('avatar_refresh', set()).add(user.avatar_url)
+
+
+def get_refresher():
+    """This process's background refresh threads, started on first use"""
+    app = current_app._get_current_object()
+    refresher = app.extensions.get('studenthub.avatar_refresher')
+    if refresher is None:
+        with _lock:
+            refresher = app.extensions.get('studenthub.avatar_refresher')
+            if refresher is None:
+                refresher = app.extensions['studenthub.avatar_refresher'] = ThreadPoolExecutor(
+                    app.config['AVATAR_WORKERS'], thread_name_prefix='avatar-refresh'
+                )
+    return refresher
+
+
+def _refresh_in_background(app, url):
+    with app.app_context():
+        try:
+            refresh(url)
+        except Exception as e:
+            print(f"Avatar refresh error ({url}): {e}")
+
+
+@event.listens_for(Session, 'after_commit')
+def _submit_after_commit(session):
+    urls = session.info.pop('avatar_refresh', None)
+    if urls:
+        app = current_app._get_current_object()
+        refresher = get_refresher()
+        for url in urls:
+            refresher.submit(_refresh_in_background, app, url)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_after_rollback(session):
+    # The event is redelivered, and queues the URL again
+    session.info.pop('avatar_refresh', None)
+
+
+def pick_size(requested, sizes):
+    """Smallest configured size at least as large as requested"""
+    for size in sorted(sizes):
+        if size >= requested:
+            return size
+    return max(sizes)
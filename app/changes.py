@@ -0,0 +1,133 @@
+"""Change feed for incremental sync of blogs, questions, comments and tags.
+
+Every committed write reaches ``change_log`` through the outbox (see
+``app/outbox.py``): one row per changed entity, ``upsert`` while it exists
+and ``delete`` (a tombstone) once it is gone. Row ids are the sync
+positions. They are assigned under a transaction-scoped advisory lock on
+Postgres, so they become visible strictly in order and a client that has
+read up to position N never sees a new row appear below N.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.orm import selectinload
+from app import db
+from app.models import Blog, ChangeLog, ChangeLogWatermark, Comment, Question, Tag
+
+ENTITIES = {'blog': Blog, 'question': Question, 'comment': Comment, 'tag': Tag}
+CHANGE_LOG_LOCK = 0x6368616e  # advisory lock key, any constant unique to this app
+
+
+# -------------------- Logging --------------------
+
+def log_change(entity_type, entity_id):
+    """Append the entity's current state (exists or gone). Does not commit."""
+    exists = db.session.get(ENTITIES[entity_type], entity_id) is not None
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": CHANGE_LOG_LOCK})
+    db.session.add(ChangeLog(
+        entity_type=entity_type,
+        entity_id=entity_id,
+        op='upsert' if exists else 'delete',
+    ))
+
+
+def prune(older_than_days=90):
+    """Drop entries (including tombstones) older than the retention window.
+
+    Ids can have gaps (rolled-back inserts burn sequence values), so the
+    highest pruned id is stored as a watermark rather than inferred from the
+    oldest remaining entry.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    through = db.session.execute(
+        select(func.max(ChangeLog.id)).where(ChangeLog.changed_at < cutoff)
+    ).scalar()
+    if through is None:
+        return 0
+    watermark = db.session.get(ChangeLogWatermark, 1, with_for_update=True)
+    if watermark is None:
+        watermark = ChangeLogWatermark(id=1, pruned_through=0)
+        db.session.add(watermark)
+    watermark.pruned_through = max(watermark.pruned_through, through)
+    result = db.session.execute(delete(ChangeLog).where(ChangeLog.id <= through))
+    db.session.commit()
+    return result.rowcount
+
+
+# -------------------- Reading --------------------
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _serialize(entity_type, obj):
+    if entity_type == 'tag':
+        return {"id": obj.id, "name": obj.name, "updated_at": _iso(obj.updated_at)}
+    if entity_type == 'comment':
+        return {
+            "id": obj.id, "content": obj.content, "user_id": obj.user_id,
+            "question_id": obj.question_id, "parent_id": obj.parent_id,
+            "created_at": _iso(obj.created_at), "updated_at": _iso(obj.updated_at),
+        }
+    data = {
+        "id": obj.id, "title": obj.title, "user_id": obj.user_id,
+        "tags": [t.name for t in obj.tags],
+        "created_at": _iso(obj.created_at), "updated_at": _iso(obj.updated_at),
+    }
+    if entity_type == 'blog':
+        data.update(content=obj.content, content_html=obj.content_html, excerpt=obj.excerpt)
+    else:
+        data.update(description=obj.description)
+    return data
+
+
+def pruned_through():
+    """Highest sync position whose entries may have been pruned (0 if none)"""
+    watermark = db.session.get(ChangeLogWatermark, 1)
+    return watermark.pruned_through if watermark is not None else 0
+
+
+def read_changes(since, limit):
+    """Return (changes, next_position, has_more) after sync position ``since``.
+
+    Each entity appears once per page, at its latest position, carrying its
+    current data, or as a tombstone if it no longer exists.
+    """
+    rows = db.session.execute(
+        select(ChangeLog).where(ChangeLog.id > since)
+        .order_by(ChangeLog.id).limit(limit + 1)
+    ).scalars().all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not rows:
+        return [], since, False
+
+    latest = {}
+    for row in rows:
+        latest.pop((row.entity_type, row.entity_id), None)
+        latest[(row.entity_type, row.entity_id)] = row
+
+    current = {}
+    for entity_type, model in ENTITIES.items():
+        ids = [eid for (etype, eid) in latest if etype == entity_type]
+        if not ids:
+            continue
+        query = model.query.filter(model.id.in_(ids))
+        if entity_type in ('blog', 'question'):
+            query = query.options(selectinload(model.tags))
+        for obj in query:
+            current[(entity_type, obj.id)] = _serialize(entity_type, obj)
+
+    changes = []
+    for key, row in latest.items():
+        data = current.get(key)
+        changes.append({
+            "position": row.id,
+            "type": row.entity_type,
+            "id": row.entity_id,
+            "op": "upsert" if data is not None else "delete",
+            "changed_at": _iso(row.changed_at),
+            "data": data,
+        })
+    return changes, rows[-1].id, has_more
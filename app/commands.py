@@ -0,0 +1,310 @@
+import click
+from multiprocessing import Pool
+from sqlalchemy import func, or_, select, update
+from app import db
+from app.models import Blog
+
+
+def register_commands(app):
+    """Register maintenance CLI commands (run with `flask <command>`)"""
+
+    # -------------------- Blog Rendering --------------------
+
+    @app.cli.command("render-blogs")
+    @click.option("--all", "force", is_flag=True,
+                  help="Re-render every blog, not just outdated ones.")
+    @click.option("--batch-size", default=500, show_default=True)
+    @click.option("--workers", default=None, type=int,
+                  help="Render processes (defaults to CPU count).")
+    def render_blogs(force, batch_size, workers):
+        """Re-render stored blog HTML after a renderer version change"""
+        from app.rendering import RENDERER_VERSION, content_hash, render_content
+
+        total = 0
+        last_id = 0
+        with Pool(workers) as pool:
+            while True:
+                query = db.session.query(Blog.id, Blog.content, Blog.updated_at).filter(Blog.id > last_id)
+                if not force:
+                    query = query.filter(or_(
+                        Blog.render_version.is_(None),
+                        Blog.render_version != RENDERER_VERSION,
+                    ))
+                rows = query.order_by(Blog.id).limit(batch_size).all()
+                if not rows:
+                    break
+
+                rendered = pool.map(render_content, [r.content for r in rows])
+                # updated_at is passed back unchanged: a re-render is not an edit
+                # and must not fire the column's onupdate
+                db.session.execute(update(Blog), [
+                    dict(
+                        id=row.id,
+                        updated_at=row.updated_at,
+                        content_hash=content_hash(row.content),
+                        render_version=RENDERER_VERSION,
+                        **result,
+                    )
+                    for row, result in zip(rows, rendered)
+                ])
+                db.session.commit()
+
+                total += len(rows)
+                last_id = rows[-1].id
+                click.echo(f"Rendered {total} blogs (last id {last_id})")
+
+        click.echo(f"Done: {total} blogs at renderer version {RENDERER_VERSION}")
+
+    # -------------------- Related Items --------------------
+
+    @app.cli.command("build-related")
+    @click.option("-k", "k", default=10, show_default=True,
+                  help="Neighbours stored per item.")
+    @click.option("--metric", type=click.Choice(["cosine", "jaccard"]),
+                  default="cosine", show_default=True)
+    @click.option("--batch-size", default=1024, show_default=True)
+    def build_related(k, metric, batch_size):
+        """Rebuild related questions/blogs from tag co-occurrence"""
+        from app.related import rebuild_related
+
+        items, pairs = rebuild_related(k=k, metric=metric, batch_size=batch_size)
+        click.echo(f"Stored {pairs} related pairs for {items} items")
+
+    # -------------------- Duplicate Detection --------------------
+
+    @app.cli.command("backfill-minhash")
+    @click.option("--all", "force", is_flag=True,
+                  help="Re-sign every question, not just unsigned ones.")
+    @click.option("--batch-size", default=1000, show_default=True)
+    def backfill_minhash(force, batch_size):
+        """Sign existing questions for near-duplicate lookup"""
+        from app.dedup import backfill_signatures
+
+        total = backfill_signatures(
+            batch_size=batch_size, force=force,
+            progress=lambda n, last_id: click.echo(f"Signed {n} questions (last id {last_id})")
+        )
+        click.echo(f"Done: {total} questions")
+
+    # -------------------- Content Similarity --------------------
+
+    @app.cli.command("build-tfidf")
+    def build_tfidf():
+        """Rebuild the TF-IDF index, compacting posts appended since the last build"""
+        from app.tfidf import build_index
+
+        docs, pending = build_index()
+        click.echo(f"Indexed {docs} posts ({pending} newer posts left in the delta)")
+
+    # -------------------- Partitions --------------------
+
+    @app.cli.group("partitions")
+    def partitions():
+        """Manage Postgres partitions of the comment table"""
+
+    @partitions.command("ensure")
+    @click.option("--months-ahead", default=3, show_default=True)
+    def ensure_partitions(months_ahead):
+        """Create upcoming monthly comment partitions (run monthly)"""
+        from app.partitions import ensure_comment_partitions, is_partitioned
+
+        if not is_partitioned():
+            raise click.ClickException("comment is not partitioned on this database")
+        created = ensure_comment_partitions(months_ahead)
+        click.echo(f"Created {len(created)} partitions: {', '.join(created) or '-'}")
+
+    @partitions.command("archive")
+    @click.option("--older-than-months", default=12, show_default=True)
+    @click.option("--tablespace", default=None, envvar="ARCHIVE_TABLESPACE",
+                  help="Move archived partitions to this tablespace.")
+    def archive_partitions(older_than_months, tablespace):
+        """Compress cold monthly comment partitions, keeping them attached"""
+        from app.partitions import archive_comment_partitions, is_partitioned
+
+        if not is_partitioned():
+            raise click.ClickException("comment is not partitioned on this database")
+        archived = archive_comment_partitions(older_than_months, tablespace)
+        click.echo(f"Archived {len(archived)} partitions: {', '.join(archived) or '-'}")
+
+    @partitions.command("list")
+    def list_partitions():
+        """Show monthly comment partitions and whether they are archived"""
+        from app.partitions import comment_partitions, is_partitioned
+
+        if not is_partitioned():
+            raise click.ClickException("comment is not partitioned on this database")
+        for name, year, month, archived in comment_partitions():
+            click.echo(f"{name}\t{year}-{month:02d}\t{'archived' if archived else 'live'}")
+
+    # -------------------- Outbox --------------------
+
+    @app.cli.group("outbox")
+    def outbox_group():
+        """Dispatch and inspect derived-data events"""
+
+    @outbox_group.command("run")
+    @click.option("--batch-size", default=100, show_default=True)
+    @click.option("--once", is_flag=True, help="Drain the backlog and exit.")
+    def run_outbox(batch_size, once):
+        """Deliver outbox events; run several in parallel if needed"""
+        import time
+        from app import outbox
+
+        interval = app.config['OUTBOX_POLL_INTERVAL_MS'] / 1000.0
+        while True:
+            delivered = outbox.drain(batch_size)
+            if once:
+                click.echo(f"Dispatched {delivered} events")
+                return
+            if not delivered:
+                time.sleep(interval)
+
+    @outbox_group.command("stats")
+    def outbox_stats():
+        """Show backlog size and lag"""
+        from app import outbox
+
+        for key, value in outbox.stats().items():
+            click.echo(f"{key}: {value}")
+
+    @outbox_group.command("requeue")
+    def outbox_requeue():
+        """Retry events that exhausted their attempts"""
+        from app import outbox
+
+        click.echo(f"Requeued {outbox.requeue_dead()} events")
+
+    # -------------------- Profiling --------------------
+
+    @app.cli.command("profile-token")
+    @click.option("--ttl", default=3600, show_default=True, help="Seconds the token stays valid.")
+    def profile_token(ttl):
+        """Mint an X-Profile-Token for profiling requests and /admin/profiles"""
+        from app.profiling import make_token
+
+        secret = app.config['PROFILE_SECRET']
+        if not secret:
+            raise click.ClickException("PROFILE_SECRET is not set")
+        click.echo(make_token(secret, ttl))
+
+    # -------------------- Change Feed --------------------
+
+    @app.cli.command("prune-changes")
+    @click.option("--older-than-days", default=90, show_default=True)
+    def prune_changes(older_than_days):
+        """Drop old change-feed entries; clients behind them must resync"""
+        from app.changes import prune
+
+        click.echo(f"Pruned {prune(older_than_days)} change-log entries")
+
+    # -------------------- Question Stats --------------------
+
+    @app.cli.command("reconcile-question-stats")
+    @click.option("--batch-size", default=1000, show_default=True)
+    def reconcile_question_stats(batch_size):
+        """Recompute comment_count and last_activity_at from the comment table"""
+        from app.models import Comment, Question
+
+        count = (select(func.count()).where(Comment.question_id == Question.id)
+                 .correlate(Question).scalar_subquery())
+        latest = (select(func.max(Comment.created_at)).where(Comment.question_id == Question.id)
+                  .correlate(Question).scalar_subquery())
+        last_id, total = 0, 0
+        while True:
+            ids = db.session.execute(
+                select(Question.id).where(Question.id > last_id)
+                .order_by(Question.id).limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                break
+            db.session.execute(
+                update(Question).where(Question.id.between(ids[0], ids[-1])).values(
+                    comment_count=count,
+                    last_activity_at=func.coalesce(latest, Question.created_at, Question.last_activity_at),
+                    updated_at=Question.updated_at,
+                )
+            )
+            db.session.commit()
+            total += len(ids)
+            last_id = ids[-1]
+        click.echo(f"Reconciled {total} questions")
+
+    # -------------------- Feeds & Sitemaps --------------------
+
+    @app.cli.command("build-feeds")
+    @click.option("--watch", type=int, default=0,
+                  help="Keep running, checking for changes every N seconds.")
+    def build_feeds_command(watch):
+        """Regenerate RSS/Atom feeds and sitemap shards that changed"""
+        import time
+        from app.feeds import build_feeds
+
+        while True:
+            written = build_feeds()
+            db.session.remove()
+            if not watch:
+                click.echo(f"Rewrote {written} feed/sitemap files")
+                return
+            if written:
+                click.echo(f"Rewrote {written} feed/sitemap files")
+            time.sleep(watch)
+
+    # -------------------- Vote History --------------------
+
+    @app.cli.command("rollup-votes")
+    @click.option("--watch", type=int, default=0,
+                  help="Keep running, rolling up new events every N seconds.")
+    def rollup_votes_command(watch):
+        """Fold new vote events into minute/hour/day rollups and apply retention"""
+        import time
+        from app.votelog import prune, rollup
+
+        config = app.config
+        while True:
+            total = 0
+            while True:
+                n = rollup(config['VOTE_ROLLUP_BATCH'], config['VOTE_ROLLUP_LAG_SECONDS'])
+                total += n
+                if n < config['VOTE_ROLLUP_BATCH']:
+                    break
+            pruned = prune(config['VOTE_HISTORY_MINUTE_DAYS'], config['VOTE_HISTORY_HOUR_DAYS'],
+                           config['VOTE_EVENT_DAYS'])
+            db.session.remove()
+            if not watch or total or pruned:
+                click.echo(f"Rolled up {total} vote events, pruned {pruned} old rows")
+            if not watch:
+                return
+            time.sleep(watch)
+
+    # -------------------- Warm-start Snapshots --------------------
+
+    @app.cli.command("snapshot")
+    @click.option("--watch", type=int, default=0,
+                  help="Keep running, rewriting the snapshot every N seconds.")
+    def snapshot_command(watch):
+        """Write hot read models to SNAPSHOT_PATH for new workers to map"""
+        import time
+        from app.readcache import write_snapshot
+
+        while True:
+            counts = write_snapshot(app.config['SNAPSHOT_PATH'])
+            db.session.remove()
+            if not watch:
+                click.echo(f"Wrote snapshot: {counts}")
+                return
+            time.sleep(watch)
+
+    # -------------------- Notifications --------------------
+
+    @app.cli.command("send-digests")
+    @click.option("--batch-size", type=int, default=None,
+                  help="Users per batch (default DIGEST_BATCH_SIZE).")
+    def send_digests_command(batch_size):
+        """Email each user one digest of their unsent notifications"""
+        from app.notifications import send_digests
+
+        sent = send_digests(
+            batch_size or app.config['DIGEST_BATCH_SIZE'],
+            app.config['DIGEST_MAX_ITEMS'],
+        )
+        click.echo(f"Sent {sent} digest emails")
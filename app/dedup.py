@@ -0,0 +1,212 @@
+"""Near-duplicate question detection with MinHash and LSH banding.
+
+Each question title gets a MinHash signature (stored on ``question.minhash``)
+and one bucket per band in ``question_lsh_band``. Looking up duplicates only
+touches questions that share at least one bucket, so cost grows with the
+number of near matches rather than with the table size.
+"""
+import hashlib
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+from sqlalchemy import delete, insert, select, tuple_, update
+from sqlalchemy.orm import load_only
+from app import db
+from app.models import Question, QuestionLSHBand
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS  # ~50% Jaccard is where a pair becomes likely to collide
+SHINGLE_SIZE = 4
+SIMILARITY_THRESHOLD = 0.5
+MAX_RESULTS = 5
+
+BUCKET_CACHE_TTL = 60  # seconds
+BUCKET_CACHE_SIZE = 10000
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.RandomState(20260119)  # fixed: signatures are persisted
+_A = _rng.randint(1, _PRIME, size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+_B = _rng.randint(0, _PRIME, size=NUM_PERM, dtype=np.int64).astype(np.uint64)
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+_bucket_cache = {}
+_cache_lock = threading.Lock()
+
+
+# -------------------- Signatures --------------------
+
+def shingles(text):
+    """Character shingles of the normalized text"""
+    text = _NON_WORD.sub(' ', text.lower()).strip()
+    if len(text) <= SHINGLE_SIZE:
+        return {text} if text else set()
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def signature(text):
+    """MinHash signature as a uint32 array, or None for empty text"""
+    grams = shingles(text)
+    if not grams:
+        return None
+    hashes = np.fromiter(
+        (zlib.crc32(g.encode('utf-8')) for g in grams), dtype=np.uint64, count=len(grams)
+    )
+    permuted = (_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME
+    return permuted.min(axis=1).astype(np.uint32)
+
+
+def band_buckets(sig):
+    """Map each band of a signature to a signed 64-bit bucket id"""
+    return [
+        (band, int.from_bytes(
+            hashlib.blake2b(sig[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8).digest(),
+            'big', signed=True))
+        for band in range(BANDS)
+    ]
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two signatures"""
+    return float(np.mean(sig_a == sig_b))
+
+
+def _from_bytes(raw):
+    return np.frombuffer(raw, dtype=np.uint32)
+
+
+# -------------------- Bucket Cache --------------------
+
+def _cached_candidates(keys):
+    """Return (ids, missing_keys) using the per-process bucket cache"""
+    now = time.monotonic()
+    ids, missing = set(), []
+    with _cache_lock:
+        for key in keys:
+            entry = _bucket_cache.get(key)
+            if entry and now - entry[0] < BUCKET_CACHE_TTL:
+                ids.update(entry[1])
+            else:
+                missing.append(key)
+    return ids, missing
+
+
+def _cache_buckets(found, keys):
+    now = time.monotonic()
+    with _cache_lock:
+        if len(_bucket_cache) + len(keys) > BUCKET_CACHE_SIZE:
+            _bucket_cache.clear()
+        for key in keys:
+            _bucket_cache[key] = (now, frozenset(found.get(key, ())))
+
+
+def _add_to_cache(question_id, keys):
+    with _cache_lock:
+        for key in keys:
+            entry = _bucket_cache.get(key)
+            if entry:
+                _bucket_cache[key] = (entry[0], entry[1] | {question_id})
+
+
+# -------------------- Lookup & Indexing --------------------
+
+def find_similar(text, exclude_id=None, limit=MAX_RESULTS, threshold=SIMILARITY_THRESHOLD):
+    """Return [(question, similarity)] for likely duplicates of ``text``"""
+    sig = signature(text)
+    if sig is None:
+        return []
+
+    keys = band_buckets(sig)
+    candidate_ids, missing = _cached_candidates(keys)
+    if missing:
+        found = {}
+        rows = db.session.execute(
+            select(QuestionLSHBand.band, QuestionLSHBand.bucket, QuestionLSHBand.question_id)
+            .where(tuple_(QuestionLSHBand.band, QuestionLSHBand.bucket).in_(missing))
+        )
+        for band, bucket, qid in rows:
+            found.setdefault((band, bucket), set()).add(qid)
+            candidate_ids.add(qid)
+        _cache_buckets(found, missing)
+
+    candidate_ids.discard(exclude_id)
+    if not candidate_ids:
+        return []
+
+    scored = []
+    candidates = Question.query.options(
+        load_only(Question.id, Question.title, Question.minhash)
+    ).filter(Question.id.in_(candidate_ids), Question.minhash.isnot(None))
+    for q in candidates:
+        score = similarity(sig, _from_bytes(q.minhash))
+        if score >= threshold:
+            scored.append((q, score))
+    scored.sort(key=lambda pair: -pair[1])
+    return scored[:limit]
+
+
+def index_question(question):
+    """Store a question's signature and LSH buckets. Does not commit."""
+    db.session.execute(
+        delete(QuestionLSHBand).where(QuestionLSHBand.question_id == question.id)
+    )
+    sig = signature(question.title)
+    question.minhash = sig.tobytes() if sig is not None else None
+    if sig is None:
+        return
+
+    keys = band_buckets(sig)
+    db.session.execute(insert(QuestionLSHBand), [
+        {"band": band, "bucket": bucket, "question_id": question.id}
+        for band, bucket in keys
+    ])
+    _add_to_cache(question.id, keys)
+
+
+def unindex_question(question_id):
+    db.session.execute(
+        delete(QuestionLSHBand).where(QuestionLSHBand.question_id == question_id)
+    )
+
+
+def backfill_signatures(batch_size=1000, force=False, progress=None):
+    """Sign questions in keyset-ordered chunks; returns the number signed"""
+    total = 0
+    last_id = 0
+    while True:
+        query = db.session.query(Question.id, Question.title).filter(Question.id > last_id)
+        if not force:
+            query = query.filter(Question.minhash.is_(None))
+        rows = query.order_by(Question.id).limit(batch_size).all()
+        if not rows:
+            break
+
+        ids = [r.id for r in rows]
+        db.session.execute(
+            delete(QuestionLSHBand).where(QuestionLSHBand.question_id.in_(ids))
+        )
+        updates, bands = [], []
+        for row in rows:
+            sig = signature(row.title)
+            if sig is None:
+                continue
+            updates.append({"id": row.id, "minhash": sig.tobytes()})
+            bands.extend(
+                {"band": band, "bucket": bucket, "question_id": row.id}
+                for band, bucket in band_buckets(sig)
+            )
+        if updates:
+            db.session.execute(update(Question), updates)
+        if bands:
+            db.session.execute(insert(QuestionLSHBand), bands)
+        db.session.commit()
+
+        total += len(rows)
+        last_id = ids[-1]
+        if progress:
+            progress(total, last_id)
+    return total
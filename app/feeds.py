@@ -0,0 +1,271 @@
+"""Pre-generated RSS/Atom feeds and XML sitemaps.
+
+``flask build-feeds`` writes every file under ``FEEDS_DIR``::
+
+    blogs.rss / blogs.atom            newest blogs
+    questions.rss / questions.atom    newest questions
+    tags/<tag>.rss / .atom            newest posts carrying a tag
+    sitemap.xml                       sitemap index
+    sitemaps/<type>-<n>.xml           one shard per SITEMAP_SHARD_SIZE ids
+
+Each file has a fingerprint (row count, newest ``updated_at``, highest id)
+taken with one grouped query per file family. Files are rewritten only when
+their fingerprint changes, so untouched shards keep their mtime. Files are
+replaced atomically. The routes serve them with ``send_from_directory``,
+which answers ``If-None-Match`` / ``If-Modified-Since`` with a 304 and
+never touches the database.
+"""
+import json
+import os
+from email.utils import format_datetime
+from datetime import datetime, timezone
+from urllib.parse import quote
+from xml.sax.saxutils import escape
+
+from flask import current_app
+from sqlalchemy import func, select
+from app import db
+from app.models import Blog, Question, Tag, blog_tags, question_tags
+
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+ATOM_NS = 'http://www.w3.org/2005/Atom'
+SUMMARY_LENGTH = 300
+EPOCH = datetime(1970, 1, 1)  # for rows that predate created_at defaults
+
+KINDS = {
+    # kind -> (model, association table, item column, summary column)
+    'blog': (Blog, blog_tags, blog_tags.c.blog_id, Blog.excerpt),
+    'question': (Question, question_tags, question_tags.c.question_id, Question.description),
+}
+
+
+# -------------------- Files --------------------
+
+def _feeds_dir():
+    return current_app.config['FEEDS_DIR']
+
+
+def tag_filename(name):
+    """Filesystem-safe name for a tag's feed files"""
+    return quote(name, safe='')
+
+
+def _write(rel_path, content):
+    path = os.path.join(_feeds_dir(), rel_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(tmp, path)
+
+
+def _remove(rel_path):
+    try:
+        os.remove(os.path.join(_feeds_dir(), rel_path))
+    except OSError:
+        pass
+
+
+def _load_manifest():
+    try:
+        with open(os.path.join(_feeds_dir(), 'manifest.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _fingerprint(count, updated, max_id):
+    return [count, updated.isoformat() if updated else None, max_id]
+
+
+# -------------------- Rendering --------------------
+
+def _url(path):
+    """Public URL of a frontend page"""
+    return current_app.config['SITE_URL'].rstrip('/') + path
+
+
+def _file_url(rel_path):
+    """Public URL of a generated file, as served by the feed routes"""
+    return current_app.config['FEEDS_PUBLIC_URL'].rstrip('/') + '/' + rel_path
+
+
+def _utc(value):
+    return value.replace(tzinfo=timezone.utc)
+
+
+def _summary(text):
+    text = (text or '').strip()
+    return text if len(text) <= SUMMARY_LENGTH else text[:SUMMARY_LENGTH].rstrip() + '…'
+
+
+def render_rss(title, link, items):
+    """RSS 2.0 document from (kind, id, title, summary, created_at) rows"""
+    entries = ''.join(
+        "<item>"
+        f"<title>{escape(item_title)}</title>"
+        f"<link>{escape(_url(f'/{kind}s/{item_id}'))}</link>"
+        f"<guid isPermaLink=\"true\">{escape(_url(f'/{kind}s/{item_id}'))}</guid>"
+        f"<description>{escape(_summary(summary))}</description>"
+        f"<pubDate>{format_datetime(_utc(created), usegmt=True)}</pubDate>"
+        "</item>"
+        for kind, item_id, item_title, summary, created in items
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<rss version="2.0"><channel><title>{escape(title)}</title>'
+        f'<link>{escape(_url(link))}</link><description>{escape(title)}</description>'
+        f'{entries}</channel></rss>\n'
+    )
+
+
+def render_atom(title, link, items):
+    """Atom 1.0 document from (kind, id, title, summary, created_at) rows"""
+    updated = max((created for *_, created in items), default=None)
+    entries = ''.join(
+        "<entry>"
+        f"<title>{escape(item_title)}</title>"
+        f"<link href=\"{escape(_url(f'/{kind}s/{item_id}'))}\"/>"
+        f"<id>{escape(_url(f'/{kind}s/{item_id}'))}</id>"
+        f"<updated>{_utc(created).isoformat()}</updated>"
+        f"<summary>{escape(_summary(summary))}</summary>"
+        "</entry>"
+        for kind, item_id, item_title, summary, created in items
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<feed xmlns="{ATOM_NS}"><title>{escape(title)}</title>'
+        f'<link href="{escape(_url(link))}"/><id>{escape(_url(link))}</id>'
+        f'<updated>{_utc(updated).isoformat() if updated else ""}</updated>'
+        f'{entries}</feed>\n'
+    )
+
+
+def _newest(kind, limit, tag_id=None):
+    model, assoc, item_col, summary = KINDS[kind]
+    query = select(model.id, model.title, summary, model.created_at)
+    if tag_id is not None:
+        query = query.join(assoc, item_col == model.id).where(assoc.c.tag_id == tag_id)
+    rows = db.session.execute(query.order_by(model.id.desc()).limit(limit))
+    return [(kind, item_id, title, text, created or EPOCH) for item_id, title, text, created in rows]
+
+
+def _write_feed(rel_base, title, link, items):
+    _write(f"{rel_base}.rss", render_rss(title, link, items))
+    _write(f"{rel_base}.atom", render_atom(title, link, items))
+
+
+# -------------------- Building --------------------
+
+def build_feeds():
+    """Regenerate changed feeds and sitemap shards; returns files rewritten"""
+    manifest = _load_manifest()
+    new_manifest = {}
+    written = 0
+    limit = current_app.config['FEED_ITEMS']
+
+    # Global feeds
+    for kind, (model, *_rest) in KINDS.items():
+        key = f"{kind}s"
+        new_manifest[key] = _fingerprint(*db.session.execute(
+            select(func.count(), func.max(model.updated_at), func.max(model.id))
+        ).one())
+        if manifest.get(key) != new_manifest[key]:
+            _write_feed(key, f"StudentHub {key}", f"/{key}", _newest(kind, limit))
+            written += 2
+
+    # Per-tag feeds, fingerprinted over both kinds of tagged posts
+    tag_prints = {}
+    for kind, (model, assoc, item_col, _summary_col) in KINDS.items():
+        rows = db.session.execute(
+            select(assoc.c.tag_id, func.count(), func.max(model.updated_at), func.max(model.id))
+            .join(model, model.id == item_col).group_by(assoc.c.tag_id)
+        )
+        for tag_id, count, updated, max_id in rows:
+            tag_prints.setdefault(tag_id, {})[kind] = _fingerprint(count, updated, max_id)
+    names = dict(db.session.execute(select(Tag.id, Tag.name)).all())
+    for tag_id, prints in tag_prints.items():
+        key = f"tags/{tag_filename(names[tag_id])}"
+        new_manifest[key] = prints
+        if manifest.get(key) != prints:
+            items = sorted(
+                _newest('blog', limit, tag_id) + _newest('question', limit, tag_id),
+                key=lambda item: item[4], reverse=True,
+            )[:limit]
+            _write_feed(key, f"StudentHub #{names[tag_id]}", f"/tags/{quote(names[tag_id])}", items)
+            written += 2
+    for key in manifest:
+        if key.startswith('tags/') and key not in new_manifest:
+            _remove(f"{key}.rss")
+            _remove(f"{key}.atom")
+
+    written += _build_sitemaps(manifest, new_manifest)
+
+    _write('manifest.json', json.dumps(new_manifest, sort_keys=True))
+    return written
+
+
+def _build_sitemaps(manifest, new_manifest):
+    size = current_app.config['SITEMAP_SHARD_SIZE']
+    written = 0
+    shards = {}
+    for kind, (model, *_rest) in KINDS.items():
+        shard = (model.id // size).label('shard')
+        rows = db.session.execute(
+            select(shard, func.count(), func.max(model.updated_at), func.max(model.id))
+            .group_by(shard)
+        )
+        for number, count, updated, max_id in rows:
+            key = f"sitemaps/{kind}-{number}.xml"
+            shards[key] = updated
+            new_manifest[key] = _fingerprint(count, updated, max_id)
+            if manifest.get(key) == new_manifest[key]:
+                continue
+            urls = db.session.execute(
+                select(model.id, model.updated_at)
+                .where(model.id >= number * size, model.id < (number + 1) * size)
+                .order_by(model.id)
+            )
+            _write(key, _urlset(
+                (_url(f"/{kind}s/{item_id}"), updated_at) for item_id, updated_at in urls
+            ))
+            written += 1
+
+    # Tag pages share one shard; tags are few and rarely change
+    count, updated, max_id = db.session.execute(
+        select(func.count(), func.max(Tag.updated_at), func.max(Tag.id))
+    ).one()
+    key = 'sitemaps/tags.xml'
+    shards[key] = updated
+    new_manifest[key] = _fingerprint(count, updated, max_id)
+    if manifest.get(key) != new_manifest[key]:
+        _write(key, _urlset(
+            (_url(f"/tags/{quote(name)}"), updated_at)
+            for name, updated_at in db.session.execute(select(Tag.name, Tag.updated_at).order_by(Tag.id))
+        ))
+        written += 1
+
+    for key in manifest:
+        if key.startswith('sitemaps/') and key not in shards:
+            _remove(key)
+    if written or set(shards) != {k for k in manifest if k.startswith('sitemaps/')}:
+        _write('sitemap.xml', _sitemap_index(shards))
+        written += 1
+    return written
+
+
+def _lastmod(value):
+    return f"<lastmod>{_utc(value).isoformat()}</lastmod>" if value else ""
+
+
+def _urlset(entries):
+    urls = ''.join(f"<url><loc>{escape(loc)}</loc>{_lastmod(updated)}</url>" for loc, updated in entries)
+    return f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NS}">{urls}</urlset>\n'
+
+
+def _sitemap_index(shards):
+    entries = ''.join(
+        f"<sitemap><loc>{escape(_file_url(key))}</loc>{_lastmod(updated)}</sitemap>"
+        for key, updated in sorted(shards.items())
+    )
+    return f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{SITEMAP_NS}">{entries}</sitemapindex>\n'
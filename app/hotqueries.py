@@ -0,0 +1,70 @@
+"""Hot lookups as statements built and compiled once per process.
+
+These run on nearly every request: the session user in ``load_user``, users
+by email at login and OTP time, tags by name while tagging posts, and a
+user's existing vote. Each ``Model.query.filter_by(...)`` call builds a new
+Query, converts it to a Select and computes that statement's cache key
+before it can find the compiled SQL.
+
+The statements here are module-level constants with ``bindparam``
+placeholders. Each one is built once, its cache key is memoized on the
+object and its compiled form is reused, so a call only binds values.
+(``lambda_stmt`` was measured too and was slower than plain ``Query`` for
+statements this small; see benchmarks/hot_queries.py.) Lookups that need no
+ORM entity run as Core on the session's connection and return plain rows.
+
+That client-side caching is all this module delivers with the default
+driver, psycopg2, which has no server-side prepared statements. Only a
+``postgresql+psycopg://`` URL (psycopg 3, not in app/req.txt) honours
+``DB_PREPARE_THRESHOLD`` (see ``create_app``) and lets the server skip
+parsing and planning as well.
+"""
+from sqlalchemy import bindparam, select
+from app import db
+from app.models import CommentVote, QuestionVote, Tag, User
+
+_USER_BY_ID = select(User).where(User.id == bindparam('user_id'))
+_USER_BY_EMAIL = select(User).where(User.email == bindparam('email'))
+_EMAIL_STATUS = select(User.id, User.email_verified).where(User.email == bindparam('email'))
+_TAG_BY_NAME = select(Tag).where(Tag.name == bindparam('name'))
+_QUESTION_VOTE = select(QuestionVote).where(
+    QuestionVote.user_id == bindparam('user_id'),
+    QuestionVote.question_id == bindparam('target_id'),
+)
+_COMMENT_VOTE = select(CommentVote).where(
+    CommentVote.user_id == bindparam('user_id'),
+    CommentVote.comment_id == bindparam('target_id'),
+)
+
+
+def user_by_id(user_id):
+    # A user already loaded in this session needs no query at all
+    user = db.session.identity_map.get(db.session.identity_key(User, user_id))
+    if user is not None:
+        return user
+    return db.session.execute(_USER_BY_ID, {'user_id': user_id}).scalar_one_or_none()
+
+
+def user_by_email(email):
+    return db.session.execute(_USER_BY_EMAIL, {'email': email}).scalar_one_or_none()
+
+
+def email_status(email):
+    """(id, email_verified) row for an email, or None; skips the ORM entirely"""
+    return db.session.connection().execute(_EMAIL_STATUS, {'email': email}).first()
+
+
+def tag_by_name(name):
+    return db.session.execute(_TAG_BY_NAME, {'name': name}).scalar_one_or_none()
+
+
+def question_vote(user_id, question_id):
+    return db.session.execute(
+        _QUESTION_VOTE, {'user_id': user_id, 'target_id': question_id}
+    ).scalar_one_or_none()
+
+
+def comment_vote(user_id, comment_id):
+    return db.session.execute(
+        _COMMENT_VOTE, {'user_id': user_id, 'target_id': comment_id}
+    ).scalar_one_or_none()
@@ -16,6 +16,8 @@ class User(UserMixin, db.Model):
     oauth_id = db.Column(db.String(200), nullable=True)
     avatar_url = db.Column(db.String(500), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Kept in step with Notification.read_at so the badge never needs a COUNT(*)
+    unread_notifications = db.Column(db.Integer, default=0, server_default='0', nullable=False)
 
     blogs = db.relationship('Blog', backref='author', lazy=True)
     questions = db.relationship('Question', backref='author', lazy=True)
@@ -37,19 +39,24 @@ class OTPVerification(db.Model):
 # --------------------
 # Tag (many-to-many with Question and Blog)
 # --------------------
+# The primary keys index (item, tag); the reverse (tag, item) indexes serve
+# tag -> items lookups and multi-tag GROUP BY / HAVING intersections.
 question_tags = db.Table('question_tags',
     db.Column('question_id', db.Integer, db.ForeignKey('question.id'), primary_key=True),
-    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id'), primary_key=True)
+    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id'), primary_key=True),
+    db.Index('ix_question_tags_tag_question', 'tag_id', 'question_id')
 )
 
 blog_tags = db.Table('blog_tags',
     db.Column('blog_id', db.Integer, db.ForeignKey('blog.id'), primary_key=True),
-    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id'), primary_key=True)
+    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id'), primary_key=True),
+    db.Index('ix_blog_tags_tag_blog', 'tag_id', 'blog_id')
 )
 
 class Tag(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), unique=True, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     def __repr__(self):
         return f'<Tag {self.name}>'
@@ -63,6 +70,16 @@ class Blog(db.Model):
     title = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # Bumped by every edit; PATCH/PUT compare-and-set it (optimistic concurrency)
+    version = db.Column(db.Integer, default=1, server_default='1', nullable=False)
+
+    # Rendered on write by app.rendering.apply_render
+    content_html = db.Column(db.Text, nullable=True)
+    excerpt = db.Column(db.String(300), nullable=True)
+    reading_time = db.Column(db.Integer, nullable=True)  # minutes
+    content_hash = db.Column(db.String(64), nullable=True)
+    render_version = db.Column(db.Integer, nullable=True)
 
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     tags = db.relationship('Tag', secondary=blog_tags, backref=db.backref('blogs', lazy=True))
@@ -76,11 +93,36 @@ class Question(db.Model):
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    minhash = db.Column(db.LargeBinary, nullable=True)  # title signature, see app/dedup.py
+    version = db.Column(db.Integer, default=1, server_default='1', nullable=False)  # see Blog.version
+    # Denormalized for list sorting; kept in step by the comment routes and
+    # repaired by `flask reconcile-question-stats`
+    comment_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    last_activity_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     comments = db.relationship('Comment', backref='question', lazy=True)
     tags = db.relationship('Tag', secondary=question_tags, backref=db.backref('questions', lazy=True))
 
+    __table_args__ = (
+        # "most active" and "unanswered" (comment_count = 0), newest first
+        db.Index('ix_question_comment_count', 'comment_count', 'id'),
+        db.Index('ix_question_last_activity', 'last_activity_at', 'id'),
+    )
+
+
+# --------------------
+# LSH bands for near-duplicate question lookup
+# --------------------
+class QuestionLSHBand(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    band = db.Column(db.SmallInteger, nullable=False)
+    bucket = db.Column(db.BigInteger, nullable=False)
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id'), nullable=False, index=True)
+
+    __table_args__ = (db.Index('ix_question_lsh_band_bucket', 'band', 'bucket'),)
+
 
 # --------------------
 # Comment (threaded)
@@ -88,10 +130,13 @@ class Question(db.Model):
 class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Range partition key on Postgres (monthly, see app/partitions.py)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     question_id = db.Column(db.Integer, db.ForeignKey('question.id'), nullable=False)
+    # Enforced by the app only on Postgres, where comment is partitioned
     parent_id = db.Column(db.Integer, db.ForeignKey('comment.id'), nullable=True)
 
     replies = db.relationship(
@@ -99,6 +144,10 @@ class Comment(db.Model):
         backref=db.backref('parent', remote_side=[id]),
         lazy=True
     )
+    __table_args__ = (
+        db.Index('ix_comment_question_created', 'question_id', 'created_at'),
+    )
+
     def __repr__(self):
         return f'<Comment {self.id} by User {self.user_id}>'
 
@@ -112,7 +161,11 @@ class QuestionVote(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     question_id = db.Column(db.Integer, db.ForeignKey('question.id'), nullable=False)
 
-    __table_args__ = (db.UniqueConstraint('user_id', 'question_id', name='unique_question_vote'),)
+    # Hash-partitioned on question_id on Postgres
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'question_id', name='unique_question_vote'),
+        db.Index('ix_question_vote_question_id', 'question_id'),
+    )
 
 
 # --------------------
@@ -122,6 +175,126 @@ class CommentVote(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     value = db.Column(db.Integer, nullable=False)  # +1 or -1
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    comment_id = db.Column(db.Integer, db.ForeignKey('comment.id'), nullable=False)
+    comment_id = db.Column(db.Integer, db.ForeignKey('comment.id'), nullable=False)  # app-enforced on Postgres
+
+    # Hash-partitioned on comment_id on Postgres
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'comment_id', name='unique_comment_vote'),
+        db.Index('ix_comment_vote_comment_id', 'comment_id'),
+    )
+
+
+# --------------------
+# Related items (precomputed by app/related.py)
+# --------------------
+class RelatedItem(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    item_type = db.Column(db.String(10), nullable=False)  # 'question' or 'blog'
+    item_id = db.Column(db.Integer, nullable=False)
+    related_type = db.Column(db.String(10), nullable=False)
+    related_id = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('item_type', 'item_id', 'related_type', 'related_id',
+                            name='unique_related_item'),
+        db.Index('ix_related_item_lookup', 'item_type', 'item_id', 'score'),
+        db.Index('ix_related_item_reverse', 'related_type', 'related_id'),
+    )
+
+
+# --------------------
+# Outbox (domain events for derived data, see app/outbox.py)
+# --------------------
+class OutboxEvent(db.Model):
+    __tablename__ = 'outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    topic = db.Column(db.String(40), nullable=False)  # e.g. 'question.created'
+    aggregate_type = db.Column(db.String(20), nullable=False)
+    aggregate_id = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.JSON, nullable=False, default=dict)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Failed deliveries are retried with backoff from this time
+    available_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.Text)
 
-    __table_args__ = (db.UniqueConstraint('user_id', 'comment_id', name='unique_comment_vote'),)
+    __table_args__ = (db.Index('ix_outbox_available', 'available_at', 'id'),)
+
+
+# --------------------
+# Change log (sync feed, see app/changes.py)
+# --------------------
+class ChangeLog(db.Model):
+    id = db.Column(db.Integer, primary_key=True)  # sync position, committed in order
+    entity_type = db.Column(db.String(20), nullable=False)  # 'blog', 'question', 'comment', 'tag'
+    entity_id = db.Column(db.Integer, nullable=False)
+    op = db.Column(db.String(10), nullable=False)  # 'upsert' or 'delete' (tombstone)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class ChangeLogWatermark(db.Model):
+    """Highest change_log id removed by pruning (a single row)"""
+    id = db.Column(db.Integer, primary_key=True)
+    pruned_through = db.Column(db.Integer, default=0, nullable=False)
+
+
+# --------------------
+# Notification (replies and answers, see app/notifications.py)
+# --------------------
+class Notification(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)  # recipient
+    kind = db.Column(db.String(20), nullable=False)  # 'reply' or 'comment'
+    actor_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # No FKs: rows are cleared by the outbox after their question/comment is deleted
+    question_id = db.Column(db.Integer, nullable=False)
+    comment_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    read_at = db.Column(db.DateTime, nullable=True)
+    emailed_at = db.Column(db.DateTime, nullable=True)  # set by the digest job
+
+    __table_args__ = (
+        # One notification per recipient per comment, so replayed events are no-ops
+        db.UniqueConstraint('user_id', 'comment_id', name='unique_notification'),
+        db.Index('ix_notification_user', 'user_id', 'id'),
+        db.Index('ix_notification_digest', 'emailed_at', 'user_id'),
+    )
+
+
+# --------------------
+# Vote history (append-only log + rollups, see app/votelog.py)
+# --------------------
+class VoteEvent(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    target_type = db.Column(db.String(10), nullable=False)  # 'question' or 'comment'
+    target_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    value = db.Column(db.SmallInteger, nullable=False)  # vote after the change; 0 = removed
+    previous = db.Column(db.SmallInteger, nullable=False)  # vote before the change
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class VoteRollup(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    resolution = db.Column(db.String(10), nullable=False)  # 'minute', 'hour' or 'day'
+    target_type = db.Column(db.String(10), nullable=False)
+    target_id = db.Column(db.Integer, nullable=False)
+    bucket = db.Column(db.DateTime, nullable=False)  # bucket start (UTC)
+    upvotes = db.Column(db.Integer, default=0, nullable=False)  # votes cast or switched to +1
+    downvotes = db.Column(db.Integer, default=0, nullable=False)
+    score = db.Column(db.Integer, default=0, nullable=False)  # net score change
+    events = db.Column(db.Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('resolution', 'target_type', 'target_id', 'bucket',
+                            name='unique_vote_rollup'),
+        db.Index('ix_vote_rollup_retention', 'resolution', 'bucket'),
+    )
+
+
+class VoteRollupCursor(db.Model):
+    """Last vote_event id folded into the rollups (a single row)"""
+    id = db.Column(db.Integer, primary_key=True)
+    last_event_id = db.Column(db.Integer, default=0, nullable=False)
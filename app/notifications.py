@@ -0,0 +1,237 @@
+"""Reply notifications and batched email digests.
+
+Each ``comment.created`` event (see ``app/outbox.py``) notifies the
+question's author and, for replies, the author of the parent comment. All
+of an event's notifications go in with one multi-row INSERT.
+``user.unread_notifications`` changes in the same transaction, so the unread
+badge costs one primary-key read instead of a ``COUNT(*)``.
+
+``flask send-digests`` (run from cron) groups unsent, unread notifications
+per user and mails each user a single digest. Every message in the run goes
+over one SMTP connection, instead of a connection per email as
+``send_otp_email`` does.
+"""
+import smtplib
+from datetime import datetime
+from html import escape
+
+from flask import current_app
+from sqlalchemy import delete, func, insert, select, update
+from app import db
+from app.models import Comment, Notification, Question, User
+from app.providers import get_mail
+
+
+# -------------------- Fan-out --------------------
+
+def _bump_unread(user_ids, delta):
+    db.session.execute(
+        update(User).where(User.id.in_(user_ids))
+        .values(unread_notifications=User.unread_notifications + delta)
+    )
+
+
+def notify_comment(comment_id):
+    """Notify everyone a new comment is addressed to. Does not commit."""
+    comment = db.session.get(Comment, comment_id)
+    if comment is None:
+        return 0
+    recipients = {}
+    if comment.parent_id is not None:
+        parent = db.session.get(Comment, comment.parent_id)
+        if parent is not None:
+            recipients[parent.user_id] = 'reply'
+    question = db.session.get(Question, comment.question_id)
+    if question is not None:
+        recipients.setdefault(question.user_id, 'comment')
+    recipients.pop(comment.user_id, None)
+
+    # Replayed events find their notifications already there
+    existing = set(db.session.execute(
+        select(Notification.user_id).where(Notification.comment_id == comment.id)
+    ).scalars())
+    now = datetime.utcnow()
+    rows = [
+        dict(user_id=user_id, kind=kind, actor_id=comment.user_id,
+             question_id=comment.question_id, comment_id=comment.id, created_at=now)
+        for user_id, kind in recipients.items() if user_id not in existing
+    ]
+    if rows:
+        db.session.execute(insert(Notification), rows)
+        _bump_unread([row['user_id'] for row in rows], 1)
+    return len(rows)
+
+
+def drop_notifications(*conditions):
+    """Delete matching notifications, un-counting the unread ones. Does not commit."""
+    unread = db.session.execute(
+        select(Notification.user_id, func.count())
+        .where(*conditions, Notification.read_at.is_(None))
+        .group_by(Notification.user_id)
+    ).all()
+    for user_id, count in unread:
+        _bump_unread([user_id], -count)
+    db.session.execute(delete(Notification).where(*conditions))
+
+
+def mark_read(user_id, ids=None):
+    """Mark the user's notifications (all, or just ``ids``) read; returns how many"""
+    conditions = [Notification.user_id == user_id, Notification.read_at.is_(None)]
+    if ids is not None:
+        conditions.append(Notification.id.in_(ids))
+    result = db.session.execute(
+        update(Notification).where(*conditions).values(read_at=datetime.utcnow())
+    )
+    # rowcount only includes rows this statement flipped, so concurrent
+    # requests can't decrement the same notification twice
+    if result.rowcount:
+        _bump_unread([user_id], -result.rowcount)
+    db.session.commit()
+    return result.rowcount
+
+
+# -------------------- Listing --------------------
+
+def serialize(notifications):
+    """API dicts for a page of notifications, with actor names and question titles"""
+    actor_ids = {n.actor_id for n in notifications}
+    question_ids = {n.question_id for n in notifications}
+    actors = dict(db.session.execute(
+        select(User.id, User.username).where(User.id.in_(actor_ids))
+    ).all()) if actor_ids else {}
+    titles = dict(db.session.execute(
+        select(Question.id, Question.title).where(Question.id.in_(question_ids))
+    ).all()) if question_ids else {}
+    return [{
+        "id": n.id,
+        "kind": n.kind,
+        "actor": actors.get(n.actor_id),
+        "question_id": n.question_id,
+        "question_title": titles.get(n.question_id),
+        "comment_id": n.comment_id,
+        "created_at": n.created_at.isoformat(),
+        "read": n.read_at is not None,
+    } for n in notifications]
+
+
+# -------------------- Digests --------------------
+
+def _digest_message(user, items, total):
+    from flask_mail import Message
+
+    get_mail()  # registers the extension Message reads its default sender from
+    site = current_app.config['SITE_URL'].rstrip('/')
+    lines = ''.join(
+        f'<li><b>{escape(item["actor"] or "Someone")}</b> '
+        f'{"replied to your comment on" if item["kind"] == "reply" else "commented on"} '
+        f'<a href="{site}/questions/{item["question_id"]}">'
+        f'{escape(item["question_title"] or "a question")}</a></li>'
+        for item in items
+    )
+    more = f'<p>…and {total - len(items)} more.</p>' if total > len(items) else ''
+    return Message(
+        subject=f'StudentHub - {total} new repl{"y" if total == 1 else "ies"}',
+        recipients=[user.email],
+        html=f'''
+        <div style="font-family: Arial, sans-serif; max-width: 500px; margin: 0 auto; padding: 20px;">
+            <h2 style="color: #4F46E5;">🎓 What you missed on StudentHub</h2>
+            <ul>{lines}</ul>
+            {more}
+        </div>
+        '''
+    )
+
+
+def _connection_lost(error):
+    """True if the SMTP connection is gone; False if only this message was refused"""
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    # SMTPException subclasses OSError, but a refused recipient leaves the connection usable
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+class DigestMailer:
+    """One SMTP connection for a digest run, reopened once if the server drops it"""
+
+    def __init__(self):
+        self.conn = None
+
+    def send(self, message):
+        if self.conn is None:
+            # Connect on first use so an idle run never touches SMTP
+            self.conn = get_mail().connect().__enter__()
+            self.conn.send(message)
+            return
+        try:
+            self.conn.send(message)
+            return
+        except Exception as e:
+            if not _connection_lost(e):
+                raise
+            print(f"Digest SMTP connection lost, reconnecting: {e}")
+        self.close()
+        self.send(message)
+
+    def close(self):
+        if self.conn is not None:
+            try:
+                self.conn.__exit__(None, None, None)
+            except (smtplib.SMTPException, OSError):
+                pass  # already hung up
+            self.conn = None
+
+
+def send_digests(batch_size=100, max_items=20):
+    """Mail one digest to every user with pending notifications; returns emails sent.
+
+    Users are handled ``batch_size`` at a time, each batch committed once its
+    messages are out. A failed send leaves that user's notifications pending
+    for the next run. If the SMTP server can't be reached (even after one
+    reconnect), the run commits what it sent and stops.
+    """
+    pending = (Notification.emailed_at.is_(None), Notification.read_at.is_(None))
+    sent = 0
+    after = 0
+    mailer = DigestMailer()
+    stopped = False
+    try:
+        while not stopped:
+            user_ids = db.session.execute(
+                select(Notification.user_id).where(*pending, Notification.user_id > after)
+                .group_by(Notification.user_id).order_by(Notification.user_id)
+                .limit(batch_size)
+            ).scalars().all()
+            if not user_ids:
+                break
+            after = user_ids[-1]
+
+            notifications = db.session.execute(
+                select(Notification).where(*pending, Notification.user_id.in_(user_ids))
+                .order_by(Notification.id)
+            ).scalars().all()
+            users = {u.id: u for u in User.query.filter(User.id.in_(user_ids))}
+            by_user = {}
+            for n in notifications:
+                by_user.setdefault(n.user_id, []).append(n)
+
+            done = []
+            for user_id, items in by_user.items():
+                try:
+                    mailer.send(_digest_message(users[user_id], serialize(items[:max_items]), len(items)))
+                except Exception as e:
+                    print(f"Digest email error (user {user_id}): {e}")
+                    if mailer.conn is None or _connection_lost(e):
+                        stopped = True
+                        break
+                    continue
+                done.extend(n.id for n in items)
+                sent += 1
+            if done:
+                db.session.execute(
+                    update(Notification).where(Notification.id.in_(done))
+                    .values(emailed_at=datetime.utcnow())
+                )
+            db.session.commit()
+    finally:
+        mailer.close()
+    return sent
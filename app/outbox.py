@@ -0,0 +1,253 @@
+"""Transactional outbox for keeping derived data in step with writes.
+
+Route handlers call ``record`` in the same transaction as the write, so an
+event exists exactly when the write it describes committed. A dispatcher
+claims events in id order (``FOR UPDATE SKIP LOCKED`` on Postgres, so any
+number of workers can run side by side), hands each to the consumers
+subscribed to its topic and deletes it once they all succeed. Failures are
+retried with exponential backoff.
+
+Delivery is at-least-once and events for one item may be handled out of
+order, so consumers re-read the current state of the item instead of
+trusting the payload, which makes replays harmless.
+"""
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import delete, event, func, select, update
+from sqlalchemy.orm import Session
+from app import db
+from app.models import Blog, OutboxEvent, Question
+
+MAX_ATTEMPTS = 10
+MAX_BACKOFF = 300  # seconds
+
+_consumers = {}
+_counters = {"delivered": 0, "failed": 0}
+_counters_lock = threading.Lock()
+
+
+# -------------------- Recording --------------------
+
+def record(topic, aggregate_id, **payload):
+    """Add an event to the current transaction. Does not commit."""
+    db.session.add(OutboxEvent(
+        topic=topic,
+        aggregate_type=topic.split('.')[0],
+        aggregate_id=aggregate_id,
+        payload=payload,
+    ))
+    db.session.info['outbox_pending'] = True
+    if current_app.config['OUTBOX_DISPATCHER'] == 'thread':
+        _ensure_dispatcher(current_app._get_current_object())
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_after_commit(session):
+    if session.info.pop('outbox_pending', False):
+        _wake.set()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _clear_after_rollback(session):
+    session.info.pop('outbox_pending', None)
+
+
+# -------------------- Consumers --------------------
+
+def consumer(*topics):
+    """Subscribe a function taking an OutboxEvent to the given topics"""
+    def decorator(fn):
+        for topic in topics:
+            _consumers.setdefault(topic, []).append(fn)
+        return fn
+    return decorator
+
+
+@consumer('question.created', 'question.tagged', 'question.deleted',
+          'blog.created', 'blog.deleted')
+def _refresh_related(evt):
+    from app.related import refresh_related
+    # Tags of a deleted item are gone, so this also clears its edges
+    refresh_related(evt.aggregate_type, evt.aggregate_id)
+
+
+@consumer('question.created', 'question.updated')
+def _index_duplicates(evt):
+    from app.dedup import index_question
+    if evt.topic == 'question.updated' and not evt.payload.get('title_changed'):
+        return
+    q = db.session.get(Question, evt.aggregate_id)
+    if q is not None:
+        index_question(q)
+
+
+@consumer('blog.created', 'blog.updated', 'blog.deleted',
+          'question.created', 'question.updated', 'question.deleted')
+def _sync_tfidf(evt):
+    from app import tfidf
+    if evt.aggregate_type == 'blog':
+        item = db.session.get(Blog, evt.aggregate_id)
+        text = item and f"{item.title}\n{item.content}"
+    else:
+        item = db.session.get(Question, evt.aggregate_id)
+        text = item and f"{item.title}\n{item.description}"
+    if item is None:
+        tfidf.remove_document(evt.aggregate_type, evt.aggregate_id)
+    else:
+        tfidf.append_document(evt.aggregate_type, evt.aggregate_id, text)
+
+
+@consumer('blog.created', 'blog.updated', 'blog.deleted',
+          'question.created', 'question.updated', 'question.tagged', 'question.deleted',
+          'comment.created', 'comment.updated', 'comment.deleted', 'tag.created')
+def _log_change(evt):
+    from app.changes import log_change
+    log_change(evt.aggregate_type, evt.aggregate_id)
+
+
+@consumer('comment.created')
+def _notify(evt):
+    from app.notifications import notify_comment
+    notify_comment(evt.aggregate_id)
+
+
+@consumer('comment.deleted', 'question.deleted')
+def _drop_notifications(evt):
+    from app.models import Comment, Notification
+    from app.notifications import drop_notifications
+    if evt.aggregate_type == 'comment':
+        if db.session.get(Comment, evt.aggregate_id) is None:
+            drop_notifications(Notification.comment_id == evt.aggregate_id)
+    elif db.session.get(Question, evt.aggregate_id) is None:
+        drop_notifications(Notification.question_id == evt.aggregate_id)
+
+
+@consumer('user.avatar_changed')
+def _refresh_avatar(evt):
+    from app.avatars import refresh_user
+    refresh_user(evt.aggregate_id)
+
+
+# -------------------- Dispatching --------------------
+
+def dispatch(batch_size=100):
+    """Deliver one batch of due events; returns how many were claimed"""
+    now = datetime.utcnow()
+    events = db.session.execute(
+        select(OutboxEvent)
+        .where(OutboxEvent.available_at <= now, OutboxEvent.attempts < MAX_ATTEMPTS)
+        .order_by(OutboxEvent.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+
+    delivered, failed = [], []
+    for evt in events:
+        topic, aggregate_id = evt.topic, evt.aggregate_id
+        try:
+            with db.session.begin_nested():
+                for fn in _consumers.get(topic, ()):
+                    fn(evt)
+            delivered.append(evt.id)
+        except Exception as e:
+            print(f"Outbox delivery error ({topic} #{aggregate_id}): {e}")
+            failed.append((evt.id, evt.attempts + 1, str(e)[:1000]))
+
+    if delivered:
+        db.session.execute(delete(OutboxEvent).where(OutboxEvent.id.in_(delivered)))
+    for event_id, attempts, error in failed:
+        db.session.execute(
+            update(OutboxEvent).where(OutboxEvent.id == event_id).values(
+                attempts=attempts, last_error=error,
+                available_at=now + timedelta(seconds=min(2 ** attempts, MAX_BACKOFF)),
+            )
+        )
+    # If this fails nothing was acknowledged and the batch is simply redelivered
+    db.session.commit()
+    with _counters_lock:
+        _counters["delivered"] += len(delivered)
+        _counters["failed"] += len(failed)
+    return len(events)
+
+
+def drain(batch_size=100):
+    """Dispatch until no due events remain; returns how many were claimed"""
+    total = 0
+    while True:
+        claimed = dispatch(batch_size)
+        total += claimed
+        if claimed < batch_size:
+            return total
+
+
+def stats():
+    """Backlog size and lag of the outbox, plus this process's counters"""
+    now = datetime.utcnow()
+    live = OutboxEvent.attempts < MAX_ATTEMPTS
+    pending, oldest = db.session.execute(
+        select(func.count(), func.min(OutboxEvent.created_at)).where(live)
+    ).one()
+    retrying = db.session.execute(
+        select(func.count()).where(live, OutboxEvent.attempts > 0)
+    ).scalar()
+    dead = db.session.execute(
+        select(func.count()).where(OutboxEvent.attempts >= MAX_ATTEMPTS)
+    ).scalar()
+    by_topic = dict(db.session.execute(
+        select(OutboxEvent.topic, func.count()).where(live).group_by(OutboxEvent.topic)
+    ).all())
+    with _counters_lock:
+        counters = dict(_counters)
+    return {
+        "pending": pending,
+        "lag_seconds": round((now - oldest).total_seconds(), 3) if oldest else 0.0,
+        "retrying": retrying,
+        "dead": dead,
+        "pending_by_topic": by_topic,
+        **counters,
+    }
+
+
+def requeue_dead():
+    """Give events that exhausted their retries another round"""
+    result = db.session.execute(
+        update(OutboxEvent)
+        .where(OutboxEvent.attempts >= MAX_ATTEMPTS)
+        .values(attempts=0, available_at=datetime.utcnow())
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+# -------------------- Background Dispatcher --------------------
+
+_wake = threading.Event()
+_dispatchers = set()
+_dispatchers_lock = threading.Lock()
+
+
+def _ensure_dispatcher(app):
+    with _dispatchers_lock:
+        if app in _dispatchers:
+            return
+        _dispatchers.add(app)
+
+    interval = app.config['OUTBOX_POLL_INTERVAL_MS'] / 1000.0
+    batch_size = app.config['OUTBOX_BATCH_SIZE']
+
+    def run():
+        while True:
+            _wake.wait(interval)
+            _wake.clear()
+            with app.app_context():
+                try:
+                    drain(batch_size)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Outbox dispatcher error: {e}")
+                finally:
+                    db.session.remove()
+
+    threading.Thread(target=run, name='outbox-dispatcher', daemon=True).start()
@@ -0,0 +1,126 @@
+"""Maintenance for the Postgres partitions created by migration fb5a9471e5c0.
+
+``comment`` is range-partitioned by month on ``created_at``. Upcoming months
+must exist before rows arrive (otherwise they land in ``comment_default``),
+and cold months can be archived: rewritten with lz4 TOAST compression, and
+optionally moved to a tablespace on cheaper/compressed storage. Archived
+partitions stay attached, so they remain queryable.
+"""
+import re
+from datetime import datetime
+from sqlalchemy import text
+from app import db
+
+ARCHIVED_COMMENT = 'archived'
+_PARTITION_NAME = re.compile(r'^comment_y(\d{4})m(\d{2})(_archived)?$')
+
+
+def _month_add(year, month, n):
+    index = year * 12 + (month - 1) + n
+    return index // 12, index % 12 + 1
+
+
+def is_partitioned():
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    return bool(db.session.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'comment'::regclass"
+    )).scalar())
+
+
+def comment_partitions():
+    """Return [(name, year, month, archived)] for monthly comment partitions"""
+    rows = db.session.execute(text("""
+        SELECT c.relname, obj_description(c.oid, 'pg_class')
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'comment'::regclass
+        ORDER BY c.relname
+    """))
+    partitions = []
+    for name, comment in rows:
+        m = _PARTITION_NAME.match(name)
+        if m:
+            partitions.append((name, int(m.group(1)), int(m.group(2)),
+                               comment == ARCHIVED_COMMENT))
+    return partitions
+
+
+def ensure_comment_partitions(months_ahead=3):
+    """Create monthly partitions up to ``months_ahead``; returns names created"""
+    existing = {(y, m) for _, y, m, _ in comment_partitions()}
+    now = datetime.utcnow()
+    created = []
+    for n in range(months_ahead + 1):
+        year, month = _month_add(now.year, now.month, n)
+        if (year, month) in existing:
+            continue
+        ny, nm = _month_add(year, month, 1)
+        name = f"comment_y{year}m{month:02d}"
+        # Fails if comment_default already holds rows for this month; move
+        # them out by hand (rare: only when `ensure` was not run in time)
+        db.session.execute(text(f"""
+            CREATE TABLE {name} PARTITION OF comment
+            FOR VALUES FROM ('{year}-{month:02d}-01') TO ('{ny}-{nm:02d}-01')
+        """))
+        created.append(name)
+    db.session.commit()
+    return created
+
+
+def archive_comment_partitions(older_than_months=12, tablespace=None):
+    """Rewrite cold monthly partitions compressed; returns names archived.
+
+    Each partition is copied into a new table with lz4 compression for
+    ``content`` (re-compressing every value), then swapped in with
+    DETACH/ATTACH in one transaction. Writes to that month wait on a SHARE
+    lock during the copy; reads keep working throughout.
+    """
+    now = datetime.utcnow()
+    cutoff = _month_add(now.year, now.month, -older_than_months)
+    columns = [
+        name for (name,) in db.session.execute(text("""
+            SELECT attname FROM pg_attribute
+            WHERE attrelid = 'comment'::regclass AND attnum > 0 AND NOT attisdropped
+            ORDER BY attnum
+        """))
+    ]
+    select_list = ', '.join(
+        # Concatenation detoasts the value so it is compressed again with lz4
+        "content || ''" if col == 'content' else f'"{col}"' for col in columns
+    )
+    target_space = f" TABLESPACE {tablespace}" if tablespace else ""
+
+    archived = []
+    for name, year, month, done in comment_partitions():
+        if done or (year, month) >= cutoff:
+            continue
+        ny, nm = _month_add(year, month, 1)
+        low, high = f"{year}-{month:02d}-01", f"{ny}-{nm:02d}-01"
+        new = f"{name}_archived"
+
+        db.session.execute(text(f"LOCK TABLE {name} IN SHARE MODE"))
+        db.session.execute(text(
+            f"CREATE TABLE {new} (LIKE {name} INCLUDING DEFAULTS INCLUDING CONSTRAINTS){target_space}"
+        ))
+        db.session.execute(text(f"ALTER TABLE {new} ALTER COLUMN content SET COMPRESSION lz4"))
+        db.session.execute(text(
+            f"INSERT INTO {new} ({', '.join(columns)}) SELECT {select_list} FROM {name}"
+        ))
+        # Matching CHECK lets ATTACH skip its validation scan
+        db.session.execute(text(
+            f"ALTER TABLE {new} ADD CONSTRAINT {new}_bounds "
+            f"CHECK (created_at >= '{low}' AND created_at < '{high}')"
+        ))
+        db.session.execute(text(f"ALTER TABLE comment DETACH PARTITION {name}"))
+        db.session.execute(text(
+            f"ALTER TABLE comment ATTACH PARTITION {new} FOR VALUES FROM ('{low}') TO ('{high}')"
+        ))
+        db.session.execute(text(f"DROP TABLE {name}"))
+        db.session.execute(text(f"COMMENT ON TABLE {new} IS '{ARCHIVED_COMMENT}'"))
+        db.session.commit()
+
+        # Freeze once so autovacuum never needs to revisit the cold month
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            conn.execute(text(f"VACUUM (FREEZE, ANALYZE) {new}"))
+        archived.append(new)
+    return archived
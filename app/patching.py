@@ -0,0 +1,53 @@
+"""Delta updates for PATCH endpoints.
+
+A patch is a list of operations applied in order to a dict of text fields:
+
+* ``{"op": "replace", "path": "/title", "value": "..."}`` (JSON Patch)
+* ``{"op": "test", "path": "/title", "value": "..."}`` (JSON Patch)
+* ``{"op": "splice", "path": "/content", "offset": 120, "remove": 5,
+  "insert": "..."}`` replaces ``remove`` characters at ``offset``
+
+Splice offsets count Unicode code points, so an autosave only sends the
+edited region of a long body.
+"""
+
+
+class PatchError(ValueError):
+    """The patch is malformed or doesn't apply to the current text"""
+
+
+def _field(op, fields):
+    path = op.get("path")
+    if not isinstance(path, str) or not path.startswith("/") or path[1:] not in fields:
+        raise PatchError(f"Invalid path {path!r}")
+    return path[1:]
+
+
+def apply_ops(fields, ops):
+    """Return a copy of ``fields`` with ``ops`` applied"""
+    if not isinstance(ops, list) or not ops:
+        raise PatchError("'ops' must be a non-empty list")
+    result = dict(fields)
+    for op in ops:
+        if not isinstance(op, dict):
+            raise PatchError("Each op must be an object")
+        name = _field(op, result)
+        kind = op.get("op")
+        if kind in ("replace", "test"):
+            value = op.get("value")
+            if not isinstance(value, str):
+                raise PatchError(f"'{kind}' needs a string value")
+            if kind == "test" and result[name] != value:
+                raise PatchError(f"Test failed for /{name}")
+            result[name] = value
+        elif kind == "splice":
+            offset, remove, insert = op.get("offset"), op.get("remove", 0), op.get("insert", "")
+            text = result[name]
+            if (not isinstance(offset, int) or not isinstance(remove, int)
+                    or not isinstance(insert, str)
+                    or offset < 0 or remove < 0 or offset + remove > len(text)):
+                raise PatchError(f"Splice out of range for /{name}")
+            result[name] = text[:offset] + insert + text[offset + remove:]
+        else:
+            raise PatchError(f"Unsupported op {kind!r}")
+    return result
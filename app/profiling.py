@@ -0,0 +1,273 @@
+"""Opt-in request profiling for production.
+
+A request is profiled when it carries a valid ``X-Profile-Token`` header
+(minted with ``flask profile-token``) or is picked at random at
+``PROFILE_SAMPLE_RATE``. A background thread samples the request thread's
+stack every ``PROFILE_INTERVAL_MS`` and every SQL statement is timed. The
+result is written to ``PROFILE_DIR``, which keeps only the newest
+``PROFILE_MAX_FILES`` profiles. Profiles can be listed and downloaded as
+JSON, collapsed stacks (for flamegraph.pl) or speedscope files from
+``/admin/profiles``, using the same token.
+"""
+import hashlib
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from flask import current_app, g, has_request_context, jsonify, request, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+TOKEN_HEADER = 'X-Profile-Token'
+MAX_SQL_STATEMENTS = 500
+
+
+# -------------------- Tokens --------------------
+
+def _sign(secret, expires):
+    return hmac.new(secret.encode(), str(expires).encode(), hashlib.sha256).hexdigest()
+
+
+def make_token(secret, ttl):
+    """Return a token valid for ``ttl`` seconds"""
+    expires = int(time.time()) + ttl
+    return f"{expires}.{_sign(secret, expires)}"
+
+
+def token_valid(token):
+    secret = current_app.config['PROFILE_SECRET']
+    if not secret or not token or '.' not in token:
+        return False
+    expires, signature = token.split('.', 1)
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(signature, _sign(secret, expires))
+
+
+# -------------------- Sampling --------------------
+
+def _frame_label(code):
+    path = code.co_filename
+    short = os.path.join(os.path.basename(os.path.dirname(path)), os.path.basename(path))
+    return f"{code.co_name} ({short}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Collects the stacks of one thread at a fixed interval"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        labels = {}
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = labels.get(code)
+                if label is None:
+                    label = labels[code] = _frame_label(code)
+                stack.append(label)
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+
+
+# -------------------- SQL Timings --------------------
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'profile' in g:
+        conn.info.setdefault('profile_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('profile_started')
+    if not started or not has_request_context() or 'profile' not in g:
+        return
+    elapsed = (time.perf_counter() - started.pop()) * 1000
+    profile = g.profile
+    profile['sql_ms'] += elapsed
+    profile['sql_count'] += 1
+    if len(profile['sql']) < MAX_SQL_STATEMENTS:
+        profile['sql'].append({
+            "statement": statement[:2000],
+            "ms": round(elapsed, 3),
+            "rows": cursor.rowcount,
+        })
+
+
+# -------------------- Storage --------------------
+
+def _profile_dir():
+    return current_app.config['PROFILE_DIR']
+
+
+def _save(profile):
+    directory = _profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{profile['id']}.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(profile, f)
+    os.replace(tmp, path)
+
+    # Ring buffer: ids sort by time, so the oldest come first
+    names = sorted(n for n in os.listdir(directory) if n.endswith('.json'))
+    for name in names[:-current_app.config['PROFILE_MAX_FILES']]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except OSError:
+            pass
+
+
+def _load(profile_id):
+    if not all(c.isalnum() or c == '-' for c in profile_id):
+        return None
+    try:
+        with open(os.path.join(_profile_dir(), f"{profile_id}.json")) as f:
+            return json.load(f)
+    except OSError:
+        return None
+
+
+def collapsed(profile):
+    """Brendan Gregg's collapsed stack format, one ``a;b;c count`` per line"""
+    return ''.join(f"{stack} {count}\n" for stack, count in profile['stacks'].items())
+
+
+def speedscope(profile):
+    """Speedscope 'sampled' profile document"""
+    frames, index = [], {}
+    samples, weights = [], []
+    # Samples are skipped while the request holds the GIL, so spread the
+    # measured wall time over the samples actually taken
+    per_sample = profile['duration_ms'] / max(profile['samples'], 1)
+    for stack, count in profile['stacks'].items():
+        sample = []
+        for name in stack.split(';'):
+            if name not in index:
+                index[name] = len(frames)
+                frames.append({"name": name})
+            sample.append(index[name])
+        samples.append(sample)
+        weights.append(round(count * per_sample, 3))
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": f"{profile['method']} {profile['path']}",
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }],
+        "name": profile['id'],
+        "exporter": "studenthub",
+    }
+
+
+# -------------------- Request Hooks & Routes --------------------
+
+def register_profiling(app):
+    """Install the profiling hooks and the admin endpoints"""
+
+    @app.before_request
+    def start_profile():
+        if request.path.startswith('/admin/profiles'):
+            return
+        if not (token_valid(request.headers.get(TOKEN_HEADER))
+                or random.random() < app.config['PROFILE_SAMPLE_RATE']):
+            return
+        interval = app.config['PROFILE_INTERVAL_MS']
+        sampler = StackSampler(threading.get_ident(), interval / 1000.0)
+        g.profile = {
+            "started": time.time(), "t0": time.perf_counter(), "interval_ms": interval,
+            "sampler": sampler, "sql": [], "sql_ms": 0.0, "sql_count": 0,
+        }
+        sampler.start()
+
+    @app.after_request
+    def finish_profile(response):
+        profile = g.pop('profile', None)
+        if profile is None:
+            return response
+        sampler = profile.pop('sampler')
+        sampler.stop()
+        started = profile.pop('t0')
+        profile_id = f"{int(profile['started'] * 1000)}-{uuid.uuid4().hex[:8]}"
+        profile.update(
+            id=profile_id,
+            method=request.method,
+            path=request.path,
+            endpoint=request.endpoint,
+            status=response.status_code,
+            duration_ms=round((time.perf_counter() - started) * 1000, 3),
+            sql_ms=round(profile['sql_ms'], 3),
+            samples=sum(sampler.stacks.values()),
+            stacks={';'.join(stack): n for stack, n in sampler.stacks.items()},
+        )
+        try:
+            _save(profile)
+            response.headers['X-Profile-Id'] = profile_id
+        except OSError as e:
+            print(f"Profile save error: {e}")
+        return response
+
+    @app.route("/admin/profiles", methods=["GET"])
+    def list_profiles():
+        if not token_valid(request.headers.get(TOKEN_HEADER)):
+            return jsonify({"message": "Forbidden"}), 403
+        directory = _profile_dir()
+        try:
+            names = sorted((n for n in os.listdir(directory) if n.endswith('.json')), reverse=True)
+        except OSError:
+            names = []
+        summaries = []
+        for name in names:
+            profile = _load(name[:-5])
+            if profile:
+                summaries.append({key: profile[key] for key in (
+                    "id", "method", "path", "status", "duration_ms",
+                    "sql_ms", "sql_count", "samples", "started",
+                )})
+        return jsonify(summaries)
+
+    @app.route("/admin/profiles/<string:profile_id>", methods=["GET"])
+    def download_profile(profile_id):
+        if not token_valid(request.headers.get(TOKEN_HEADER)):
+            return jsonify({"message": "Forbidden"}), 403
+        profile = _load(profile_id)
+        if profile is None:
+            return jsonify({"message": "Profile not found"}), 404
+
+        fmt = request.args.get("format", "json")
+        if fmt == "collapsed":
+            return Response(collapsed(profile), mimetype="text/plain")
+        if fmt == "speedscope":
+            response = jsonify(speedscope(profile))
+            response.headers['Content-Disposition'] = \
+                f'attachment; filename="{profile_id}.speedscope.json"'
+            return response
+        return jsonify(profile)
@@ -0,0 +1,166 @@
+"""Lazily constructed OAuth provider clients and mail.
+
+Nothing in here is imported or fetched while the app boots; workers that only
+serve reads never pay for Authlib, Flask-Mail or Google's OIDC discovery.
+"""
+import json
+import os
+import threading
+import time
+
+from flask import current_app
+
+GOOGLE_DISCOVERY_URL = 'https://accounts.google.com/.well-known/openid-configuration'
+
+_lock = threading.Lock()
+
+
+# -------------------- Mail --------------------
+
+def get_mail():
+    """Return the app's Flask-Mail instance, creating it on first use"""
+    app = current_app._get_current_object()
+    mail = app.extensions.get('studenthub.mail')
+    if mail is None:
+        with _lock:
+            mail = app.extensions.get('studenthub.mail')
+            if mail is None:
+                from flask_mail import Mail
+                mail = Mail(app)
+                app.extensions['studenthub.mail'] = mail
+    return mail
+
+
+# -------------------- OAuth --------------------
+
+def _github_config(app):
+    return dict(
+        client_id=os.getenv('GITHUB_CLIENT_ID'),
+        client_secret=os.getenv('GITHUB_CLIENT_SECRET'),
+        access_token_url='https://github.com/login/oauth/access_token',
+        authorize_url='https://github.com/login/oauth/authorize',
+        api_base_url='https://api.github.com/',
+        client_kwargs={'scope': 'user:email'},
+    )
+
+
+def _google_config(app):
+    config = dict(
+        client_id=os.getenv('GOOGLE_CLIENT_ID'),
+        client_secret=os.getenv('GOOGLE_CLIENT_SECRET'),
+        server_metadata_url=GOOGLE_DISCOVERY_URL,
+        client_kwargs={'scope': 'openid email profile'},
+    )
+    metadata = load_oidc_metadata(
+        GOOGLE_DISCOVERY_URL,
+        app.config['OIDC_CACHE_PATH'],
+        app.config['OIDC_CACHE_TTL'],
+    )
+    if metadata:
+        # Authlib skips discovery when '_loaded_at' is present, and skips the
+        # JWKS fetch when 'jwks' is present.
+        config.update(metadata)
+    return config
+
+
+def _pooled_session_cls(app):
+    """Return an OAuth2Session subclass whose instances share one keep-alive pool.
+
+    Authlib builds a fresh session for every token exchange and API call, so
+    without this each OAuth callback opens new TLS connections to the provider.
+    """
+    cls = app.extensions.get('studenthub.oauth_session_cls')
+    if cls is None:
+        from requests.adapters import HTTPAdapter
+        from authlib.integrations.requests_client import OAuth2Session
+
+        adapter = HTTPAdapter(
+            pool_connections=len(PROVIDERS) * 2,
+            pool_maxsize=app.config['OAUTH_HTTP_POOL_SIZE'],
+        )
+
+        class PooledOAuth2Session(OAuth2Session):
+            def __init__(self, *args, **kwargs):
+                kwargs.setdefault('default_timeout', app.config['OAUTH_HTTP_TIMEOUT'])
+                super().__init__(*args, **kwargs)
+                self.mount('https://', adapter)
+                self.mount('http://', adapter)
+
+            def close(self):
+                # The adapter is shared; closing it would drop pooled connections
+                pass
+
+        cls = app.extensions['studenthub.oauth_session_cls'] = PooledOAuth2Session
+    return cls
+
+
+PROVIDERS = {
+    'github': _github_config,
+    'google': _google_config,
+}
+
+
+def get_oauth_client(name):
+    """Return the named Authlib client, registering the provider on first use"""
+    app = current_app._get_current_object()
+    with _lock:
+        oauth = app.extensions.get('studenthub.oauth')
+        if oauth is None:
+            from authlib.integrations.flask_client import OAuth
+            oauth = OAuth(app)
+            app.extensions['studenthub.oauth'] = oauth
+        client = oauth.create_client(name)
+        if client is None:
+            client = oauth.register(name=name, **PROVIDERS[name](app))
+            client.client_cls = _pooled_session_cls(app)
+    return client
+
+
+# -------------------- OIDC Discovery Cache --------------------
+
+def load_oidc_metadata(discovery_url, cache_path, ttl):
+    """Return discovery metadata (with 'jwks' inlined) from a local file cache.
+
+    The document is refetched once it is older than ``ttl`` seconds. If the
+    refetch fails a stale copy is preferred over failing the login; ``None``
+    means there is nothing cached and Authlib should discover on its own.
+    """
+    cached = _read_cache(cache_path)
+    if cached and time.time() - cached.get('_loaded_at', 0) < ttl:
+        return cached
+
+    try:
+        import requests
+        resp = requests.get(discovery_url, timeout=5)
+        resp.raise_for_status()
+        metadata = resp.json()
+        jwks_resp = requests.get(metadata['jwks_uri'], timeout=5)
+        jwks_resp.raise_for_status()
+        metadata['jwks'] = jwks_resp.json()
+    except Exception as e:
+        print(f"OIDC discovery error: {e}")
+        return cached
+
+    metadata['_loaded_at'] = time.time()
+    _write_cache(cache_path, metadata)
+    return metadata
+
+
+def _read_cache(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(path, data):
+    """Write atomically so concurrent workers never read a torn file"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"OIDC cache write error: {e}")
@@ -0,0 +1,354 @@
+"""Per-process read cache with single-flight loads and warm-start snapshots.
+
+Hot read models (a blog or question page, the tag list, popular
+questions) are cached per worker for ``READ_CACHE_TTL`` seconds. When
+several requests miss the same key at once, only the first runs the query.
+The others wait for its result. A commit that records outbox events for an
+item drops that item's entries in the committing worker. Other workers
+catch up within the TTL.
+
+``flask snapshot`` writes the tag list, the ``SNAPSHOT_QUESTIONS``
+highest-scored questions and their detail payloads to ``SNAPSHOT_PATH``.
+The file starts with a small JSON header, followed by sorted id arrays and
+JSON records. A new worker memory-maps it and, for its first
+``SNAPSHOT_WARMUP_SECONDS``, answers misses from it by binary search instead
+of hitting the database. A key this worker has written is not answered
+from the snapshot again, because the snapshot predates that write.
+Snapshots older than ``SNAPSHOT_MAX_AGE`` are ignored.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session, joinedload
+from app import db
+from app.models import Blog, OutboxEvent, Question, QuestionVote, Tag, User
+
+MAGIC = b'SHSNAP1\n'
+MISSING = object()
+
+_lock = threading.Lock()
+
+
+# -------------------- Read Models --------------------
+
+def blog_payload(blog):
+    """GET /blogs/<id> body; also used by the async read path"""
+    return {
+        "id": blog.id,
+        "title": blog.title,
+        "content": blog.content,
+        "content_html": blog.content_html,
+        "reading_time": blog.reading_time,
+        "author": blog.author.username,
+        "tags": [{"id": t.id, "name": t.name} for t in blog.tags],
+        "version": blog.version
+    }
+
+
+def question_payload(q):
+    """GET /questions/<id> body; also used by the async read path"""
+    return {
+        "id": q.id,
+        "title": q.title,
+        "description": q.description,
+        "author": q.author.username,
+        "comment_count": q.comment_count,
+        "last_activity_at": q.last_activity_at.isoformat(),
+        "version": q.version
+    }
+
+
+def blog_detail(blog_id):
+    blog = db.session.get(Blog, blog_id, options=[joinedload(Blog.author)])
+    return blog and blog_payload(blog)
+
+
+def question_detail(question_id):
+    q = db.session.get(Question, question_id, options=[joinedload(Question.author)])
+    return q and question_payload(q)
+
+
+def tag_list(_key=0):
+    return [{"id": t.id, "name": t.name} for t in Tag.query.all()]
+
+
+def popular_questions(_key=0):
+    """Highest-scored questions with their authors, by committed votes"""
+    score = func.coalesce(func.sum(QuestionVote.value), 0).label('score')
+    rows = db.session.execute(
+        select(Question.id, Question.title, User.username, Question.comment_count, score)
+        .join(User, User.id == Question.user_id)
+        .outerjoin(QuestionVote, QuestionVote.question_id == Question.id)
+        .group_by(Question.id, Question.title, User.username, Question.comment_count)
+        .order_by(score.desc(), Question.comment_count.desc(), Question.id.desc())
+        .limit(current_app.config['SNAPSHOT_QUESTIONS'])
+    )
+    return [
+        {"id": qid, "title": title, "author": author,
+         "comment_count": comments, "score": int(total)}
+        for qid, title, author, comments, total in rows
+    ]
+
+
+LOADERS = {
+    'blog': blog_detail,
+    'question': question_detail,
+    'tags': tag_list,
+    'popular': popular_questions,
+}
+
+
+# -------------------- Single-flight Cache --------------------
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.stale = False  # invalidated while loading; don't cache the result
+
+
+class ReadCache:
+    def __init__(self, ttl, size, snapshot=None, warmup=0):
+        self.ttl = ttl
+        self.size = size
+        self.snapshot = snapshot
+        self.warm_until = time.monotonic() + warmup
+        self._entries = {}
+        self._flights = {}
+        # Keys written since boot: the snapshot predates those writes
+        self._invalidated = set()
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "coalesced": 0, "snapshot_hits": 0}
+
+    def get(self, section, key, loader):
+        cache_key = (section, key)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry and entry[0] > now:
+                self.counters["hits"] += 1
+                return entry[1]
+            flight = self._flights.get(cache_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[cache_key] = _Flight()
+                self.counters["misses"] += 1
+            else:
+                self.counters["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            value = MISSING
+            if (self.snapshot is not None and now < self.warm_until
+                    and cache_key not in self._invalidated):
+                value = self.snapshot.get(section, key)
+                if value is not MISSING:
+                    with self._lock:
+                        self.counters["snapshot_hits"] += 1
+            if value is MISSING:
+                value = loader(key)
+            flight.value = value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(cache_key, None)
+                if flight.error is None and not flight.stale:
+                    if len(self._entries) >= self.size:
+                        self._entries.clear()
+                    self._entries[cache_key] = (time.monotonic() + self.ttl, flight.value)
+            flight.done.set()
+        return value
+
+    def invalidate(self, keys):
+        warming = self.snapshot is not None and time.monotonic() < self.warm_until
+        with self._lock:
+            for cache_key in keys:
+                self._entries.pop(cache_key, None)
+                if warming:
+                    self._invalidated.add(cache_key)
+                flight = self._flights.get(cache_key)
+                if flight is not None:
+                    flight.stale = True
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self.counters,
+                "entries": len(self._entries),
+                "snapshot": self.snapshot.info() if self.snapshot else None,
+                "warming": time.monotonic() < self.warm_until,
+            }
+
+
+def get_cache():
+    """Return this process's cache, mapping the snapshot on first use"""
+    app = current_app._get_current_object()
+    cache = app.extensions.get('studenthub.read_cache')
+    if cache is None:
+        with _lock:
+            cache = app.extensions.get('studenthub.read_cache')
+            if cache is None:
+                snapshot = open_snapshot(
+                    app.config['SNAPSHOT_PATH'], app.config['SNAPSHOT_MAX_AGE']
+                )
+                cache = ReadCache(
+                    app.config['READ_CACHE_TTL'], app.config['READ_CACHE_SIZE'],
+                    snapshot, app.config['SNAPSHOT_WARMUP_SECONDS'],
+                )
+                app.extensions['studenthub.read_cache'] = cache
+    return cache
+
+
+def cached(section, key=0):
+    """Cached value of a read model (None if the item doesn't exist)"""
+    return get_cache().get(section, key, LOADERS[section])
+
+
+# -------------------- Invalidation --------------------
+# Every write records outbox events in its transaction, so the events
+# flushed in a session name exactly the items to drop once it commits
+
+def _stale_keys(evt):
+    kind, item_id = evt.aggregate_type, evt.aggregate_id
+    keys = []
+    if kind in ('blog', 'question'):
+        keys.append((kind, item_id))
+    if kind == 'comment' and evt.payload.get('question_id'):
+        keys.append(('question', evt.payload['question_id']))
+    if evt.topic in ('blog.created', 'question.created', 'question.tagged', 'tag.created'):
+        keys.append(('tags', 0))
+    if kind in ('question', 'comment'):
+        keys.append(('popular', 0))
+    return keys
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_stale_keys(session, flush_context):
+    for obj in session.new:
+        if isinstance(obj, OutboxEvent) and not obj.payload.get('buffered'):
+            session.info.setdefault('stale_cache_keys', set()).update(_stale_keys(obj))
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    keys = session.info.pop('stale_cache_keys', None)
+    if keys and has_app_context():
+        cache = current_app.extensions.get('studenthub.read_cache')
+        if cache is not None:
+            cache.invalidate(keys)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _clear_after_rollback(session):
+    session.info.pop('stale_cache_keys', None)
+
+
+# -------------------- Snapshots --------------------
+
+class Snapshot:
+    """Read-only view of a snapshot file; records are decoded on lookup"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError("not a snapshot file")
+        (header_len,) = struct.unpack_from('<I', self._map, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(self._map[start:start + header_len])
+        self.created_at = header['created_at']
+        view = memoryview(self._map)
+        self._sections = {}
+        for name, (offset, count) in header['sections'].items():
+            ids = view[offset:offset + 4 * count].cast('I')
+            ends = view[offset + 4 * count:offset + 8 * count].cast('I')
+            self._sections[name] = (ids, ends, offset + 8 * count)
+
+    def get(self, section, key):
+        if section not in self._sections:
+            return MISSING
+        ids, ends, blob = self._sections[section]
+        i = bisect_left(ids, key)
+        if i == len(ids) or ids[i] != key:
+            return MISSING
+        begin = blob + (ends[i - 1] if i else 0)
+        return json.loads(self._map[begin:blob + ends[i]])
+
+    def info(self):
+        return {
+            "created_at": self.created_at,
+            "records": {name: len(ids) for name, (ids, _, _) in self._sections.items()},
+        }
+
+
+def open_snapshot(path, max_age):
+    try:
+        if time.time() - os.path.getmtime(path) > max_age:
+            return None
+        return Snapshot(path)
+    except (OSError, ValueError) as e:
+        if not isinstance(e, FileNotFoundError):
+            print(f"Snapshot load error: {e}")
+        return None
+
+
+def _pack_section(records):
+    """ids, record end offsets and JSON blobs of {id: value}, ids ascending"""
+    ids, ends, blobs, end = array('I'), array('I'), [], 0
+    for key in sorted(records):
+        blob = json.dumps(records[key], separators=(',', ':')).encode()
+        blobs.append(blob)
+        end += len(blob)
+        ids.append(key)
+        ends.append(end)
+    return ids.tobytes() + ends.tobytes() + b''.join(blobs), len(ids)
+
+
+def write_snapshot(path):
+    """Serialize the hot read models to ``path``; returns record counts"""
+    popular = popular_questions()
+    sections = {
+        'tags': {0: tag_list()},
+        'popular': {0: popular},
+        'question': {q['id']: question_detail(q['id']) for q in popular},
+    }
+    packed = {name: _pack_section(records) for name, records in sections.items()}
+
+    # Offsets depend on the header's length, so size it with placeholders
+    # first; section data starts 4-byte aligned for the uint32 arrays
+    layout = {name: [0, count] for name, (_, count) in packed.items()}
+    header = {"created_at": datetime.utcnow().isoformat(), "sections": layout}
+    header_len = len(json.dumps(header).encode()) + 16 * len(layout)
+    offset = len(MAGIC) + 4 + header_len
+    offset += -offset % 4
+    body = b''
+    for name, (data, count) in packed.items():
+        layout[name][0] = offset + len(body)
+        body += data + b'\0' * (-len(data) % 4)
+    encoded = json.dumps(header).encode()
+    encoded += b' ' * (offset - len(MAGIC) - 4 - len(encoded))
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC + struct.pack('<I', len(encoded)) + encoded + body)
+    # Workers that mapped the old file keep reading it until they restart
+    os.replace(tmp, path)
+    return {name: count for name, (_, count) in packed.items()}
@@ -0,0 +1,204 @@
+"""Related questions and blogs from tag co-occurrence.
+
+``rebuild_related`` (run via ``flask build-related``) builds a sparse
+item x tag matrix over every question and blog and stores each item's top-k
+neighbours in ``related_item``. ``refresh_related`` patches a single item
+with plain SQL when its tags change, so the read endpoint is always one
+indexed lookup.
+"""
+import math
+from sqlalchemy import delete, func, insert, select, tuple_
+from app import db
+from app.models import RelatedItem, Tag, question_tags, blog_tags
+
+RELATED_K = 10
+# Only the strongest candidates are scored on the incremental path
+CANDIDATE_LIMIT = 200
+# Every item carries one of these, so they say nothing about similarity
+DEFAULT_TAGS = ('question', 'blog')
+
+SOURCES = {
+    'question': (question_tags, question_tags.c.question_id),
+    'blog': (blog_tags, blog_tags.c.blog_id),
+}
+
+
+def _default_tag_ids():
+    return [tid for (tid,) in db.session.query(Tag.id).filter(Tag.name.in_(DEFAULT_TAGS))]
+
+
+def _score(shared, deg_a, deg_b, metric):
+    if metric == 'jaccard':
+        return shared / (deg_a + deg_b - shared)
+    return shared / math.sqrt(deg_a * deg_b)
+
+
+# -------------------- Offline Build --------------------
+
+def top_k_neighbours(matrix, k=RELATED_K, metric='cosine', batch_size=1024):
+    """Yield (rows, cols, scores) arrays with each row's k best neighbours.
+
+    ``matrix`` is a binary item x tag CSR matrix. Similarities are computed a
+    batch of rows at a time as sparse products, so memory stays bounded by the
+    number of co-occurring pairs in a batch rather than items squared.
+    """
+    import numpy as np
+
+    X = matrix.tocsr().astype(np.float32)
+    XT = X.T.tocsc()
+    deg = np.asarray(X.sum(axis=1)).ravel()
+
+    for start in range(0, X.shape[0], batch_size):
+        S = (X[start:start + batch_size] @ XT).tocsr()
+        rows = np.repeat(np.arange(S.shape[0]), np.diff(S.indptr)) + start
+        cols = S.indices
+        shared = S.data
+
+        if metric == 'jaccard':
+            scores = shared / (deg[rows] + deg[cols] - shared)
+        else:
+            scores = shared / np.sqrt(deg[rows] * deg[cols])
+
+        keep = (cols != rows) & (scores > 0)
+        rows, cols, scores = rows[keep], cols[keep], scores[keep]
+
+        # Sort by (row, -score) and keep the first k entries of every row
+        order = np.lexsort((-scores, rows))
+        rows, cols, scores = rows[order], cols[order], scores[order]
+        rank = np.arange(len(rows)) - np.searchsorted(rows, rows, side='left')
+        top = rank < k
+        yield rows[top], cols[top], scores[top]
+
+
+def build_tag_matrix():
+    """Return (items, matrix) where items[i] is the (type, id) of matrix row i"""
+    import numpy as np
+    from scipy.sparse import csr_matrix
+
+    skip = _default_tag_ids()
+    items, index = [], {}
+    tag_cols = {}
+    row_idx, col_idx = [], []
+    for item_type, (assoc, item_col) in SOURCES.items():
+        pairs = db.session.execute(
+            select(item_col, assoc.c.tag_id)
+            .where(assoc.c.tag_id.not_in(skip))
+            .order_by(item_col)
+        )
+        for item_id, tag_id in pairs:
+            key = (item_type, item_id)
+            if key not in index:
+                index[key] = len(items)
+                items.append(key)
+            row_idx.append(index[key])
+            col_idx.append(tag_cols.setdefault(tag_id, len(tag_cols)))
+
+    data = np.ones(len(row_idx), dtype=np.float32)
+    matrix = csr_matrix((data, (row_idx, col_idx)), shape=(len(items), len(tag_cols)))
+    return items, matrix
+
+
+def rebuild_related(k=RELATED_K, metric='cosine', batch_size=1024):
+    """Recompute every item's neighbours and replace related_item wholesale"""
+    items, matrix = build_tag_matrix()
+
+    db.session.execute(delete(RelatedItem))
+    total = 0
+    for rows, cols, scores in top_k_neighbours(matrix, k, metric, batch_size):
+        if not len(rows):
+            continue
+        db.session.execute(insert(RelatedItem), [
+            {
+                "item_type": items[r][0], "item_id": items[r][1],
+                "related_type": items[c][0], "related_id": items[c][1],
+                "score": float(s),
+            }
+            for r, c, s in zip(rows.tolist(), cols.tolist(), scores.tolist())
+        ])
+        total += len(rows)
+    db.session.commit()
+    return len(items), total
+
+
+# -------------------- Incremental Updates --------------------
+
+def forget_related(item_type, item_id):
+    """Drop an item's neighbour list and every edge pointing at it"""
+    db.session.execute(delete(RelatedItem).where(
+        (RelatedItem.item_type == item_type) & (RelatedItem.item_id == item_id)
+    ))
+    db.session.execute(delete(RelatedItem).where(
+        (RelatedItem.related_type == item_type) & (RelatedItem.related_id == item_id)
+    ))
+
+
+def refresh_related(item_type, item_id, k=RELATED_K, metric='cosine'):
+    """Recompute one item's neighbours after its tags changed.
+
+    The item's own list is rebuilt from co-occurrence counts over the
+    (tag_id, item_id) indexes, and reverse edges are added to each new
+    neighbour's list, trimmed back to k. Lists of items that lost this
+    neighbour may be short by one until the next ``flask build-related``.
+    Does not commit.
+    """
+    skip = _default_tag_ids()
+    assoc, item_col = SOURCES[item_type]
+    tag_ids = [
+        tid for (tid,) in db.session.execute(
+            select(assoc.c.tag_id).where(item_col == item_id, assoc.c.tag_id.not_in(skip))
+        )
+    ]
+    forget_related(item_type, item_id)
+    if not tag_ids:
+        return
+
+    candidates = []
+    for other_type, (other_assoc, other_col) in SOURCES.items():
+        query = (
+            select(other_col, func.count())
+            .where(other_assoc.c.tag_id.in_(tag_ids))
+            .group_by(other_col)
+            .order_by(func.count().desc())
+            .limit(CANDIDATE_LIMIT)
+        )
+        if other_type == item_type:
+            query = query.where(other_col != item_id)
+        shared = dict(db.session.execute(query).all())
+        if not shared:
+            continue
+        degrees = dict(db.session.execute(
+            select(other_col, func.count())
+            .where(other_col.in_(shared), other_assoc.c.tag_id.not_in(skip))
+            .group_by(other_col)
+        ).all())
+        candidates.extend(
+            (_score(n, len(tag_ids), degrees[oid], metric), other_type, oid)
+            for oid, n in shared.items()
+        )
+
+    top = sorted(candidates, key=lambda c: -c[0])[:k]
+    if not top:
+        return
+
+    rows = []
+    for score, other_type, other_id in top:
+        rows.append({"item_type": item_type, "item_id": item_id,
+                     "related_type": other_type, "related_id": other_id, "score": score})
+        rows.append({"item_type": other_type, "item_id": other_id,
+                     "related_type": item_type, "related_id": item_id, "score": score})
+    db.session.execute(insert(RelatedItem), rows)
+
+    # Trim neighbours' lists back to their k best entries
+    ranked = select(
+        RelatedItem.id,
+        func.row_number().over(
+            partition_by=(RelatedItem.item_type, RelatedItem.item_id),
+            order_by=RelatedItem.score.desc(),
+        ).label('rank'),
+    ).where(
+        tuple_(RelatedItem.item_type, RelatedItem.item_id)
+        .in_([(t, i) for _, t, i in top])
+    ).subquery()
+    db.session.execute(delete(RelatedItem).where(
+        RelatedItem.id.in_(select(ranked.c.id).where(ranked.c.rank > k))
+    ))
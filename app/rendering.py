@@ -0,0 +1,99 @@
+"""Markdown rendering for blog content.
+
+Blogs are rendered once when they are written; the sanitized HTML, a
+plain-text excerpt and the reading time are stored next to the source so
+read endpoints never render.
+"""
+import hashlib
+import html
+import math
+import re
+import threading
+from collections import OrderedDict
+
+import bleach
+import markdown
+
+# Bump whenever the output of render_content() changes, then run
+# `flask render-blogs` to re-render stored rows.
+RENDERER_VERSION = 1
+
+EXCERPT_LENGTH = 280
+WORDS_PER_MINUTE = 200
+RENDER_CACHE_SIZE = 512
+
+MARKDOWN_EXTENSIONS = ['fenced_code', 'tables', 'sane_lists']
+
+ALLOWED_TAGS = [
+    'a', 'abbr', 'b', 'blockquote', 'br', 'code', 'em', 'h1', 'h2', 'h3',
+    'h4', 'h5', 'h6', 'hr', 'i', 'img', 'li', 'ol', 'p', 'pre', 'strong',
+    'table', 'tbody', 'td', 'th', 'thead', 'tr', 'ul',
+]
+ALLOWED_ATTRIBUTES = {
+    'a': ['href', 'title'],
+    'abbr': ['title'],
+    'code': ['class'],
+    'img': ['src', 'alt', 'title'],
+}
+
+_WHITESPACE = re.compile(r'\s+')
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def render_content(text):
+    """Render Markdown to sanitized HTML plus excerpt and reading time"""
+    raw_html = markdown.markdown(text, extensions=MARKDOWN_EXTENSIONS)
+    content_html = bleach.clean(
+        raw_html, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES, strip=True
+    )
+
+    plain = html.unescape(bleach.clean(raw_html, tags=[], strip=True))
+    plain = _WHITESPACE.sub(' ', plain).strip()
+    if len(plain) > EXCERPT_LENGTH:
+        cut = plain[:EXCERPT_LENGTH].rsplit(' ', 1)[0]
+        excerpt = cut.rstrip('.,;:!?') + '…'
+    else:
+        excerpt = plain
+
+    words = len(plain.split())
+    return {
+        "content_html": content_html,
+        "excerpt": excerpt,
+        "reading_time": max(1, math.ceil(words / WORDS_PER_MINUTE)),
+    }
+
+
+def render_cached(digest, text):
+    """render_content() memoized on the content hash"""
+    with _cache_lock:
+        rendered = _cache.get(digest)
+        if rendered is not None:
+            _cache.move_to_end(digest)
+            return rendered
+
+    rendered = render_content(text)
+    with _cache_lock:
+        _cache[digest] = rendered
+        if len(_cache) > RENDER_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return rendered
+
+
+def apply_render(blog):
+    """Refresh a blog's rendered columns, skipping unchanged content"""
+    digest = content_hash(blog.content)
+    if blog.content_hash == digest and blog.render_version == RENDERER_VERSION:
+        return
+
+    rendered = render_cached(digest, blog.content)
+    blog.content_html = rendered["content_html"]
+    blog.excerpt = rendered["excerpt"]
+    blog.reading_time = rendered["reading_time"]
+    blog.content_hash = digest
+    blog.render_version = RENDERER_VERSION
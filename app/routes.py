@@ -1,9 +1,237 @@
-from flask import request, jsonify
+from datetime import datetime, timedelta, timezone
+import os
+from flask import request, jsonify, send_file, send_from_directory
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import login_user, logout_user, login_required, current_user
-from app.models import User, Blog, Question, Comment, QuestionVote, CommentVote, Tag
+from sqlalchemy import func, select, tuple_, update
+from sqlalchemy.orm import joinedload, selectinload
+from app.models import (
+    User, Blog, Question, Comment, QuestionVote, CommentVote, Tag, RelatedItem,
+    Notification, question_tags, blog_tags,
+)
+from app.rendering import apply_render
+from app.patching import PatchError, apply_ops
+from app.related import RELATED_K
+from app.dedup import find_similar, unindex_question
+from app.outbox import record
+from app.admission import route_class
+from app.timeouts import statement_timeout
+from app import avatars, changes, hotqueries, notifications, outbox, readcache, suggest, tfidf, votelog, votes
+from app.feeds import tag_filename
 from app import db
 
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def parse_tag_names(value):
+    """Split a comma-separated tag list, normalizing like create_question"""
+    if not value:
+        return []
+    names = (name.lower().strip().lstrip('#') for name in value.split(','))
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def page_args():
+    """Return (after, limit) for keyset pagination on descending ids"""
+    after = request.args.get("after", type=int)
+    limit = request.args.get("limit", PAGE_SIZE, type=int)
+    return after, max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def keyset_page(query, model, after, limit):
+    """Fetch one page newest-first; returns (items, next_cursor)"""
+    if after is not None:
+        query = query.filter(model.id < after)
+    items = query.order_by(model.id.desc()).limit(limit + 1).all()
+    if len(items) > limit:
+        return items[:limit], items[limit - 1].id
+    return items, None
+
+
+def sorted_keyset_page(query, column, after, limit):
+    """Fetch one page ordered by (column, id) descending.
+
+    The cursor is "<value>_<id>" of the last item on the previous page, where
+    the value is an int or an ISO timestamp depending on ``column``.
+    """
+    if after:
+        value, _, last_id = after.rpartition("_")
+        if isinstance(column.type, db.DateTime):
+            value = datetime.fromisoformat(value)
+        else:
+            value = int(value)
+        query = query.filter(tuple_(column, Question.id) < (value, int(last_id)))
+    items = query.order_by(column.desc(), Question.id.desc()).limit(limit + 1).all()
+    if len(items) > limit:
+        items = items[:limit]
+        last = getattr(items[-1], column.key)
+        value = last.isoformat() if isinstance(last, datetime) else last
+        return items, f"{value}_{items[-1].id}"
+    return items, None
+
+
+def parse_utc(value):
+    """Parse an optional ISO 8601 timestamp into naive UTC"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def blog_summary(b):
+    """One entry of GET /blogs (shared with the async read path)"""
+    return {
+        "id": b.id,
+        "title": b.title,
+        "excerpt": b.excerpt,
+        "reading_time": b.reading_time,
+        "author": b.author.username,
+        "tags": [{"id": t.id, "name": t.name} for t in b.tags]
+    }
+
+
+def comment_tree(comments):
+    """Nest a question's comments (id order) under their parents"""
+    nodes = {
+        c.id: {"id": c.id, "content": c.content, "author": c.author.username, "replies": []}
+        for c in comments
+    }
+    roots = []
+    for c in comments:
+        if c.parent_id is None:
+            roots.append(nodes[c.id])
+        elif c.parent_id in nodes:
+            nodes[c.parent_id]["replies"].append(nodes[c.id])
+    return roots
+
+
+def search_results(questions, blogs):
+    return {
+        "questions": [
+            {"id": x.id, "title": x.title, "author": x.author.username}
+            for x in questions
+        ],
+        "blogs": [
+            {"id": b.id, "title": b.title, "author": b.author.username}
+            for b in blogs
+        ]
+    }
+
+
+def tag_conditions(model, assoc, item_col, all_names, any_names, none_names):
+    """Build filters for AND / OR / NOT tag matching over an association table.
+
+    Returns None when the filters can't match anything (e.g. an ``all`` tag
+    doesn't exist), so callers can skip the query entirely.
+    """
+    names = set(all_names) | set(any_names) | set(none_names)
+    ids = dict(db.session.query(Tag.name, Tag.id).filter(Tag.name.in_(names)).all())
+
+    if any(name not in ids for name in all_names):
+        return None
+    any_ids = [ids[name] for name in any_names if name in ids]
+    if any_names and not any_ids:
+        return None
+    none_ids = [ids[name] for name in none_names if name in ids]
+
+    conditions = []
+    if all_names:
+        all_ids = [ids[name] for name in all_names]
+        # Served by the (tag_id, item_id) index: one range scan per tag
+        conditions.append(model.id.in_(
+            select(item_col)
+            .where(assoc.c.tag_id.in_(all_ids))
+            .group_by(item_col)
+            .having(func.count() == len(all_ids))
+        ))
+    if any_ids:
+        conditions.append(model.id.in_(
+            select(item_col).where(assoc.c.tag_id.in_(any_ids))
+        ))
+    if none_ids:
+        conditions.append(model.id.not_in(
+            select(item_col).where(assoc.c.tag_id.in_(none_ids))
+        ))
+    return conditions
+
+
+def related_items(item_type, item_id):
+    """Precomputed neighbours of an item, resolved in a single query"""
+    limit = max(1, min(request.args.get("limit", RELATED_K, type=int), RELATED_K))
+    rows = db.session.query(
+        RelatedItem.related_type, RelatedItem.related_id, RelatedItem.score,
+        Question.title, Blog.title
+    ).outerjoin(Question, (RelatedItem.related_type == "question")
+                & (Question.id == RelatedItem.related_id)
+    ).outerjoin(Blog, (RelatedItem.related_type == "blog")
+                & (Blog.id == RelatedItem.related_id)
+    ).filter(
+        RelatedItem.item_type == item_type, RelatedItem.item_id == item_id
+    ).order_by(RelatedItem.score.desc()).limit(limit).all()
+
+    return [
+        {"type": rtype, "id": rid, "title": qtitle or btitle, "score": round(score, 4)}
+        for rtype, rid, score, qtitle, btitle in rows
+        if qtitle or btitle
+    ]
+
+
+def bump_question_activity(question_id, delta, touch=True):
+    """Adjust a question's comment_count in place; returns False if it's gone"""
+    values = {
+        "comment_count": Question.comment_count + delta,
+        # Counters aren't an edit; keep updated_at (and the change feed) quiet
+        "updated_at": Question.updated_at,
+    }
+    if touch:
+        values["last_activity_at"] = datetime.utcnow()
+    result = db.session.execute(
+        update(Question).where(Question.id == question_id).values(**values)
+    )
+    return result.rowcount > 0
+
+
+def claim_version(model, item_id, expected):
+    """Compare-and-set an item's version to ``expected + 1``; False on conflict"""
+    result = db.session.execute(
+        update(model).where(model.id == item_id, model.version == expected)
+        .values(version=expected + 1)
+    )
+    return result.rowcount > 0
+
+
+def version_conflict(model, item_id):
+    db.session.rollback()
+    current = db.session.execute(select(model.version).where(model.id == item_id)).scalar()
+    return jsonify({"message": "Version conflict", "version": current}), 409
+
+
+def is_version(value):
+    """A client-supplied version must be a real int (JSON true is not 1)"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def patch_fields(item, model, fields):
+    """Validate a PATCH body against ``item``; returns (new_values, error_response)"""
+    data = request.json or {}
+    version = data.get("version")
+    if not is_version(version):
+        return None, (jsonify({"message": "Integer 'version' required"}), 400)
+    if version != item.version:
+        return None, version_conflict(model, item.id)
+    try:
+        new = apply_ops({name: getattr(item, name) for name in fields}, data.get("ops"))
+    except PatchError as e:
+        return None, (jsonify({"message": str(e)}), 400)
+    if any(not new[name].strip() for name in fields):
+        return None, (jsonify({"message": "Fields can't be empty"}), 400)
+    if len(new["title"]) > 200:
+        return None, (jsonify({"message": "Title too long"}), 400)
+    return new, None
+
 
 def register_routes(app):
 
@@ -12,6 +240,7 @@ def register_routes(app):
         return "<h1>Welcome to StudentHub!</h1>"
 
     @app.route("/signup", methods=["POST"])
+    @route_class('critical')
     def signup():
         data = request.json
         hashed = generate_password_hash(data["password"])
@@ -21,19 +250,23 @@ def register_routes(app):
             password=hashed
         )
         db.session.add(user)
+        db.session.flush()
+        record("user.created", user.id)
         db.session.commit()
         return jsonify({"message": "User created"})
 
     @app.route("/login", methods=["POST"])
+    @route_class('critical')
     def login():
         data = request.json
-        user = User.query.filter_by(email=data["email"]).first()
+        user = hotqueries.user_by_email(data["email"])
         if user and check_password_hash(user.password, data["password"]):
             login_user(user)
             return jsonify({"message": "Login success"})
         return jsonify({"message": "Invalid credentials"}), 401
 
     @app.route("/logout")
+    @route_class('critical')
     def logout():
         logout_user()
         return jsonify({"message": "Logged out"})
@@ -55,10 +288,11 @@ def register_routes(app):
             content=data["content"],
             user_id=current_user.id
         )
+        apply_render(blog)
         db.session.add(blog)
         
         # Add default "blog" tag
-        blog_tag = Tag.query.filter_by(name="blog").first()
+        blog_tag = hotqueries.tag_by_name("blog")
         if not blog_tag:
             blog_tag = Tag(name="blog")
             db.session.add(blog_tag)
@@ -68,39 +302,56 @@ def register_routes(app):
         for tag_name in tags_list:
             tag_name = tag_name.lower().strip().lstrip('#')
             if tag_name and tag_name != "blog":
-                tag = Tag.query.filter_by(name=tag_name).first()
+                tag = hotqueries.tag_by_name(tag_name)
                 if not tag:
                     tag = Tag(name=tag_name)
                     db.session.add(tag)
                 if tag not in blog.tags:
                     blog.tags.append(tag)
         
+        db.session.flush()
+        record("blog.created", blog.id, user_id=current_user.id)
         db.session.commit()
         return jsonify({"message": "Blog created", "id": blog.id})
 
     @app.route("/blogs", methods=["GET"])
+    @route_class('bulk')
     def get_blogs():
         blogs = Blog.query.all()
-        return jsonify([
-            {
-                "id": b.id,
-                "title": b.title,
-                "content": b.content,
-                "author": b.author.username,
-                "tags": [{"id": t.id, "name": t.name} for t in b.tags]
-            } for b in blogs
-        ])
+        return jsonify([blog_summary(b) for b in blogs])
 
     @app.route("/blogs/<int:id>", methods=["GET"])
     def get_blog(id):
+        blog = readcache.cached("blog", id)
+        if blog is None:
+            return jsonify({"message": "Blog not found"}), 404
+        return jsonify(blog)
+
+    @app.route("/blogs/<int:id>/related", methods=["GET"])
+    @route_class('bulk')
+    def get_related_for_blog(id):
+        return jsonify(related_items("blog", id))
+
+    @app.route("/blogs/<int:id>/similar", methods=["GET"])
+    @route_class('bulk')
+    def get_similar_blogs(id):
+        """Posts with similar content, from the local TF-IDF index"""
         blog = Blog.query.get_or_404(id)
-        return jsonify({
-            "id": blog.id,
-            "title": blog.title,
-            "content": blog.content,
-            "author": blog.author.username,
-            "tags": [{"id": t.id, "name": t.name} for t in blog.tags]
-        })
+        k = max(1, min(request.args.get("limit", 10, type=int), 50))
+        matches = tfidf.similar("blog", blog.id, f"{blog.title}\n{blog.content}", k)
+
+        titles = {}
+        for item_type, model in (("blog", Blog), ("question", Question)):
+            ids = [i for t, i, _ in matches if t == item_type]
+            if ids:
+                titles.update(
+                    ((item_type, i), title) for i, title in
+                    db.session.query(model.id, model.title).filter(model.id.in_(ids))
+                )
+        return jsonify([
+            {"type": t, "id": i, "title": titles[(t, i)], "score": round(score, 4)}
+            for t, i, score in matches if (t, i) in titles
+        ])
 
     @app.route("/blogs/<int:id>/tags", methods=["GET"])
     def get_blog_tags(id):
@@ -114,10 +365,46 @@ def register_routes(app):
         if blog.user_id != current_user.id:
             return jsonify({"message": "Forbidden"}), 403
         data = request.json
+        if "version" in data:
+            if not is_version(data["version"]):
+                return jsonify({"message": "'version' must be an integer"}), 400
+            if not claim_version(Blog, id, data["version"]):
+                return version_conflict(Blog, id)
+        else:
+            blog.version = Blog.version + 1
         blog.title = data.get("title", blog.title)
         blog.content = data.get("content", blog.content)
+        apply_render(blog)
+        record("blog.updated", blog.id)
+        db.session.commit()
+        return jsonify({"message": "Blog updated", "version": blog.version})
+
+    @app.route("/blogs/<int:id>", methods=["PATCH"])
+    @login_required
+    def patch_blog(id):
+        """Apply ops (see app/patching.py) to title/content at a known version"""
+        blog = Blog.query.get_or_404(id)
+        if blog.user_id != current_user.id:
+            return jsonify({"message": "Forbidden"}), 403
+        new, error = patch_fields(blog, Blog, ("title", "content"))
+        if error:
+            return error
+        fields = [name for name in ("title", "content") if new[name] != getattr(blog, name)]
+        if not fields:
+            return jsonify({"version": blog.version, "fields": [], "changed": {}})
+        if not claim_version(Blog, id, blog.version):
+            return version_conflict(Blog, id)
+
+        derived = ("title", "content_html", "excerpt", "reading_time", "content_hash")
+        before = {name: getattr(blog, name) for name in derived}
+        blog.title, blog.content = new["title"], new["content"]
+        apply_render(blog)
+        record("blog.updated", blog.id)
         db.session.commit()
-        return jsonify({"message": "Blog updated"})
+        # The client already holds the body it patched; send back the rest
+        changed = {name: getattr(blog, name) for name in derived if getattr(blog, name) != before[name]}
+        changed["updated_at"] = blog.updated_at.isoformat()
+        return jsonify({"version": blog.version, "fields": fields, "changed": changed})
 
     @app.route("/blogs/<int:id>", methods=["DELETE"])
     @login_required
@@ -126,6 +413,7 @@ def register_routes(app):
         if blog.user_id != current_user.id:
             return jsonify({"message": "Forbidden"}), 403
         db.session.delete(blog)
+        record("blog.deleted", id)
         db.session.commit()
         return jsonify({"message": "Blog deleted"})
 
@@ -141,6 +429,9 @@ def register_routes(app):
         if len(tags_list) > 5:
             return jsonify({"message": "Maximum 5 tags allowed"}), 400
         
+        # Duplicates are surfaced to the client, not rejected
+        duplicates = find_similar(data["title"])
+
         q = Question(
             title=data["title"],
             description=data["description"],
@@ -149,7 +440,7 @@ def register_routes(app):
         db.session.add(q)
         
         # Add default "question" tag
-        question_tag = Tag.query.filter_by(name="question").first()
+        question_tag = hotqueries.tag_by_name("question")
         if not question_tag:
             question_tag = Tag(name="question")
             db.session.add(question_tag)
@@ -159,17 +450,27 @@ def register_routes(app):
         for tag_name in tags_list:
             tag_name = tag_name.lower().strip().lstrip('#')
             if tag_name and tag_name != "question":
-                tag = Tag.query.filter_by(name=tag_name).first()
+                tag = hotqueries.tag_by_name(tag_name)
                 if not tag:
                     tag = Tag(name=tag_name)
                     db.session.add(tag)
                 if tag not in q.tags:
                     q.tags.append(tag)
         
+        db.session.flush()
+        record("question.created", q.id, user_id=current_user.id)
         db.session.commit()
-        return jsonify({"message": "Question posted", "id": q.id})
+        return jsonify({
+            "message": "Question posted",
+            "id": q.id,
+            "possible_duplicates": [
+                {"id": d.id, "title": d.title, "similarity": round(score, 2)}
+                for d, score in duplicates
+            ]
+        })
 
     @app.route("/questions", methods=["GET"])
+    @route_class('bulk')
     def get_questions():
         questions = Question.query.all()
         return jsonify([
@@ -177,20 +478,81 @@ def register_routes(app):
                 "id": q.id,
                 "title": q.title,
                 "description": q.description,
-                "author": q.author.username
+                "author": q.author.username,
+                "comment_count": q.comment_count,
+                "last_activity_at": q.last_activity_at.isoformat()
             } for q in questions
         ])
 
-    @app.route("/questions/<int:id>", methods=["GET"])
-    def get_question(id):
-        q = Question.query.get_or_404(id)
+    @app.route("/questions/browse", methods=["GET"])
+    @route_class('bulk')
+    @statement_timeout(5000)
+    def browse_questions():
+        """?sort=active|unanswered|recent, keyset paginated via ?after=<next>"""
+        sort = request.args.get("sort", "recent")
+        after = request.args.get("after")
+        limit = max(1, min(request.args.get("limit", PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+        query = Question.query.options(joinedload(Question.author))
+        try:
+            if sort == "active":
+                questions, next_cursor = sorted_keyset_page(
+                    query, Question.comment_count, after, limit
+                )
+            elif sort == "unanswered":
+                questions, next_cursor = keyset_page(
+                    query.filter(Question.comment_count == 0), Question,
+                    int(after) if after else None, limit
+                )
+            elif sort == "recent":
+                questions, next_cursor = sorted_keyset_page(
+                    query, Question.last_activity_at, after, limit
+                )
+            else:
+                return jsonify({"message": "sort must be active, unanswered or recent"}), 400
+        except ValueError:
+            return jsonify({"message": "Invalid cursor"}), 400
         return jsonify({
-            "id": q.id,
-            "title": q.title,
-            "description": q.description,
-            "author": q.author.username
+            "questions": [
+                {
+                    "id": q.id,
+                    "title": q.title,
+                    "author": q.author.username,
+                    "comment_count": q.comment_count,
+                    "last_activity_at": q.last_activity_at.isoformat()
+                } for q in questions
+            ],
+            "next": next_cursor
         })
 
+    @app.route("/questions/<int:id>", methods=["GET"])
+    def get_question(id):
+        q = readcache.cached("question", id)
+        if q is None:
+            return jsonify({"message": "Question not found"}), 404
+        return jsonify(q)
+
+    @app.route("/questions/popular", methods=["GET"])
+    def get_popular_questions():
+        """Highest-scored questions with authors; cached and snapshotted"""
+        return jsonify(readcache.cached("popular"))
+
+    @app.route("/questions/similar", methods=["GET"])
+    @route_class('bulk')
+    def get_similar_questions():
+        """Likely duplicates of a draft question title"""
+        title = request.args.get("title", "")
+        if not title.strip():
+            return jsonify({"message": "Query parameter 'title' required"}), 400
+        return jsonify([
+            {"id": q.id, "title": q.title, "similarity": round(score, 2)}
+            for q, score in find_similar(title)
+        ])
+
+    @app.route("/questions/<int:id>/related", methods=["GET"])
+    @route_class('bulk')
+    def get_related_for_question(id):
+        return jsonify(related_items("question", id))
+
     @app.route("/questions/<int:id>", methods=["PUT"])
     @login_required
     def update_question(id):
@@ -198,10 +560,44 @@ def register_routes(app):
         if q.user_id != current_user.id:
             return jsonify({"message": "Forbidden"}), 403
         data = request.json
-        q.title = data.get("title", q.title)
+        if "version" in data:
+            if not is_version(data["version"]):
+                return jsonify({"message": "'version' must be an integer"}), 400
+            if not claim_version(Question, id, data["version"]):
+                return version_conflict(Question, id)
+        else:
+            q.version = Question.version + 1
+        title = data.get("title", q.title)
+        title_changed = title != q.title
+        q.title = title
         q.description = data.get("description", q.description)
+        record("question.updated", q.id, title_changed=title_changed)
+        db.session.commit()
+        return jsonify({"message": "Question updated", "version": q.version})
+
+    @app.route("/questions/<int:id>", methods=["PATCH"])
+    @login_required
+    def patch_question(id):
+        """Apply ops (see app/patching.py) to title/description at a known version"""
+        q = Question.query.get_or_404(id)
+        if q.user_id != current_user.id:
+            return jsonify({"message": "Forbidden"}), 403
+        new, error = patch_fields(q, Question, ("title", "description"))
+        if error:
+            return error
+        fields = [name for name in ("title", "description") if new[name] != getattr(q, name)]
+        if not fields:
+            return jsonify({"version": q.version, "fields": [], "changed": {}})
+        if not claim_version(Question, id, q.version):
+            return version_conflict(Question, id)
+
+        q.title, q.description = new["title"], new["description"]
+        record("question.updated", q.id, title_changed="title" in fields)
         db.session.commit()
-        return jsonify({"message": "Question updated"})
+        changed = {"updated_at": q.updated_at.isoformat()}
+        if "title" in fields:
+            changed["title"] = q.title
+        return jsonify({"version": q.version, "fields": fields, "changed": changed})
 
     @app.route("/questions/<int:id>", methods=["DELETE"])
     @login_required
@@ -209,7 +605,10 @@ def register_routes(app):
         q = Question.query.get_or_404(id)
         if q.user_id != current_user.id:
             return jsonify({"message": "Forbidden"}), 403
+        # Bands reference the question, so they can't wait for the outbox
+        unindex_question(q.id)
         db.session.delete(q)
+        record("question.deleted", id)
         db.session.commit()
         return jsonify({"message": "Question deleted"})
 
@@ -219,31 +618,41 @@ def register_routes(app):
     @login_required
     def add_comment(qid):
         data = request.json
+        parent_id = data.get("parent_id")
+        if parent_id is not None:
+            # Replies count toward their thread's question, so they must share it
+            parent = db.session.get(Comment, parent_id)
+            if parent is None or parent.question_id != qid:
+                return jsonify({"message": "Invalid parent comment"}), 400
+        if not bump_question_activity(qid, 1):
+            return jsonify({"message": "Question not found"}), 404
         comment = Comment(
             content=data["content"],
             user_id=current_user.id,
             question_id=qid,
-            parent_id=data.get("parent_id")
+            parent_id=parent_id
         )
         db.session.add(comment)
+        db.session.flush()
+        record("comment.created", comment.id, question_id=qid,
+               user_id=current_user.id, parent_id=comment.parent_id)
         db.session.commit()
         return jsonify({"message": "Comment added"})
 
     @app.route("/questions/<int:qid>/comments", methods=["GET"])
+    @statement_timeout(5000)
     def get_comments(qid):
-        comments = Comment.query.filter_by(
-            question_id=qid, parent_id=None
-        ).all()
-
-        def serialize(c):
-            return {
-                "id": c.id,
-                "content": c.content,
-                "author": c.author.username,
-                "replies": [serialize(r) for r in c.replies]
-            }
-
-        return jsonify([serialize(c) for c in comments])
+        q = db.session.get(Question, qid)
+        if q is None:
+            return jsonify({"message": "Question not found"}), 404
+        # Comments can't predate their question; bounding created_at lets
+        # Postgres skip every monthly partition older than the question.
+        # The whole thread comes back in one query and is nested here.
+        comments = Comment.query.options(joinedload(Comment.author)).filter(
+            Comment.question_id == qid,
+            Comment.created_at >= q.created_at
+        ).order_by(Comment.id).all()
+        return jsonify(comment_tree(comments))
 
     @app.route("/comments/<int:id>", methods=["PUT"])
     @login_required
@@ -253,6 +662,7 @@ def register_routes(app):
             return jsonify({"message": "Forbidden"}), 403
         data = request.json
         c.content = data.get("content", c.content)
+        record("comment.updated", c.id, question_id=c.question_id)
         db.session.commit()
         return jsonify({"message": "Comment updated"})
 
@@ -262,13 +672,19 @@ def register_routes(app):
         c = Comment.query.get_or_404(id)
         if c.user_id != current_user.id:
             return jsonify({"message": "Forbidden"}), 403
+        # Replies are kept (re-parented to the top level), so only this one goes.
+        # Its votes go with it: comment_vote has no foreign key to cascade on Postgres
+        CommentVote.query.filter_by(comment_id=id).delete(synchronize_session=False)
         db.session.delete(c)
+        bump_question_activity(c.question_id, -1, touch=False)
+        record("comment.deleted", id, question_id=c.question_id)
         db.session.commit()
         return jsonify({"message": "Comment deleted"})
 
     # -------------------- Vote Routes --------------------
 
     @app.route("/questions/<int:id>/vote", methods=["POST"])
+    @route_class('critical')
     @login_required
     def vote_question(id):
         data = request.json
@@ -276,34 +692,74 @@ def register_routes(app):
         if value not in [1, -1]:
             return jsonify({"message": "Invalid vote value"}), 400
 
-        existing = QuestionVote.query.filter_by(
-            user_id=current_user.id, question_id=id
-        ).first()
+        buffer = votes.get_buffer()
+        if buffer is not None:
+            db.get_or_404(Question, id)
+            return jsonify({"message": votes.buffered_vote(
+                "question", current_user.id, id, value, buffer
+            )})
+
+        existing = hotqueries.question_vote(current_user.id, id)
 
         if existing:
             if existing.value == value:
                 # Remove vote (toggle off)
                 db.session.delete(existing)
+                record("question.voted", id, user_id=current_user.id, value=0)
+                votelog.log_vote("question", current_user.id, id, 0, value)
                 db.session.commit()
                 return jsonify({"message": "Vote removed"})
             else:
                 # Change vote
+                votelog.log_vote("question", current_user.id, id, value, existing.value)
                 existing.value = value
+                record("question.voted", id, user_id=current_user.id, value=value)
                 db.session.commit()
                 return jsonify({"message": "Vote changed"})
         else:
             vote = QuestionVote(user_id=current_user.id, question_id=id, value=value)
             db.session.add(vote)
+            record("question.voted", id, user_id=current_user.id, value=value)
+            votelog.log_vote("question", current_user.id, id, value, 0)
             db.session.commit()
             return jsonify({"message": "Vote recorded"})
 
     @app.route("/questions/<int:id>/votes", methods=["GET"])
+    @route_class('critical')
     def get_question_votes(id):
-        votes = QuestionVote.query.filter_by(question_id=id).all()
-        score = sum(v.value for v in votes)
-        return jsonify({"score": score, "total_votes": len(votes)})
+        score, total = votes.vote_totals("question", id)
+        return jsonify({"score": score, "total_votes": total})
+
+    @app.route("/questions/<int:id>/vote-history", methods=["GET"])
+    def get_question_vote_history(id):
+        """Vote activity per bucket, from the rollups (see app/votelog.py)"""
+        db.get_or_404(Question, id)
+        try:
+            end = parse_utc(request.args.get("to")) or datetime.utcnow()
+            start = parse_utc(request.args.get("from")) or end - timedelta(days=7)
+        except ValueError:
+            return jsonify({"message": "'from' and 'to' must be ISO 8601 timestamps"}), 400
+        if start >= end:
+            return jsonify({"message": "'from' must be before 'to'"}), 400
+
+        resolution = request.args.get("resolution", "auto")
+        if resolution == "auto":
+            resolution = votelog.pick_resolution(
+                start, end,
+                app.config['VOTE_HISTORY_MINUTE_DAYS'], app.config['VOTE_HISTORY_HOUR_DAYS'],
+            )
+        elif resolution not in votelog.RESOLUTIONS:
+            return jsonify({"message": "resolution must be auto, minute, hour or day"}), 400
+
+        return jsonify({
+            "resolution": resolution,
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "points": votelog.history("question", id, start, end, resolution),
+        })
 
     @app.route("/comments/<int:id>/vote", methods=["POST"])
+    @route_class('critical')
     @login_required
     def vote_comment(id):
         data = request.json
@@ -311,34 +767,48 @@ def register_routes(app):
         if value not in [1, -1]:
             return jsonify({"message": "Invalid vote value"}), 400
 
-        existing = CommentVote.query.filter_by(
-            user_id=current_user.id, comment_id=id
-        ).first()
+        # comment_vote has no foreign key on Postgres, so check here
+        db.get_or_404(Comment, id)
+        buffer = votes.get_buffer()
+        if buffer is not None:
+            return jsonify({"message": votes.buffered_vote(
+                "comment", current_user.id, id, value, buffer
+            )})
+
+        existing = hotqueries.comment_vote(current_user.id, id)
 
         if existing:
             if existing.value == value:
                 db.session.delete(existing)
+                record("comment.voted", id, user_id=current_user.id, value=0)
+                votelog.log_vote("comment", current_user.id, id, 0, value)
                 db.session.commit()
                 return jsonify({"message": "Vote removed"})
             else:
+                votelog.log_vote("comment", current_user.id, id, value, existing.value)
                 existing.value = value
+                record("comment.voted", id, user_id=current_user.id, value=value)
                 db.session.commit()
                 return jsonify({"message": "Vote changed"})
         else:
             vote = CommentVote(user_id=current_user.id, comment_id=id, value=value)
             db.session.add(vote)
+            record("comment.voted", id, user_id=current_user.id, value=value)
+            votelog.log_vote("comment", current_user.id, id, value, 0)
             db.session.commit()
             return jsonify({"message": "Vote recorded"})
 
     @app.route("/comments/<int:id>/votes", methods=["GET"])
+    @route_class('critical')
     def get_comment_votes(id):
-        votes = CommentVote.query.filter_by(comment_id=id).all()
-        score = sum(v.value for v in votes)
-        return jsonify({"score": score, "total_votes": len(votes)})
+        score, total = votes.vote_totals("comment", id)
+        return jsonify({"score": score, "total_votes": total})
 
     # -------------------- Search Routes --------------------
 
     @app.route("/search", methods=["GET"])
+    @route_class('bulk')
+    @statement_timeout(3000)
     def search():
         q = request.args.get("q", "")
         if not q:
@@ -354,23 +824,24 @@ def register_routes(app):
             Blog.title.ilike(f"%{q}%") | Blog.content.ilike(f"%{q}%")
         ).all()
 
-        return jsonify({
-            "questions": [
-                {"id": x.id, "title": x.title, "author": x.author.username}
-                for x in questions
-            ],
-            "blogs": [
-                {"id": b.id, "title": b.title, "author": b.author.username}
-                for b in blogs
-            ]
-        })
+        return jsonify(search_results(questions, blogs))
+
+    @app.route("/search/suggest", methods=["GET"])
+    def search_suggest():
+        """Ranked, typo-tolerant title suggestions while typing (see app/suggest.py)"""
+        k = max(1, min(request.args.get("limit", 8, type=int), 20))
+        try:
+            return jsonify(suggest.suggest(request.args.get("q", ""), k))
+        except suggest.SuggestTimeout:
+            # Over the latency budget: the next keystroke will ask again
+            return jsonify([])
 
     # -------------------- Tag Routes --------------------
 
     @app.route("/tags", methods=["GET"])
+    @route_class('bulk')
     def get_tags():
-        tags = Tag.query.all()
-        return jsonify([{"id": t.id, "name": t.name} for t in tags])
+        return jsonify(readcache.cached("tags"))
 
     @app.route("/tags/suggest", methods=["GET"])
     def suggest_tags():
@@ -390,11 +861,13 @@ def register_routes(app):
         name = data.get("name", "").lower().strip()
         if not name:
             return jsonify({"message": "Tag name required"}), 400
-        existing = Tag.query.filter_by(name=name).first()
+        existing = hotqueries.tag_by_name(name)
         if existing:
             return jsonify({"message": "Tag already exists", "id": existing.id})
         tag = Tag(name=name)
         db.session.add(tag)
+        db.session.flush()
+        record("tag.created", tag.id, name=name)
         db.session.commit()
         return jsonify({"message": "Tag created", "id": tag.id})
 
@@ -406,13 +879,15 @@ def register_routes(app):
         tag_name = data.get("tag", "").lower().strip()
 
         # Find or create tag
-        tag = Tag.query.filter_by(name=tag_name).first()
+        tag = hotqueries.tag_by_name(tag_name)
         if not tag:
             tag = Tag(name=tag_name)
             db.session.add(tag)
 
         if tag not in q.tags:
             q.tags.append(tag)
+            q.updated_at = datetime.utcnow()
+            record("question.tagged", q.id, tag=tag_name)
             db.session.commit()
             return jsonify({"message": f"Tag '{tag_name}' added"})
         return jsonify({"message": "Tag already on question"})
@@ -423,9 +898,204 @@ def register_routes(app):
         return jsonify([{"id": t.id, "name": t.name} for t in q.tags])
 
     @app.route("/tags/<string:name>/questions", methods=["GET"])
+    @route_class('bulk')
     def get_questions_by_tag(name):
         tag = Tag.query.filter_by(name=name.lower()).first_or_404()
-        return jsonify([
-            {"id": q.id, "title": q.title, "author": q.author.username}
-            for q in tag.questions
-        ])
+        after, limit = page_args()
+        questions, next_cursor = keyset_page(
+            Question.query.options(joinedload(Question.author))
+            .join(question_tags)
+            .filter(question_tags.c.tag_id == tag.id),
+            Question, after, limit
+        )
+        return jsonify({
+            "items": [
+                {"id": q.id, "title": q.title, "author": q.author.username}
+                for q in questions
+            ],
+            "next": next_cursor
+        })
+
+    @app.route("/tags/questions", methods=["GET"])
+    @route_class('bulk')
+    @statement_timeout(5000)
+    def get_questions_by_tags():
+        """Questions matching ?all=a,b&any=c,d&none=e (keyset paginated)"""
+        all_names = parse_tag_names(request.args.get("all"))
+        any_names = parse_tag_names(request.args.get("any"))
+        none_names = parse_tag_names(request.args.get("none"))
+        if not all_names and not any_names:
+            return jsonify({"message": "Query parameter 'all' or 'any' required"}), 400
+
+        after, limit = page_args()
+        conditions = tag_conditions(
+            Question, question_tags, question_tags.c.question_id,
+            all_names, any_names, none_names
+        )
+        questions, next_cursor = [], None
+        if conditions is not None:
+            questions, next_cursor = keyset_page(
+                Question.query.options(joinedload(Question.author)).filter(*conditions),
+                Question, after, limit
+            )
+        return jsonify({
+            "questions": [
+                {"id": q.id, "title": q.title, "author": q.author.username}
+                for q in questions
+            ],
+            "next": next_cursor
+        })
+
+    @app.route("/tags/blogs", methods=["GET"])
+    @route_class('bulk')
+    @statement_timeout(5000)
+    def get_blogs_by_tags():
+        """Blogs matching ?all=a,b&any=c,d&none=e (keyset paginated)"""
+        all_names = parse_tag_names(request.args.get("all"))
+        any_names = parse_tag_names(request.args.get("any"))
+        none_names = parse_tag_names(request.args.get("none"))
+        if not all_names and not any_names:
+            return jsonify({"message": "Query parameter 'all' or 'any' required"}), 400
+
+        after, limit = page_args()
+        conditions = tag_conditions(
+            Blog, blog_tags, blog_tags.c.blog_id,
+            all_names, any_names, none_names
+        )
+        blogs, next_cursor = [], None
+        if conditions is not None:
+            blogs, next_cursor = keyset_page(
+                Blog.query.options(joinedload(Blog.author), selectinload(Blog.tags))
+                .filter(*conditions),
+                Blog, after, limit
+            )
+        return jsonify({
+            "blogs": [
+                {
+                    "id": b.id,
+                    "title": b.title,
+                    "excerpt": b.excerpt,
+                    "author": b.author.username,
+                    "tags": [{"id": t.id, "name": t.name} for t in b.tags]
+                } for b in blogs
+            ],
+            "next": next_cursor
+        })
+
+    # -------------------- Sync Routes --------------------
+
+    @app.route("/changes", methods=["GET"])
+    @route_class('bulk')
+    @statement_timeout(5000)
+    def get_changes():
+        """Changes after a sync position, oldest first; pass `next` back as `since`"""
+        since = request.args.get("since", 0, type=int)
+        limit = max(1, min(request.args.get("limit", PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+        if since and since < changes.pruned_through():
+            # Entries (and tombstones) after `since` were pruned
+            return jsonify({"message": "Sync position expired, resync from scratch"}), 410
+        entries, next_position, has_more = changes.read_changes(since, limit)
+        return jsonify({"changes": entries, "next": next_position, "has_more": has_more})
+
+    # -------------------- Notification Routes --------------------
+
+    @app.route("/notifications", methods=["GET"])
+    @login_required
+    def get_notifications():
+        after, limit = page_args()
+        items, next_cursor = keyset_page(
+            Notification.query.filter(Notification.user_id == current_user.id),
+            Notification, after, limit
+        )
+        return jsonify({"items": notifications.serialize(items), "next": next_cursor})
+
+    @app.route("/notifications/unread-count", methods=["GET"])
+    @login_required
+    def get_unread_count():
+        """Served from the user's counter column, already loaded by Flask-Login"""
+        return jsonify({"unread": current_user.unread_notifications})
+
+    @app.route("/notifications/read", methods=["POST"])
+    @login_required
+    def mark_notifications_read():
+        """Mark the given `ids` read, or every notification when none are given"""
+        ids = (request.get_json(silent=True) or {}).get("ids")
+        if ids is not None and (not isinstance(ids, list)
+                                or not all(isinstance(i, int) for i in ids)):
+            return jsonify({"message": "'ids' must be a list of integers"}), 400
+        marked = notifications.mark_read(current_user.id, ids)
+        return jsonify({"marked": marked, "unread": current_user.unread_notifications})
+
+    # -------------------- Feed Routes --------------------
+    # Files come from `flask build-feeds`; conditional requests get a 304
+    # from the file's mtime/size alone, without touching the database
+
+    FEED_TYPES = {"rss": "application/rss+xml", "atom": "application/atom+xml"}
+
+    def send_feed_file(rel_path, mimetype):
+        directory = app.config['FEEDS_DIR']
+        if not os.path.isfile(os.path.join(directory, rel_path)):
+            return jsonify({"message": "Not generated yet"}), 404
+        return send_from_directory(directory, rel_path, mimetype=mimetype, max_age=300)
+
+    @app.route("/feeds/<any(blogs, questions):kind>.<any(rss, atom):fmt>", methods=["GET"])
+    @route_class('bulk')
+    def get_feed(kind, fmt):
+        return send_feed_file(f"{kind}.{fmt}", FEED_TYPES[fmt])
+
+    @app.route("/feeds/tags/<string:name>.<any(rss, atom):fmt>", methods=["GET"])
+    @route_class('bulk')
+    def get_tag_feed(name, fmt):
+        return send_feed_file(f"tags/{tag_filename(name.lower())}.{fmt}", FEED_TYPES[fmt])
+
+    @app.route("/sitemap.xml", methods=["GET"])
+    @route_class('bulk')
+    def get_sitemap_index():
+        return send_feed_file("sitemap.xml", "application/xml")
+
+    @app.route("/sitemaps/<string:shard>.xml", methods=["GET"])
+    @route_class('bulk')
+    def get_sitemap_shard(shard):
+        return send_feed_file(f"sitemaps/{shard}.xml", "application/xml")
+
+    # -------------------- Avatar Routes --------------------
+
+    @app.route("/avatars/<int:user_id>", methods=["GET"])
+    def get_avatar(user_id):
+        """A user's OAuth avatar as a cached square thumbnail (see app/avatars.py)"""
+        user = hotqueries.user_by_id(user_id)
+        if user is None or not user.avatar_url:
+            return jsonify({"message": "No avatar"}), 404
+        size = avatars.pick_size(
+            request.args.get("size", app.config['AVATAR_DEFAULT_SIZE'], type=int),
+            app.config['AVATAR_SIZES'],
+        )
+        try:
+            digest, path = avatars.thumbnail(user.avatar_url, size)
+        except Exception as e:
+            print(f"Avatar error (user {user_id}): {e}")
+            response = jsonify({"message": "Avatar unavailable"})
+            response.status_code = 502
+            response.headers['Cache-Control'] = 'no-store'
+            return response
+
+        response = send_file(path, mimetype="image/png", etag=f"{digest[:16]}-{size}",
+                             max_age=app.config['AVATAR_MAX_AGE'])
+        response.cache_control.public = True
+        # A versioned URL changes whenever the avatar URL does, so it never goes stale
+        if request.args.get("v") == avatars.version(user.avatar_url):
+            response.cache_control.max_age = 31536000
+            response.cache_control.immutable = True
+        return response
+
+    # -------------------- Ops Routes --------------------
+
+    @app.route("/cache/stats", methods=["GET"])
+    def get_cache_stats():
+        """Read cache hits, coalesced misses and snapshot state for this worker"""
+        return jsonify(readcache.get_cache().stats())
+
+    @app.route("/outbox/stats", methods=["GET"])
+    def get_outbox_stats():
+        """Backlog and lag of derived-data events, for monitoring"""
+        return jsonify(outbox.stats())
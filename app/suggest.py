@@ -0,0 +1,180 @@
+"""As-you-type title suggestions for questions and blogs.
+
+On Postgres, titles are matched with pg_trgm word similarity (``<%``),
+served by the GIN trigram indexes on ``lower(title)``. The query runs with a
+``SUGGEST_TIMEOUT_MS`` statement timeout. A query that runs out of time is
+answered with no suggestions and is not cached.
+
+Other databases use an in-memory trigram index over every title, built
+the same way pg_trgm splits words. Each process builds its own index and
+rebuilds it after ``SUGGEST_INDEX_TTL`` seconds, so new titles appear
+within that window.
+
+Each keystroke sends a new prefix, and many users type the same popular
+prefixes. Results are kept per (prefix, limit) in a short-lived
+single-flight cache, separate from the read cache so the two don't evict
+each other's entries.
+"""
+import heapq
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+from flask import current_app
+from sqlalchemy import case, func, literal, select, union_all
+from sqlalchemy.exc import OperationalError
+from app import db
+from app.models import Blog, Question
+from app.readcache import ReadCache
+
+MIN_LENGTH = 2
+MAX_LENGTH = 100
+# Share of the typed trigrams a title must contain. Lower than pg_trgm's
+# default word_similarity_threshold (0.6) so a swapped pair of letters in a
+# short word ("pyhton") still matches; ranking keeps close matches on top
+THRESHOLD = 0.3
+# Titles that start with the typed text rank above fuzzier matches
+PREFIX_BONUS = 1.0
+
+_WORD = re.compile(r'[^\W_]+')
+_lock = threading.Lock()
+
+
+class SuggestTimeout(Exception):
+    pass
+
+
+def normalize(text):
+    return ' '.join(_WORD.findall(text.lower()))[:MAX_LENGTH]
+
+
+def trigrams(text, partial=False):
+    """pg_trgm-style trigrams: each word padded with two spaces in front and
+    one behind. With ``partial``, the last word is still being typed and
+    gets no trailing pad, so "pyth" matches "python"."""
+    words = _WORD.findall(text.lower())
+    grams = set()
+    for i, word in enumerate(words):
+        padded = f"  {word}" if partial and i == len(words) - 1 else f"  {word} "
+        grams.update(padded[j:j + 3] for j in range(len(padded) - 2))
+    return grams
+
+
+# -------------------- In-memory Index --------------------
+
+class TitleIndex:
+    """Trigram postings over (type, id, title) entries"""
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.lowered = [title.lower() for _, _, title in entries]
+        self.postings = defaultdict(list)
+        for i, (_, _, title) in enumerate(entries):
+            for gram in trigrams(title):
+                self.postings[gram].append(i)
+        self.built_at = time.monotonic()
+
+    def search(self, query, k):
+        grams = trigrams(query, partial=not query.endswith(' '))
+        if not grams:
+            return []
+        # Share of the query's trigrams found in each title, like word_similarity
+        hits = Counter()
+        for gram in grams:
+            hits.update(self.postings.get(gram, ()))
+        needed = THRESHOLD * len(grams)
+        scored = (
+            (n / len(grams) + (PREFIX_BONUS if self.lowered[i].startswith(query) else 0), i)
+            for i, n in hits.items() if n >= needed
+        )
+        return [
+            {"type": self.entries[i][0], "id": self.entries[i][1],
+             "title": self.entries[i][2], "score": round(score, 3)}
+            for score, i in heapq.nlargest(k, scored)
+        ]
+
+
+def _load_index():
+    entries = [('question', id, title) for id, title in
+               db.session.execute(select(Question.id, Question.title))]
+    entries += [('blog', id, title) for id, title in
+                db.session.execute(select(Blog.id, Blog.title))]
+    return TitleIndex(entries)
+
+
+def get_index():
+    """This process's title index, rebuilt once older than SUGGEST_INDEX_TTL"""
+    app = current_app._get_current_object()
+    index = app.extensions.get('studenthub.suggest_index')
+    if index is None or time.monotonic() - index.built_at > app.config['SUGGEST_INDEX_TTL']:
+        with _lock:
+            index = app.extensions.get('studenthub.suggest_index')
+            if index is None or time.monotonic() - index.built_at > app.config['SUGGEST_INDEX_TTL']:
+                index = app.extensions['studenthub.suggest_index'] = _load_index()
+    return index
+
+
+# -------------------- Postgres --------------------
+
+def _trigram_query(model, query):
+    title = func.lower(model.title)
+    return select(
+        literal(model.__tablename__).label('type'),
+        model.id,
+        model.title,
+        (func.word_similarity(query, title)
+         + case((title.startswith(query, autoescape=True), PREFIX_BONUS), else_=0)).label('score'),
+    ).where(literal(query).op('<%')(title))
+
+
+def _search_postgres(query, k):
+    combined = union_all(_trigram_query(Question, query), _trigram_query(Blog, query)).subquery()
+    try:
+        # set_config(..., true) is SET LOCAL: it ends with this transaction
+        db.session.execute(select(
+            func.set_config('statement_timeout', str(current_app.config['SUGGEST_TIMEOUT_MS']), True),
+            func.set_config('pg_trgm.word_similarity_threshold', str(THRESHOLD), True),
+        ))
+        rows = db.session.execute(
+            select(combined).order_by(combined.c.score.desc(), combined.c.id.desc()).limit(k)
+        ).all()
+    except OperationalError as e:
+        db.session.rollback()
+        raise SuggestTimeout(str(e))
+    db.session.rollback()  # end the transaction and its statement_timeout
+    return [
+        {"type": r.type, "id": r.id, "title": r.title, "score": round(float(r.score), 3)}
+        for r in rows
+    ]
+
+
+# -------------------- Lookup --------------------
+
+def get_cache():
+    app = current_app._get_current_object()
+    cache = app.extensions.get('studenthub.suggest_cache')
+    if cache is None:
+        with _lock:
+            cache = app.extensions.get('studenthub.suggest_cache')
+            if cache is None:
+                cache = app.extensions['studenthub.suggest_cache'] = ReadCache(
+                    app.config['SUGGEST_CACHE_TTL'], app.config['SUGGEST_CACHE_SIZE']
+                )
+    return cache
+
+
+def _load(key):
+    query, k = key
+    if db.engine.dialect.name == 'postgresql':
+        return _search_postgres(query, k)
+    return get_index().search(query, k)
+
+
+def suggest(text, k):
+    """Top-k titles for typed text; raises SuggestTimeout past the budget"""
+    # Keep one trailing space: it marks the last word as finished
+    query = normalize(text) + (' ' if text.endswith(' ') else '')
+    if len(query.strip()) < MIN_LENGTH:
+        return []
+    return get_cache().get('suggest', (query, k), _load)
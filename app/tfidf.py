@@ -0,0 +1,334 @@
+"""Local TF-IDF index for "more like this" lookups over blogs and questions.
+
+Layout under ``TFIDF_INDEX_DIR``::
+
+    CURRENT          name of the live generation directory
+    gen-<ts>/        base segment: term-major (CSC) arrays saved as .npy
+    delta.jsonl      posts written since the base was built
+    .lock            serializes delta appends with generation swaps
+
+Base arrays are opened with ``mmap_mode='r'`` so every worker on a host
+shares one copy through the page cache. New and edited posts are appended to
+the delta and scored alongside the base; ``flask build-tfidf`` compacts
+everything into a fresh generation. Terms are hashed into a fixed feature
+space, so appended posts never need a vocabulary update.
+"""
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # not Unix: writers are only serialized within this process
+    fcntl = None
+
+import numpy as np
+from flask import current_app
+from app import db
+from app.models import Blog, Question
+
+N_FEATURES = 1 << 18
+TYPE_CODES = {'blog': 0, 'question': 1}
+TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+
+_TOKEN = re.compile(r'[a-z0-9]{2,}')
+STOP_WORDS = frozenset("""
+    an and are as at be but by can do for from has have how i if in is it its
+    me my no not of on or so that the this to was we what when which who why
+    will with you your
+""".split())
+
+_readers = {}
+_readers_lock = threading.Lock()
+_write_lock = threading.Lock()
+
+
+# -------------------- Vectorizing --------------------
+
+def doc_key(item_type, item_id):
+    return (TYPE_CODES[item_type] << 32) | item_id
+
+
+def term_counts(text):
+    """Hashed term -> count for a document"""
+    return Counter(
+        zlib.crc32(tok.encode()) % N_FEATURES
+        for tok in _TOKEN.findall(text.lower())
+        if tok not in STOP_WORDS
+    )
+
+
+def weigh(counts, idf):
+    """Sublinear TF-IDF weights, L2-normalized, as (terms, weights) arrays"""
+    if not counts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    terms = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    tf = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+    weights = tf * idf[terms]
+    weights /= np.linalg.norm(weights)
+    return terms, weights.astype(np.float32)
+
+
+def _documents(batch_size=1000):
+    """Yield (item_type, item_id, text) for every blog and question"""
+    for item_type, model, body in (('blog', Blog, Blog.content),
+                                   ('question', Question, Question.description)):
+        last_id = 0
+        while True:
+            rows = (db.session.query(model.id, model.title, body)
+                    .filter(model.id > last_id).order_by(model.id)
+                    .limit(batch_size).all())
+            if not rows:
+                break
+            for item_id, title, text in rows:
+                yield item_type, item_id, f"{title}\n{text}"
+            last_id = rows[-1][0]
+
+
+# -------------------- Building --------------------
+
+def _index_dir():
+    return current_app.config['TFIDF_INDEX_DIR']
+
+
+@contextmanager
+def _lock(index_dir):
+    os.makedirs(index_dir, exist_ok=True)
+    with _write_lock, open(os.path.join(index_dir, '.lock'), 'w') as handle:
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        yield
+
+
+def build_index():
+    """Build a new base generation from the database and swap it in"""
+    from scipy.sparse import csr_matrix
+
+    index_dir = _index_dir()
+    started_at = time.time()
+
+    keys, counts_list = [], []
+    df = np.zeros(N_FEATURES, dtype=np.int64)
+    for item_type, item_id, text in _documents():
+        counts = term_counts(text)
+        keys.append(doc_key(item_type, item_id))
+        counts_list.append(counts)
+        if counts:
+            df[np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))] += 1
+
+    n_docs = len(keys)
+    idf = (np.log((1.0 + n_docs) / (1.0 + df)) + 1.0).astype(np.float32)
+
+    # Rows sorted by key so a key's row can be found with searchsorted
+    order = np.argsort(np.array(keys, dtype=np.int64), kind='stable')
+    row_idx, col_idx, values = [], [], []
+    for row, doc in enumerate(order):
+        terms, weights = weigh(counts_list[doc], idf)
+        row_idx.append(np.full(len(terms), row, dtype=np.int64))
+        col_idx.append(terms)
+        values.append(weights)
+
+    matrix = csr_matrix(
+        (np.concatenate(values) if values else np.empty(0, dtype=np.float32),
+         (np.concatenate(row_idx) if row_idx else np.empty(0, dtype=np.int64),
+          np.concatenate(col_idx) if col_idx else np.empty(0, dtype=np.int64))),
+        shape=(n_docs, N_FEATURES), dtype=np.float32,
+    ).tocsc()
+
+    generation = f"gen-{int(started_at * 1000)}"
+    gen_dir = os.path.join(index_dir, generation)
+    os.makedirs(gen_dir)
+    np.save(os.path.join(gen_dir, 'keys.npy'), np.array(keys, dtype=np.int64)[order])
+    np.save(os.path.join(gen_dir, 'indptr.npy'), matrix.indptr.astype(np.int64))
+    np.save(os.path.join(gen_dir, 'rows.npy'), matrix.indices.astype(np.int32))
+    np.save(os.path.join(gen_dir, 'values.npy'), matrix.data.astype(np.float32))
+    np.save(os.path.join(gen_dir, 'idf.npy'), idf)
+
+    with _lock(index_dir):
+        # Keep delta entries written after the database snapshot was taken
+        delta_path = os.path.join(index_dir, 'delta.jsonl')
+        kept = [entry for entry in _read_delta(delta_path)[0] if entry['ts'] >= started_at]
+        tmp = f"{delta_path}.tmp"
+        with open(tmp, 'w') as f:
+            for entry in kept:
+                f.write(json.dumps(entry) + '\n')
+        os.replace(tmp, delta_path)
+        _write_current(index_dir, generation)
+
+    _remove_old_generations(index_dir, keep=generation)
+    return n_docs, len(kept)
+
+
+def _write_current(index_dir, generation):
+    tmp = os.path.join(index_dir, 'CURRENT.tmp')
+    with open(tmp, 'w') as f:
+        f.write(generation)
+    os.replace(tmp, os.path.join(index_dir, 'CURRENT'))
+
+
+def _remove_old_generations(index_dir, keep):
+    # Workers that still map an old generation keep their open file handles
+    for name in os.listdir(index_dir):
+        if name.startswith('gen-') and name != keep:
+            shutil.rmtree(os.path.join(index_dir, name), ignore_errors=True)
+
+
+# -------------------- Incremental Append --------------------
+
+def append_document(item_type, item_id, text):
+    """Record a new or edited post in the delta segment"""
+    _append({"type": item_type, "id": item_id, "text": text, "ts": time.time()})
+
+
+def remove_document(item_type, item_id):
+    """Record a deleted post in the delta segment"""
+    _append({"type": item_type, "id": item_id, "deleted": True, "ts": time.time()})
+
+
+def _append(entry):
+    index_dir = _index_dir()
+    try:
+        with _lock(index_dir):
+            with open(os.path.join(index_dir, 'delta.jsonl'), 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+    except OSError as e:
+        # The index is derived data; a missed append is fixed by the next build
+        print(f"TF-IDF delta append error: {e}")
+
+
+def _read_delta(path, offset=0):
+    """Parse the delta's complete lines from byte ``offset``; returns (entries, end offset)"""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+    except OSError:
+        return [], offset
+    # A line still being appended is left for the next read
+    end = data.rfind(b'\n') + 1
+    return [json.loads(line) for line in data[:end].splitlines() if line.strip()], offset + end
+
+
+# -------------------- Querying --------------------
+
+class IndexReader:
+    """A mapped base generation plus the parsed delta, refreshed on change"""
+
+    def __init__(self, index_dir):
+        self.index_dir = index_dir
+        self.generation = None
+        self.delta_stat = None
+        self.delta_offset = 0
+        self.delta = {}
+
+    def refresh(self):
+        try:
+            with open(os.path.join(self.index_dir, 'CURRENT')) as f:
+                generation = f.read().strip()
+        except OSError:
+            return False
+
+        if generation != self.generation:
+            gen_dir = os.path.join(self.index_dir, generation)
+            load = lambda name: np.load(os.path.join(gen_dir, name), mmap_mode='r')
+            self.keys = load('keys.npy')
+            self.indptr = load('indptr.npy')
+            self.rows = load('rows.npy')
+            self.values = load('values.npy')
+            self.idf = load('idf.npy')
+            self.generation = generation
+            self.delta_stat = None
+
+        delta_path = os.path.join(self.index_dir, 'delta.jsonl')
+        try:
+            stat = os.stat(delta_path)
+            stat = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            stat = None
+        if stat != self.delta_stat:
+            old = self.delta_stat
+            if stat is None or old is None or stat[0] != old[0] or stat[1] < self.delta_offset:
+                # Compacted (replaced) or new generation: parse from the start
+                delta, self.delta_offset = {}, 0
+            else:
+                # Same file, only appended to: vectorize just the new lines
+                delta = dict(self.delta)
+            entries, self.delta_offset = _read_delta(delta_path, self.delta_offset)
+            for entry in entries:
+                key = doc_key(entry['type'], entry['id'])
+                if entry.get('deleted'):
+                    delta[key] = None
+                else:
+                    delta[key] = self.vectorize(entry['text'])
+            self.delta = delta
+            self.delta_stat = stat
+        return True
+
+    def vectorize(self, text):
+        return weigh(term_counts(text), self.idf)
+
+    def top_k(self, terms, weights, k, exclude_key):
+        """Return [(key, score)] of the k most similar documents"""
+        n_base = len(self.keys)
+        scores = np.zeros(n_base, dtype=np.float32)
+        if len(terms):
+            starts, ends = self.indptr[terms], self.indptr[terms + 1]
+            lengths = ends - starts
+            if lengths.sum():
+                # Gather the postings of every query term in one pass
+                positions = np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+                scores = np.bincount(
+                    self.rows[positions],
+                    weights=self.values[positions] * np.repeat(weights, lengths),
+                    minlength=n_base,
+                ).astype(np.float32)
+
+        results = []
+        if n_base:
+            # Superseded or deleted base rows are scored from the delta instead
+            masked = np.array([exclude_key, *self.delta.keys()], dtype=np.int64)
+            pos = np.minimum(np.searchsorted(self.keys, masked), n_base - 1)
+            scores[pos[self.keys[pos] == masked]] = 0
+
+            top = np.argpartition(-scores, min(k, n_base - 1))[:k]
+            results = [(int(self.keys[i]), float(scores[i])) for i in top if scores[i] > 0]
+
+        lookup = dict(zip(terms.tolist(), weights.tolist()))
+        for key, vector in self.delta.items():
+            if vector is None or key == exclude_key:
+                continue
+            d_terms, d_weights = vector
+            score = sum(lookup.get(t, 0.0) * w for t, w in zip(d_terms.tolist(), d_weights.tolist()))
+            if score > 0:
+                results.append((key, score))
+
+        results.sort(key=lambda pair: -pair[1])
+        return results[:k]
+
+
+def get_reader():
+    index_dir = _index_dir()
+    with _readers_lock:
+        reader = _readers.get(index_dir)
+        if reader is None:
+            reader = _readers[index_dir] = IndexReader(index_dir)
+        ready = reader.refresh()
+    return reader if ready else None
+
+
+def similar(item_type, item_id, text, k=10):
+    """Return [(item_type, item_id, score)] most similar to the given post"""
+    reader = get_reader()
+    if reader is None:
+        return []
+    terms, weights = reader.vectorize(text)
+    return [
+        (TYPE_NAMES[key >> 32], key & 0xFFFFFFFF, score)
+        for key, score in reader.top_k(terms, weights, k, doc_key(item_type, item_id))
+    ]
@@ -0,0 +1,241 @@
+"""Per-route statement timeouts, query cancellation and pool exhaustion.
+
+Each request gets a database statement timeout: ``STATEMENT_TIMEOUT_MS``
+unless the route sets its own with ``@statement_timeout(ms)`` or
+``STATEMENT_TIMEOUTS`` overrides it by endpoint name. On Postgres it is
+applied with ``SET LOCAL`` at the start of every transaction the request
+opens, so it ends with that transaction and never leaks to the next user
+of the pooled connection. A statement that runs past it is cancelled by
+the server, and the request is answered with a 504.
+
+When ``CANCEL_ON_DISCONNECT`` is on, a watchdog thread checks the client
+socket of every request that has been running longer than
+``CANCEL_CHECK_MS``. If the client has hung up, it cancels the request's
+running query, which frees the connection for others. This uses
+``cancel()`` on Postgres and ``interrupt()`` on SQLite. It only works for
+servers that expose the socket to the app (gunicorn, the werkzeug dev
+server).
+
+Requests that wait longer than ``DB_POOL_TIMEOUT`` for a pooled connection
+get a 503 with ``Retry-After`` instead of a 500. Counts per endpoint are
+served from ``/timeouts/stats``.
+"""
+import select
+import socket
+import threading
+import time
+from collections import defaultdict
+
+from flask import g, has_request_context, jsonify, request
+from sqlalchemy import event, func
+from sqlalchemy import select as sql_select
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeout
+from sqlalchemy.orm import Session
+
+QUERY_CANCELED = '57014'  # Postgres SQLSTATE for statement timeouts and cancels
+CLIENT_CLOSED = 499  # nginx's status for "client closed request"
+
+
+def statement_timeout(ms):
+    """Route decorator: statement timeout for this endpoint (0 = none).
+
+    Place it directly below ``@app.route``.
+    """
+    def decorate(view):
+        view.statement_timeout_ms = ms
+        return view
+    return decorate
+
+
+def _parse_timeouts(value):
+    """'search=2000,get_comments=5000' -> {'search': 2000, 'get_comments': 5000}"""
+    timeouts = {}
+    for part in (value or '').split(','):
+        name, _, number = part.partition('=')
+        if name.strip() and number.strip().isdigit():
+            timeouts[name.strip()] = int(number)
+    return timeouts
+
+
+def is_query_canceled(error):
+    """True for a statement timeout or cancel, from any Postgres driver"""
+    orig = error.orig
+    return (getattr(orig, 'sqlstate', None) or getattr(orig, 'pgcode', None)) == QUERY_CANCELED
+
+
+# -------------------- Disconnect Watchdog --------------------
+
+class InFlight:
+    """A running request: its client socket and the DB connections it holds"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.started = time.monotonic()
+        self.connections = []
+        self.cancelled = False
+        # Held while cancelling, so a connection released back to the pool
+        # mid-cancel can't be cancelled under another request
+        self.lock = threading.Lock()
+
+
+def _disconnected(sock):
+    """True once the peer has closed; pipelined bytes are peeked, not read"""
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b''
+    except ConnectionError:
+        return True
+    except (OSError, ValueError):
+        return False  # socket already closed on our side; the request is ending
+
+
+def _cancel(connection):
+    cancel = getattr(connection, 'cancel', None) or getattr(connection, 'interrupt', None)
+    if cancel is not None:
+        try:
+            cancel()
+        except Exception as e:
+            print(f"Query cancel error: {e}")
+
+
+class Watchdog:
+    def __init__(self, interval):
+        self.interval = interval
+        self._requests = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def track(self, entry):
+        with self._lock:
+            self._requests.add(entry)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="disconnect-watchdog", daemon=True
+                )
+                self._thread.start()
+
+    def untrack(self, entry):
+        with self._lock:
+            self._requests.discard(entry)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            now = time.monotonic()
+            with self._lock:
+                due = [e for e in self._requests
+                       if e.connections and not e.cancelled and now - e.started >= self.interval]
+            for entry in due:
+                if _disconnected(entry.sock):
+                    with entry.lock:
+                        entry.cancelled = True
+                        for connection in entry.connections:
+                            _cancel(connection)
+
+
+# -------------------- Per-transaction Timeout --------------------
+
+@event.listens_for(Session, 'after_begin')
+def _apply_request_limits(session, transaction, connection):
+    if not has_request_context():
+        return
+    ms = g.get('statement_timeout_ms')
+    if ms and connection.dialect.name == 'postgresql':
+        # set_config(..., true) is SET LOCAL, and unlike SET it takes bind params
+        connection.execute(sql_select(func.set_config('statement_timeout', str(ms), True)))
+    entry = g.get('in_flight')
+    if entry is not None:
+        with entry.lock:
+            entry.connections.append(connection.connection.dbapi_connection)
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def _release_request_connections(session, transaction):
+    # Once the transaction ends its connection goes back to the pool
+    if transaction.parent is None and has_request_context():
+        entry = g.get('in_flight')
+        if entry is not None:
+            with entry.lock:
+                entry.connections.clear()
+
+
+class RequestLimits:
+    """Statement timeout lookup and error counters per endpoint, shared by the
+    Flask routes and the async read path (app/asgi.py)"""
+
+    def __init__(self, app):
+        self.app = app
+        self.default = app.config['STATEMENT_TIMEOUT_MS']
+        self.overrides = _parse_timeouts(app.config['STATEMENT_TIMEOUTS'])
+        self._counters = defaultdict(lambda: {"statement_timeouts": 0, "client_cancels": 0, "pool_timeouts": 0})
+        self._lock = threading.Lock()
+
+    def timeout_for(self, endpoint):
+        if endpoint in self.overrides:
+            return self.overrides[endpoint]
+        view = self.app.view_functions.get(endpoint)
+        return getattr(view, 'statement_timeout_ms', self.default)
+
+    def count(self, endpoint, name):
+        with self._lock:
+            self._counters[endpoint or "unknown"][name] += 1
+
+    def stats(self):
+        with self._lock:
+            endpoints = {name: dict(c) for name, c in self._counters.items()}
+        for name in endpoints:
+            endpoints[name]["timeout_ms"] = self.timeout_for(name)
+        return {"default_timeout_ms": self.default, "endpoints": endpoints}
+
+
+def register_timeouts(app):
+    """Statement timeouts, disconnect cancellation and DB error responses"""
+    limits = app.extensions['studenthub.timeouts'] = RequestLimits(app)
+    watchdog = Watchdog(app.config['CANCEL_CHECK_MS'] / 1000.0)
+
+    def count(name):
+        limits.count(request.endpoint, name)
+
+    @app.before_request
+    def limit_request():
+        if request.endpoint is None:
+            return
+        g.statement_timeout_ms = limits.timeout_for(request.endpoint)
+        if app.config['CANCEL_ON_DISCONNECT']:
+            sock = request.environ.get('gunicorn.socket') or request.environ.get('werkzeug.socket')
+            if sock is not None:
+                g.in_flight = InFlight(sock)
+                watchdog.track(g.in_flight)
+
+    @app.teardown_request
+    def untrack_request(exc):
+        entry = g.pop('in_flight', None)
+        if entry is not None:
+            watchdog.untrack(entry)
+
+    @app.errorhandler(OperationalError)
+    def database_cancelled(e):
+        entry = g.get('in_flight')
+        if entry is not None and entry.cancelled:
+            count("client_cancels")
+            print(f"Cancelled queries for {request.endpoint}: client disconnected")
+            return jsonify({"message": "Client closed request"}), CLIENT_CLOSED
+        if is_query_canceled(e):
+            count("statement_timeouts")
+            print(f"Statement timeout in {request.endpoint} ({g.get('statement_timeout_ms')} ms)")
+            return jsonify({"message": "The database took too long to answer"}), 504
+        raise e
+
+    @app.errorhandler(PoolTimeout)
+    def database_busy(e):
+        count("pool_timeouts")
+        print(f"Connection pool exhausted in {request.endpoint}: {e}")
+        response = jsonify({"message": "Database busy, retry shortly"})
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return response
+
+    @app.route("/timeouts/stats", methods=["GET"])
+    def get_timeout_stats():
+        """Statement timeouts, client cancels and pool timeouts per endpoint"""
+        return jsonify(limits.stats())
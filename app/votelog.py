@@ -0,0 +1,200 @@
+"""Vote activity over time: an append-only event log rolled up per bucket.
+
+Every vote change appends a ``vote_event`` row in the same transaction that
+writes the vote (for buffered votes, when the flush applies them). Nothing
+reads the log on the request path. ``flask rollup-votes`` folds new events
+into per-minute, per-hour and per-day ``vote_rollup`` rows, a few thousand
+events at a time with numpy, and tracks how far it got in
+``vote_rollup_cursor``. ``/questions/<id>/vote-history`` reads only the
+rollups.
+
+Each pass also applies retention. Minute buckets are dropped after
+``VOTE_HISTORY_MINUTE_DAYS`` and hour buckets after
+``VOTE_HISTORY_HOUR_DAYS``, which leaves coarser buckets covering older
+ranges. Day buckets are kept. Raw events are dropped after
+``VOTE_EVENT_DAYS``, but only once they have been rolled up.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select, tuple_
+from app import db
+from app.models import VoteEvent, VoteRollup, VoteRollupCursor
+
+RESOLUTIONS = {'minute': 60, 'hour': 3600, 'day': 86400}
+KIND_CODES = {'question': 0, 'comment': 1}
+# Most points an "auto" history query returns before moving to coarser buckets
+MAX_POINTS = 720
+
+
+# -------------------- Logging --------------------
+
+def log_votes(kind, changes):
+    """Append (user_id, target_id, value, previous) vote changes. Does not commit."""
+    now = datetime.utcnow()
+    rows = [
+        {"target_type": kind, "target_id": t, "user_id": u, "value": v,
+         "previous": p, "created_at": now}
+        for u, t, v, p in changes if v != p
+    ]
+    if rows:
+        db.session.execute(VoteEvent.__table__.insert(), rows)
+
+
+def log_vote(kind, user_id, target_id, value, previous):
+    log_votes(kind, [(user_id, target_id, value, previous)])
+
+
+# -------------------- Rollups --------------------
+
+def _bucket_sums(events):
+    """Sum a batch of events per (resolution, kind, target, bucket) with numpy"""
+    import numpy as np
+
+    kinds = np.array([KIND_CODES[e.target_type] for e in events], dtype=np.int64)
+    targets = np.array([e.target_id for e in events], dtype=np.int64)
+    value = np.array([e.value for e in events], dtype=np.int64)
+    previous = np.array([e.previous for e in events], dtype=np.int64)
+    seconds = np.array([e.created_at for e in events], dtype='datetime64[s]').astype(np.int64)
+
+    # An upvote is a change that ends on +1 (new or switched), likewise down
+    up = ((value == 1) & (previous != 1)).astype(np.int64)
+    down = ((value == -1) & (previous != -1)).astype(np.int64)
+    score = value - previous
+
+    names = {code: name for name, code in KIND_CODES.items()}
+    sums = []
+    for resolution, step in RESOLUTIONS.items():
+        keys = np.stack([kinds, targets, seconds // step * step], axis=1)
+        unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        n = len(unique)
+        totals = [np.bincount(inverse, weights=w, minlength=n).astype(np.int64)
+                  for w in (up, down, score)]
+        counts = np.bincount(inverse, minlength=n)
+        buckets = unique[:, 2].astype('datetime64[s]').tolist()
+        for i, (kind, target, _) in enumerate(unique.tolist()):
+            sums.append({
+                "resolution": resolution, "target_type": names[kind],
+                "target_id": target, "bucket": buckets[i],
+                "upvotes": int(totals[0][i]), "downvotes": int(totals[1][i]),
+                "score": int(totals[2][i]), "events": int(counts[i]),
+            })
+    return sums
+
+
+def _add_to_rollups(sums):
+    """Add bucket sums onto existing rollup rows, creating missing ones"""
+    dialect = db.engine.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(VoteRollup)
+        table = VoteRollup.__table__
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['resolution', 'target_type', 'target_id', 'bucket'],
+            set_={col: table.c[col] + stmt.excluded[col]
+                  for col in ('upvotes', 'downvotes', 'score', 'events')},
+        ), sums)
+        return
+
+    key = lambda r: (r["resolution"], r["target_type"], r["target_id"], r["bucket"])
+    existing = {
+        (r.resolution, r.target_type, r.target_id, r.bucket): r
+        for r in VoteRollup.query.filter(tuple_(
+            VoteRollup.resolution, VoteRollup.target_type, VoteRollup.target_id, VoteRollup.bucket
+        ).in_([key(s) for s in sums])).with_for_update()
+    }
+    for s in sums:
+        row = existing.get(key(s))
+        if row is None:
+            db.session.add(VoteRollup(**s))
+        else:
+            for col in ('upvotes', 'downvotes', 'score', 'events'):
+                setattr(row, col, getattr(row, col) + s[col])
+
+
+def rollup(batch_size=5000, lag_seconds=30):
+    """Fold one batch of new events into the rollups; returns events processed.
+
+    Only events older than ``lag_seconds`` are taken. Ids are assigned at
+    insert but become visible at commit, so a vote transaction still open
+    could otherwise commit an id below the cursor after it has moved past.
+    """
+    cursor = db.session.get(VoteRollupCursor, 1, with_for_update=True)
+    if cursor is None:
+        cursor = VoteRollupCursor(id=1, last_event_id=0)
+        db.session.add(cursor)
+        db.session.flush()
+
+    events = db.session.execute(
+        select(VoteEvent.id, VoteEvent.target_type, VoteEvent.target_id,
+               VoteEvent.value, VoteEvent.previous, VoteEvent.created_at)
+        .where(VoteEvent.id > cursor.last_event_id,
+               VoteEvent.created_at < datetime.utcnow() - timedelta(seconds=lag_seconds))
+        .order_by(VoteEvent.id).limit(batch_size)
+    ).all()
+    if not events:
+        db.session.rollback()
+        return 0
+
+    _add_to_rollups(_bucket_sums(events))
+    cursor.last_event_id = events[-1].id
+    db.session.commit()
+    return len(events)
+
+
+def prune(minute_days=2, hour_days=90, event_days=30):
+    """Apply retention to fine-grained rollups and rolled-up events"""
+    now = datetime.utcnow()
+    removed = 0
+    for resolution, days in (('minute', minute_days), ('hour', hour_days)):
+        removed += db.session.execute(delete(VoteRollup).where(
+            VoteRollup.resolution == resolution,
+            VoteRollup.bucket < now - timedelta(days=days),
+        )).rowcount
+    cursor = db.session.get(VoteRollupCursor, 1)
+    if cursor is not None:
+        removed += db.session.execute(delete(VoteEvent).where(
+            VoteEvent.id <= cursor.last_event_id,
+            VoteEvent.created_at < now - timedelta(days=event_days),
+        )).rowcount
+    db.session.commit()
+    return removed
+
+
+# -------------------- Reading --------------------
+
+def pick_resolution(start, end, minute_days, hour_days):
+    """Finest resolution that still has data at ``start`` and fits MAX_POINTS"""
+    now = datetime.utcnow()
+    span = (end - start).total_seconds()
+    if span <= MAX_POINTS * 60 and start >= now - timedelta(days=minute_days):
+        return 'minute'
+    if span <= MAX_POINTS * 3600 and start >= now - timedelta(days=hour_days):
+        return 'hour'
+    return 'day'
+
+
+def history(kind, target_id, start, end, resolution):
+    """Non-empty buckets in [start, end), oldest first"""
+    step = RESOLUTIONS[resolution]
+    # Include the bucket that contains ``start``
+    epoch = datetime(1970, 1, 1)
+    first = epoch + timedelta(seconds=int((start - epoch).total_seconds()) // step * step)
+    rows = db.session.execute(
+        select(VoteRollup.bucket, VoteRollup.upvotes, VoteRollup.downvotes,
+               VoteRollup.score, VoteRollup.events)
+        .where(VoteRollup.resolution == resolution,
+               VoteRollup.target_type == kind,
+               VoteRollup.target_id == target_id,
+               VoteRollup.bucket >= first,
+               VoteRollup.bucket < end)
+        .order_by(VoteRollup.bucket)
+    ).all()
+    return [
+        {"bucket": r.bucket.isoformat(), "upvotes": r.upvotes, "downvotes": r.downvotes,
+         "score": r.score, "events": r.events}
+        for r in rows
+    ]
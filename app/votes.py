@@ -0,0 +1,387 @@
+"""Write-behind vote ingestion for hot questions and comments.
+
+With ``VOTE_BUFFER`` set to ``memory`` or ``redis``, vote handlers record
+the new vote state in a buffer instead of writing to the database. The
+``memory`` buffer lives in one process, so it is for development and
+single-process servers only: with several workers each one would toggle
+against its own pending state, and the app refuses to start. Production
+deployments with more than one worker use ``redis``. Repeated
+votes by the same user on the same target coalesce, so only the last state
+is kept. A background thread flushes the buffer every
+``VOTE_FLUSH_INTERVAL_MS`` with batched upserts and deletes.
+
+Each buffered entry is stored as ``(value, original)``. ``value`` is the
+latest vote (0 means removed). ``original`` is what the database held
+before the entry was buffered. From these the read path can add pending
+score and count deltas to the database totals. Batches that fail to commit
+are spilled to ``VOTE_SPILL_PATH`` and replayed before the next flush.
+
+The memory buffer is flushed on a clean exit (``atexit``). Votes still
+pending when the process is killed (SIGKILL, OOM) or crashes are lost:
+up to one flush interval, or ``VOTE_BUFFER_MAX`` votes. The spill file only
+protects batches whose commit failed. Use ``redis`` if that loss matters.
+"""
+import atexit
+import json
+import os
+import sys
+import threading
+import uuid
+
+from flask import current_app
+from sqlalchemy import delete, func, select, tuple_
+from app import db
+from app.models import Comment, CommentVote, Question, QuestionVote
+from app.outbox import record
+from app.votelog import log_votes
+
+# kind -> (vote model, target column name, target model)
+KINDS = {
+    'question': (QuestionVote, 'question_id', Question),
+    'comment': (CommentVote, 'comment_id', Comment),
+}
+
+_buffers = {}
+_buffers_lock = threading.Lock()
+
+
+# -------------------- Buffers --------------------
+
+class MemoryVoteBuffer:
+    """Per-process buffer; pending deltas are only visible to this worker"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending, self._pending_delta = {}, {}
+        self._inflight, self._inflight_delta = {}, {}
+
+    def get(self, kind, user_id, target_id):
+        key = (kind, user_id, target_id)
+        with self._lock:
+            if key in self._pending:
+                return tuple(self._pending[key])
+            if key in self._inflight:
+                value = self._inflight[key][0]
+                return value, value
+        return None
+
+    def put(self, kind, user_id, target_id, value, previous, original):
+        with self._lock:
+            self._pending[(kind, user_id, target_id)] = (value, original)
+            delta = self._pending_delta.setdefault((kind, target_id), [0, 0])
+            delta[0] += value - previous
+            delta[1] += bool(value) - bool(previous)
+            return len(self._pending)
+
+    def pending_delta(self, kind, target_id):
+        with self._lock:
+            score, count = self._pending_delta.get((kind, target_id), (0, 0))
+            in_score, in_count = self._inflight_delta.get((kind, target_id), (0, 0))
+        return score + in_score, count + in_count
+
+    def begin_flush(self):
+        with self._lock:
+            self._inflight, self._pending = self._pending, {}
+            self._inflight_delta, self._pending_delta = self._pending_delta, {}
+            return [(*key, value) for key, (value, _) in self._inflight.items()]
+
+    def end_flush(self):
+        with self._lock:
+            self._inflight, self._inflight_delta = {}, {}
+
+
+class RedisVoteBuffer:
+    """Buffer shared by every worker through a Redis-compatible server"""
+
+    PENDING = 'votes:pending'
+    PENDING_DELTA = 'votes:pending:delta'
+    INFLIGHT = 'votes:inflight'
+    INFLIGHT_DELTA = 'votes:inflight:delta'
+    FLUSH_LOCK = 'votes:flush-lock'
+
+    def __init__(self, url):
+        import redis
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self._token = None
+
+    def get(self, kind, user_id, target_id):
+        field = f"{kind}:{user_id}:{target_id}"
+        pending, inflight = self.redis.pipeline().hget(self.PENDING, field) \
+            .hget(self.INFLIGHT, field).execute()
+        if pending:
+            return tuple(json.loads(pending))
+        if inflight:
+            value = json.loads(inflight)[0]
+            return value, value
+        return None
+
+    def put(self, kind, user_id, target_id, value, previous, original):
+        pipe = self.redis.pipeline()
+        pipe.hset(self.PENDING, f"{kind}:{user_id}:{target_id}", json.dumps([value, original]))
+        pipe.hincrby(self.PENDING_DELTA, f"{kind}:{target_id}:score", value - previous)
+        pipe.hincrby(self.PENDING_DELTA, f"{kind}:{target_id}:count",
+                     bool(value) - bool(previous))
+        pipe.hlen(self.PENDING)
+        return pipe.execute()[-1]
+
+    def pending_delta(self, kind, target_id):
+        fields = (f"{kind}:{target_id}:score", f"{kind}:{target_id}:count")
+        pending, inflight = self.redis.pipeline().hmget(self.PENDING_DELTA, *fields) \
+            .hmget(self.INFLIGHT_DELTA, *fields).execute()
+        score = int(pending[0] or 0) + int(inflight[0] or 0)
+        count = int(pending[1] or 0) + int(inflight[1] or 0)
+        return score, count
+
+    def begin_flush(self):
+        # One flusher across all workers; the lock expires if it dies
+        token = uuid.uuid4().hex
+        if not self.redis.set(self.FLUSH_LOCK, token, nx=True, px=30000):
+            return []
+        self._token = token
+
+        # A leftover in-flight batch means a flusher died mid-way; the
+        # upserts are idempotent, so it is simply flushed again
+        if not self.redis.exists(self.INFLIGHT) and self.redis.exists(self.PENDING):
+            pipe = self.redis.pipeline()
+            pipe.rename(self.PENDING, self.INFLIGHT)
+            pipe.rename(self.PENDING_DELTA, self.INFLIGHT_DELTA)
+            pipe.execute()
+
+        entries = []
+        for field, raw in self.redis.hgetall(self.INFLIGHT).items():
+            kind, user_id, target_id = field.split(':')
+            entries.append((kind, int(user_id), int(target_id), json.loads(raw)[0]))
+        return entries
+
+    def end_flush(self):
+        if self._token is None:
+            return
+        self.redis.delete(self.INFLIGHT, self.INFLIGHT_DELTA)
+        if self.redis.get(self.FLUSH_LOCK) == self._token:
+            self.redis.delete(self.FLUSH_LOCK)
+        self._token = None
+
+
+def server_workers(environ=os.environ, argv=sys.argv):
+    """Worker processes the server was started with: gunicorn/uvicorn's
+    ``-w``/``--workers`` or ``WEB_CONCURRENCY``, else 1"""
+    count = environ.get('WEB_CONCURRENCY')
+    args = argv[1:]
+    for i, arg in enumerate(args):
+        if arg in ('-w', '--workers') and i + 1 < len(args):
+            count = args[i + 1]
+        elif arg.startswith('--workers='):
+            count = arg.split('=', 1)[1]
+    try:
+        return int(count or 1)
+    except ValueError:
+        return 1
+
+
+def check_buffer_mode(app):
+    """Refuse to start the per-process memory buffer under several workers"""
+    if app.config['VOTE_BUFFER'] != 'memory':
+        return
+    workers = server_workers()
+    if workers > 1:
+        raise RuntimeError(
+            f"VOTE_BUFFER=memory is per-process but {workers} workers are configured; "
+            f"vote toggles and scores would disagree between workers. Use VOTE_BUFFER=redis."
+        )
+
+
+def get_buffer():
+    """Return the configured vote buffer, or None when votes write directly"""
+    mode = current_app.config['VOTE_BUFFER']
+    if not mode:
+        return None
+    app = current_app._get_current_object()
+    with _buffers_lock:
+        buffer = _buffers.get(app)
+        if buffer is None:
+            if mode == 'redis':
+                buffer = RedisVoteBuffer(app.config['VOTE_BUFFER_REDIS_URL'])
+            else:
+                buffer = MemoryVoteBuffer()
+            _buffers[app] = buffer
+            _start_flusher(app, buffer)
+    return buffer
+
+
+# -------------------- Ingestion --------------------
+
+def current_vote(kind, user_id, target_id, buffer):
+    """Return (current value, database value) for a user's vote"""
+    state = buffer.get(kind, user_id, target_id)
+    if state is not None:
+        return state
+    model, target_col, _ = KINDS[kind]
+    stored = db.session.execute(
+        select(model.value).where(
+            model.user_id == user_id, getattr(model, target_col) == target_id
+        )
+    ).scalar()
+    return stored or 0, stored or 0
+
+
+def buffered_vote(kind, user_id, target_id, value, buffer):
+    """Apply toggle semantics against buffered state; returns the message"""
+    current, original = current_vote(kind, user_id, target_id, buffer)
+    if current == value:
+        new_value, message = 0, "Vote removed"
+    elif current:
+        new_value, message = value, "Vote changed"
+    else:
+        new_value, message = value, "Vote recorded"
+
+    size = buffer.put(kind, user_id, target_id, new_value, current, original)
+    if size >= current_app.config['VOTE_BUFFER_MAX']:
+        _wake_flusher()
+    return message
+
+
+def vote_totals(kind, target_id):
+    """Return (score, total_votes) including votes still in the buffer"""
+    model, target_col, _ = KINDS[kind]
+    score, count = db.session.execute(
+        select(func.coalesce(func.sum(model.value), 0), func.count())
+        .where(getattr(model, target_col) == target_id)
+    ).one()
+    buffer = get_buffer()
+    if buffer is not None:
+        pending_score, pending_count = buffer.pending_delta(kind, target_id)
+        score, count = score + pending_score, count + pending_count
+    return score, count
+
+
+# -------------------- Flushing --------------------
+
+def apply_votes(entries):
+    """Write coalesced vote states with batched upserts and deletes"""
+    for kind, (model, target_col, target_model) in KINDS.items():
+        rows = [(u, t, v) for k, u, t, v in entries if k == kind]
+        if not rows:
+            continue
+        target = getattr(model, target_col)
+
+        # Targets deleted since the vote was buffered would fail the batch
+        live = set(db.session.execute(
+            select(target_model.id).where(target_model.id.in_({t for _, t, _ in rows}))
+        ).scalars())
+        rows = [row for row in rows if row[1] in live]
+        for user_id, target_id, value in rows:
+            record(f"{kind}.voted", target_id, user_id=user_id, value=value, buffered=True)
+
+        # Log net changes against the stored votes for the vote history
+        stored = dict(((u, t), v) for u, t, v in db.session.execute(
+            select(model.user_id, target, model.value)
+            .where(tuple_(model.user_id, target).in_([(u, t) for u, t, _ in rows]))
+        ))
+        log_votes(kind, [(u, t, v, stored.get((u, t), 0)) for u, t, v in rows])
+
+        # Upserted rows are deleted first so the same code works everywhere;
+        # Postgres and SQLite take the ON CONFLICT path instead
+        removed = [(u, t) for u, t, v in rows if v == 0]
+        kept = [{"user_id": u, target_col: t, "value": v} for u, t, v in rows if v != 0]
+        if removed:
+            db.session.execute(delete(model).where(
+                tuple_(model.user_id, target).in_(removed)
+            ))
+        if kept:
+            dialect = db.engine.dialect.name
+            if dialect in ('postgresql', 'sqlite'):
+                if dialect == 'postgresql':
+                    from sqlalchemy.dialects.postgresql import insert
+                else:
+                    from sqlalchemy.dialects.sqlite import insert
+                stmt = insert(model)
+                db.session.execute(stmt.on_conflict_do_update(
+                    index_elements=['user_id', target_col],
+                    set_={"value": stmt.excluded.value},
+                ), kept)
+            else:
+                db.session.execute(delete(model).where(
+                    tuple_(model.user_id, target).in_([(r["user_id"], r[target_col]) for r in kept])
+                ))
+                db.session.execute(model.__table__.insert(), kept)
+
+
+def flush(buffer):
+    """Flush one batch; returns how many vote states were written"""
+    spilled, claimed = _claim_spill()
+    entries = buffer.begin_flush()
+    if not entries and not spilled:
+        buffer.end_flush()
+        return 0
+
+    # Spilled entries are older than anything in the buffer, so apply them
+    # first and let the buffer's states win
+    merged = {(k, u, t): v for k, u, t, v in spilled}
+    merged.update({(k, u, t): v for k, u, t, v in entries})
+    batch = [(*key, value) for key, value in merged.items()]
+    try:
+        apply_votes(batch)
+        db.session.commit()
+        return len(batch)
+    except Exception as e:
+        db.session.rollback()
+        print(f"Vote flush error: {e}")
+        _append_spill(batch)
+        return 0
+    finally:
+        if claimed:
+            os.remove(claimed)
+        buffer.end_flush()
+
+
+# -------------------- Durable Fallback --------------------
+
+def _claim_spill():
+    """Atomically take over the spill file; returns (entries, claimed_path)"""
+    path = current_app.config['VOTE_SPILL_PATH']
+    claimed = f"{path}.{os.getpid()}.claimed"
+    try:
+        os.rename(path, claimed)
+    except FileNotFoundError:
+        return [], None
+    with open(claimed) as f:
+        return [tuple(json.loads(line)) for line in f if line.strip()], claimed
+
+
+def _append_spill(entries):
+    path = current_app.config['VOTE_SPILL_PATH']
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a') as f:
+        for entry in entries:
+            f.write(json.dumps(list(entry)) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+# -------------------- Background Flusher --------------------
+
+_wake = threading.Event()
+
+
+def _wake_flusher():
+    _wake.set()
+
+
+def _start_flusher(app, buffer):
+    interval = app.config['VOTE_FLUSH_INTERVAL_MS'] / 1000.0
+
+    def run():
+        while True:
+            _wake.wait(interval)
+            _wake.clear()
+            with app.app_context():
+                flush(buffer)
+                db.session.remove()
+
+    threading.Thread(target=run, name='vote-flusher', daemon=True).start()
+
+    def flush_on_exit():
+        with app.app_context():
+            flush(buffer)
+
+    atexit.register(flush_on_exit)
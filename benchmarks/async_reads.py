@@ -0,0 +1,149 @@
+"""Concurrency benchmark: sync Flask workers vs. the async read path.
+
+Opens N concurrent keep-alive connections per level and has each one send
+GET requests in a loop for ``--duration`` seconds. With ``--slow-client-ms``
+every request line is trickled out in two halves with a pause between them,
+the way a mobile client on a bad link behaves. A thread-per-request server
+keeps a thread busy during that pause. An event loop does not.
+
+Start the servers you want to compare against the same database, e.g.:
+
+    gunicorn -w 4 --threads 8 -b :5000 run:app       # sync, 32 in flight
+    uvicorn asgi:app --port 8000                      # async read path
+
+then:
+
+    python benchmarks/async_reads.py --slow-client-ms 200 \\
+        --url http://127.0.0.1:5000/questions/1 \\
+        --url http://127.0.0.1:8000/questions/1 \\
+        --concurrency 32,256,2048
+
+For each server and level it prints throughput, latency percentiles and
+connection errors/timeouts. Only the standard library is needed. Raise
+``ulimit -n`` before trying thousands of connections.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+async def _read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed")
+    version, status = status_line.split()[:2]
+    status = int(status)
+    length, chunked = 0, False
+    keep_alive = version == b'HTTP/1.1'
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name = name.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding' and 'chunked' in value:
+            chunked = True
+        elif name == 'connection':
+            keep_alive = value.strip().lower() == 'keep-alive'
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(length)
+    return status, keep_alive
+
+
+async def _client(url, deadline, slow, timeout, results):
+    parts = urlsplit(url)
+    target = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+    request = (f"GET {target} HTTP/1.1\r\nHost: {parts.netloc}\r\n"
+               f"Connection: keep-alive\r\n\r\n").encode()
+    reader = writer = None
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(parts.hostname, parts.port or 80), timeout
+                )
+            if slow:
+                writer.write(request[:len(request) // 2])
+                await writer.drain()
+                await asyncio.sleep(slow)
+                writer.write(request[len(request) // 2:])
+            else:
+                writer.write(request)
+            await writer.drain()
+            status, keep_alive = await asyncio.wait_for(_read_response(reader), timeout)
+        except asyncio.TimeoutError:
+            results['timeouts'] += 1
+            writer = None
+            continue
+        except (OSError, ConnectionError, ValueError, IndexError, asyncio.IncompleteReadError):
+            results['errors'] += 1
+            writer = None
+            await asyncio.sleep(0.05)
+            continue
+        results['latencies'].append(time.monotonic() - started)
+        results['statuses'][status] = results['statuses'].get(status, 0) + 1
+        if not keep_alive:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run_level(url, concurrency, duration, slow, timeout):
+    results = {'latencies': [], 'statuses': {}, 'errors': 0, 'timeouts': 0}
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*(
+        _client(url, deadline, slow, timeout, results) for _ in range(concurrency)
+    ))
+    return results
+
+
+def _percentile(values, pct):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', action='append', required=True,
+                        help="Endpoint to load; repeat to compare servers.")
+    parser.add_argument('--concurrency', default='32,256,1024',
+                        help="Comma-separated connection counts.")
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--slow-client-ms', type=float, default=0.0)
+    parser.add_argument('--timeout', type=float, default=10.0)
+    args = parser.parse_args()
+
+    levels = [int(n) for n in args.concurrency.split(',')]
+    print(f"{'server':<40} {'conns':>6} {'req/s':>9} {'p50 ms':>8} "
+          f"{'p99 ms':>8} {'non-2xx':>8} {'errors':>7} {'timeouts':>8}")
+    for url in args.url:
+        for concurrency in levels:
+            r = asyncio.run(run_level(
+                url, concurrency, args.duration, args.slow_client_ms / 1000, args.timeout
+            ))
+            lat = r['latencies']
+            non_2xx = sum(n for status, n in r['statuses'].items() if status >= 300)
+            print(f"{url:<40} {concurrency:>6} {len(lat) / args.duration:>9.1f} "
+                  f"{_percentile(lat, 50) * 1000:>8.1f} {_percentile(lat, 99) * 1000:>8.1f} "
+                  f"{non_2xx:>8} {r['errors']:>7} {r['timeouts']:>8}")
+            if lat:
+                print(f"{'':<40} {'':>6} mean {statistics.mean(lat) * 1000:.1f} ms, "
+                      f"statuses {dict(sorted(r['statuses'].items()))}")
+
+
+if __name__ == '__main__':
+    main()
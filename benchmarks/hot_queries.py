@@ -0,0 +1,91 @@
+"""Per-call overhead of the hot lookups: ``Model.query`` vs app/hotqueries.py.
+
+Seeds a throwaway database (in-memory sqlite unless ``DATABASE_URL`` is
+set), then times each lookup both ways with the same arguments, inside one
+session, so the numbers are mostly Python-side statement construction and
+compilation:
+
+    python benchmarks/hot_queries.py --calls 20000
+
+Against Postgres with psycopg 3, the hotqueries column also includes
+server-side prepared statements (``DB_PREPARE_THRESHOLD``).
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ.setdefault('OUTBOX_DISPATCHER', 'off')
+
+
+def _time(fn, calls):
+    fn(0)  # warm the compiled cache
+    started = time.perf_counter()
+    for i in range(calls):
+        fn(i)
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--calls', type=int, default=20000)
+    parser.add_argument('--rows', type=int, default=1000)
+    args = parser.parse_args()
+
+    from app import create_app, db, hotqueries
+    from app.models import Question, QuestionVote, Tag, User
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        if not User.query.first():
+            db.session.add_all(
+                User(username=f"bench{i}", email=f"bench{i}@example.com") for i in range(args.rows)
+            )
+            db.session.add_all(Tag(name=f"bench-tag-{i}") for i in range(args.rows))
+            db.session.flush()
+            db.session.add(Question(title="bench", description="bench", user_id=1))
+            db.session.flush()
+            db.session.add_all(
+                QuestionVote(user_id=i + 1, question_id=1, value=1) for i in range(args.rows)
+            )
+            db.session.commit()
+        n = args.rows
+
+        cases = [
+            ("load_user",
+             lambda i: User.query.get(i % n + 1),
+             lambda i: hotqueries.user_by_id(i % n + 1)),
+            ("load_user (cold)",
+             lambda i: (db.session.expunge_all(), User.query.get(i % n + 1)),
+             lambda i: (db.session.expunge_all(), hotqueries.user_by_id(i % n + 1))),
+            ("user by email",
+             lambda i: User.query.filter_by(email=f"bench{i % n}@example.com").first(),
+             lambda i: hotqueries.user_by_email(f"bench{i % n}@example.com")),
+            ("email status (row)",
+             lambda i: User.query.filter_by(email=f"bench{i % n}@example.com").first(),
+             lambda i: hotqueries.email_status(f"bench{i % n}@example.com")),
+            ("tag by name",
+             lambda i: Tag.query.filter_by(name=f"bench-tag-{i % n}").first(),
+             lambda i: hotqueries.tag_by_name(f"bench-tag-{i % n}")),
+            ("vote exists",
+             lambda i: QuestionVote.query.filter_by(user_id=i % n + 1, question_id=1).first(),
+             lambda i: hotqueries.question_vote(i % n + 1, 1)),
+        ]
+
+        print(f"{db.engine.dialect.name}/{db.engine.driver}, {args.calls} calls each")
+        print(f"{'lookup':<20} {'query µs':>10} {'hot µs':>10} {'saved':>7}")
+        for name, before, after in cases:
+            # A clean identity map each round, like a fresh request
+            db.session.expunge_all()
+            old = _time(before, args.calls)
+            db.session.expunge_all()
+            new = _time(after, args.calls)
+            print(f"{name:<20} {old:>10.1f} {new:>10.1f} {1 - new / old:>7.0%}")
+
+
+if __name__ == '__main__':
+    main()
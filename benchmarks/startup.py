@@ -0,0 +1,77 @@
+"""Worker cold-start benchmark.
+
+Runs ``create_app()`` in a fresh interpreter under ``python -X importtime``
+and fails (exit code 1) when startup goes over budget or when a module that
+is meant to load lazily shows up at boot. Intended for CI:
+
+    python benchmarks/startup.py --budget-ms 1500
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only be imported on first use of an auth route
+LAZY_MODULES = ('authlib', 'flask_mail', 'requests')
+
+BOOT = (
+    "import time; t = time.perf_counter(); "
+    "from app import create_app; create_app(); "
+    "print('create_app_ms=%.1f' % ((time.perf_counter() - t) * 1000))"
+)
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def run_once():
+    env = dict(os.environ)
+    # Startup must not need a live database; sqlite keeps the run hermetic
+    env.setdefault('DATABASE_URL', 'sqlite://')
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', BOOT],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    create_app_ms = float(proc.stdout.strip().split('=')[1])
+
+    imports = {}
+    for line in proc.stderr.splitlines():
+        m = IMPORTTIME_LINE.match(line)
+        if m:
+            imports[m.group(4)] = int(m.group(2))
+    return create_app_ms, imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budget-ms', type=float,
+                        default=float(os.getenv('STARTUP_BUDGET_MS', 1500)))
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    results = [run_once() for _ in range(args.runs)]
+    best_ms, imports = min(results, key=lambda r: r[0])
+
+    print(f"create_app(): best of {args.runs} = {best_ms:.1f} ms "
+          f"(budget {args.budget_ms:.0f} ms)")
+    print("Slowest imports (cumulative):")
+    for name, us in sorted(imports.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    failures = []
+    if best_ms > args.budget_ms:
+        failures.append(f"startup {best_ms:.1f} ms exceeds {args.budget_ms:.0f} ms")
+    for mod in LAZY_MODULES:
+        if mod in imports:
+            failures.append(f"'{mod}' is imported at startup but should be lazy")
+
+    for msg in failures:
+        print(f"FAIL: {msg}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
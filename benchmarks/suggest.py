@@ -0,0 +1,128 @@
+"""Keystroke-rate load on /search/suggest.
+
+Seeds a throwaway database with generated titles (in-memory sqlite unless
+``DATABASE_URL`` is set), then runs ``--typists`` threads that each type
+titles one character at a time, every ``--keystroke-ms``, sometimes with a
+typo. Every keystroke requests suggestions for the text so far, the way a
+search box would without debouncing:
+
+    python benchmarks/suggest.py --typists 50 --keystroke-ms 120 --duration 20
+
+Prints request rate, latency percentiles, the share of requests over the
+``--budget-ms`` latency budget and the prefix cache's hit rate. Run with
+``SUGGEST_CACHE_TTL=0`` to see the cost without the cache.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+os.environ.setdefault('OUTBOX_DISPATCHER', 'off')
+os.environ.setdefault('ADMISSION_CONTROL', 'off')
+
+WORDS = (
+    "python java rust async await database index query join postgres sqlite "
+    "flask react hooks state memory leak thread pool cache latency deploy "
+    "docker kubernetes error exception import module package test mock "
+    "recursion algorithm sorting graph tree binary search matrix vector"
+).split()
+
+
+def make_title(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 8)))
+
+
+def typo(text, rng):
+    """Swap two neighbouring letters somewhere in the text"""
+    if len(text) < 4:
+        return text
+    i = rng.randrange(1, len(text) - 2)
+    return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--titles', type=int, default=20000)
+    parser.add_argument('--typists', type=int, default=20)
+    parser.add_argument('--keystroke-ms', type=float, default=120)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--budget-ms', type=float, default=50)
+    parser.add_argument('--typo-rate', type=float, default=0.2)
+    args = parser.parse_args()
+
+    from app import create_app, db, suggest
+    from app.models import Question, User
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        if not Question.query.first():
+            db.session.add(User(username="bench", email="bench@example.com"))
+            db.session.flush()
+            db.session.add_all(
+                Question(title=make_title(random), description="bench", user_id=1)
+                for _ in range(args.titles)
+            )
+            db.session.commit()
+        # Build the in-memory index (sqlite) before the clock starts
+        app.test_client().get('/search/suggest?q=warmup')
+
+    latencies, lock = [], threading.Lock()
+    deadline = time.monotonic() + args.duration
+
+    def typist(seed):
+        r = random.Random(seed)
+        client = app.test_client()
+        mine = []
+        while time.monotonic() < deadline:
+            if r.random() < 0.5:
+                # Popular searches that many users type
+                text = r.choice(WORDS[:8]) + ' ' + r.choice(WORDS)
+            else:
+                title = make_title(r)
+                text = title[:r.randint(4, len(title))]
+            if r.random() < args.typo_rate:
+                text = typo(text, r)
+            for n in range(1, len(text) + 1):
+                if time.monotonic() >= deadline:
+                    break
+                started = time.perf_counter()
+                response = client.get('/search/suggest', query_string={'q': text[:n]})
+                mine.append(time.perf_counter() - started)
+                assert response.status_code == 200, response.status_code
+                time.sleep(args.keystroke_ms / 1000)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=typist, args=(i,)) for i in range(args.typists)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    with app.app_context():
+        stats = suggest.get_cache().stats()
+        dialect = db.engine.dialect.name
+    lookups = stats['hits'] + stats['misses'] + stats['coalesced']
+    over = sum(1 for x in latencies if x * 1000 > args.budget_ms)
+    print(f"{dialect}, {args.titles} titles, {args.typists} typists @ {args.keystroke_ms:.0f} ms/keystroke")
+    print(f"requests     {len(latencies)} ({len(latencies) / args.duration:.1f}/s)")
+    print(f"p50 / p99    {_percentile(latencies, 50) * 1000:.2f} / "
+          f"{_percentile(latencies, 99) * 1000:.2f} ms (max {max(latencies) * 1000:.2f} ms)")
+    print(f"over budget  {over} ({over / max(len(latencies), 1):.1%} > {args.budget_ms:.0f} ms)")
+    print(f"prefix cache {stats['hits'] + stats['coalesced']}/{lookups} served from cache "
+          f"({(stats['hits'] + stats['coalesced']) / max(lookups, 1):.0%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -11,6 +11,8 @@ interface Blog {
   id: number;
   title: string;
   content: string;
+  content_html: string | null;
+  reading_time: number | null;
   author: string;
 }
 
@@ -100,13 +102,21 @@ function BlogDetailContent() {
           </div>
         </div>
 
-        <div className="prose prose-lg max-w-none">
-          {blog.content.split('\n').map((paragraph, index) => (
-            <p key={index} className="text-gray-700 leading-relaxed mb-4">
-              {paragraph}
-            </p>
-          ))}
-        </div>
+        {blog.content_html ? (
+          // Sanitized server-side when the blog is saved
+          <div
+            className="prose prose-lg max-w-none text-gray-700"
+            dangerouslySetInnerHTML={{ __html: blog.content_html }}
+          />
+        ) : (
+          <div className="prose prose-lg max-w-none">
+            {blog.content.split('\n').map((paragraph, index) => (
+              <p key={index} className="text-gray-700 leading-relaxed mb-4">
+                {paragraph}
+              </p>
+            ))}
+          </div>
+        )}
       </article>
     </div>
   );
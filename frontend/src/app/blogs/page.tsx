@@ -9,7 +9,8 @@ import ProtectedRoute from '@/components/ProtectedRoute';
 interface Blog {
   id: number;
   title: string;
-  content: string;
+  excerpt: string | null;
+  reading_time: number | null;
   author: string;
 }
 
@@ -72,7 +73,7 @@ function BlogsContent() {
                 {blog.title}
               </h2>
               <p className="text-gray-600 mb-4 line-clamp-4">
-                {blog.content}
+                {blog.excerpt}
               </p>
               <div className="flex items-center text-sm text-gray-500">
                 <span className="bg-indigo-100 text-indigo-700 px-3 py-1 rounded-full">
@@ -16,13 +16,16 @@ function TagQuestionsContent() {
   const params = useParams();
   const tagName = params.name as string;
   const [questions, setQuestions] = useState<Question[]>([]);
+  const [next, setNext] = useState<number | null>(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     const fetchQuestions = async () => {
       try {
         const response = await getQuestionsByTag(tagName);
-        setQuestions(response.data);
+        setQuestions(response.data.items);
+        setNext(response.data.next);
       } catch (error) {
         console.error('Failed to fetch questions:', error);
       } finally {
@@ -32,6 +35,20 @@ function TagQuestionsContent() {
     fetchQuestions();
   }, [tagName]);
 
+  const loadMore = async () => {
+    if (next === null) return;
+    setLoadingMore(true);
+    try {
+      const response = await getQuestionsByTag(tagName, next);
+      setQuestions((prev) => [...prev, ...response.data.items]);
+      setNext(response.data.next);
+    } catch (error) {
+      console.error('Failed to fetch questions:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   if (loading) {
     return (
       <div className="flex justify-center items-center h-64">
@@ -71,6 +88,17 @@ function TagQuestionsContent() {
               </span>
             </Link>
           ))}
+          {next !== null && (
+            <div className="text-center">
+              <button
+                onClick={loadMore}
+                disabled={loadingMore}
+                className="bg-indigo-600 text-white px-6 py-2 rounded-lg hover:bg-indigo-700 transition disabled:opacity-50"
+              >
+                {loadingMore ? 'Loading...' : 'Load more'}
+              </button>
+            </div>
+          )}
         </div>
       )}
     </div>
@@ -3,7 +3,7 @@
 import Link from 'next/link';
 import Image from 'next/image';
 import { useAuth } from '@/context/AuthContext';
-import { logout } from '@/lib/api';
+import { avatarSrc, logout } from '@/lib/api';
 import { useRouter } from 'next/navigation';
 import { useState } from 'react';
 
@@ -73,9 +73,10 @@ export default function Navbar() {
             ) : isLoggedIn ? (
               <>
                 <div className="flex items-center space-x-2">
-                  {user?.avatar_url ? (
+                  {user?.avatar ? (
                     <Image
-                      src={user.avatar_url}
+                      src={avatarSrc(user.avatar, 48)}
+                      unoptimized
                       alt={user.username}
                       width={32}
                       height={32}
@@ -30,6 +30,9 @@ export const getCurrentUser = () => api.get('/auth/me');
 
 export const getGitHubAuthUrl = () => `${API_BASE_URL}/auth/github`;
 export const getGoogleAuthUrl = () => `${API_BASE_URL}/auth/google`;
+// Proxied, resized avatar; `path` is the `avatar` field of /auth/me
+export const avatarSrc = (path: string, size?: number) =>
+  `${API_BASE_URL}${path}${size ? `&size=${size}` : ''}`;
 
 // Blogs
 export const getBlogs = () => api.get('/blogs');
@@ -38,16 +41,33 @@ export const createBlog = (title: string, content: string, tags: string[] = [])
   api.post('/blogs', { title, content, tags });
 export const updateBlog = (id: number, title: string, content: string) =>
   api.put(`/blogs/${id}`, { title, content });
+export type PatchOp =
+  | { op: 'replace' | 'test'; path: string; value: string }
+  | { op: 'splice'; path: string; offset: number; remove?: number; insert?: string };
+export const patchBlog = (id: number, version: number, ops: PatchOp[]) =>
+  api.patch(`/blogs/${id}`, { version, ops });
 export const deleteBlog = (id: number) => api.delete(`/blogs/${id}`);
 export const getBlogTags = (id: number) => api.get(`/blogs/${id}/tags`);
+export const getRelatedForBlog = (id: number) => api.get(`/blogs/${id}/related`);
+export const getSimilarBlogs = (id: number) => api.get(`/blogs/${id}/similar`);
 
 // Questions
 export const getQuestions = () => api.get('/questions');
 export const getQuestion = (id: number) => api.get(`/questions/${id}`);
+export const getPopularQuestions = () => api.get('/questions/popular');
+export const browseQuestions = (
+  sort: 'active' | 'unanswered' | 'recent',
+  after?: string
+) => api.get('/questions/browse', { params: { sort, after } });
+export const getRelatedForQuestion = (id: number) => api.get(`/questions/${id}/related`);
+export const getSimilarQuestions = (title: string) =>
+  api.get('/questions/similar', { params: { title } });
 export const createQuestion = (title: string, description: string, tags: string[] = []) =>
   api.post('/questions', { title, description, tags });
 export const updateQuestion = (id: number, title: string, description: string) =>
   api.put(`/questions/${id}`, { title, description });
+export const patchQuestion = (id: number, version: number, ops: PatchOp[]) =>
+  api.patch(`/questions/${id}`, { version, ops });
 export const deleteQuestion = (id: number) => api.delete(`/questions/${id}`);
 
 // Comments
@@ -63,6 +83,10 @@ export const deleteComment = (id: number) => api.delete(`/comments/${id}`);
 export const voteQuestion = (id: number, value: number) =>
   api.post(`/questions/${id}/vote`, { value });
 export const getQuestionVotes = (id: number) => api.get(`/questions/${id}/votes`);
+export const getQuestionVoteHistory = (
+  id: number,
+  range: { from?: string; to?: string; resolution?: 'auto' | 'minute' | 'hour' | 'day' } = {}
+) => api.get(`/questions/${id}/vote-history`, { params: range });
 export const voteComment = (id: number, value: number) =>
   api.post(`/comments/${id}/vote`, { value });
 export const getCommentVotes = (id: number) => api.get(`/comments/${id}/votes`);
@@ -74,10 +98,35 @@ export const addTagToQuestion = (questionId: number, tag: string) =>
   api.post(`/questions/${questionId}/tags`, { tag });
 export const getQuestionTags = (questionId: number) =>
   api.get(`/questions/${questionId}/tags`);
-export const getQuestionsByTag = (tagName: string) =>
-  api.get(`/tags/${tagName}/questions`);
+export const getQuestionsByTag = (tagName: string, after?: number) =>
+  api.get(`/tags/${tagName}/questions`, { params: { after } });
+export const getQuestionsByTags = (
+  filters: { all?: string[]; any?: string[]; none?: string[] },
+  after?: number
+) =>
+  api.get('/tags/questions', {
+    params: {
+      all: filters.all?.join(','),
+      any: filters.any?.join(','),
+      none: filters.none?.join(','),
+      after,
+    },
+  });
 
 // Search
 export const search = (query: string) => api.get(`/search?q=${encodeURIComponent(query)}`);
+export const suggestTitles = (query: string, limit?: number) =>
+  api.get('/search/suggest', { params: { q: query, limit } });
+
+// Sync
+export const getChanges = (since = 0, limit?: number) =>
+  api.get('/changes', { params: { since, limit } });
+
+// Notifications
+export const getNotifications = (after?: number, limit?: number) =>
+  api.get('/notifications', { params: { after, limit } });
+export const getUnreadCount = () => api.get('/notifications/unread-count');
+export const markNotificationsRead = (ids?: number[]) =>
+  api.post('/notifications/read', ids ? { ids } : {});
 
 export default api;
@@ -0,0 +1,44 @@
+"""add question minhash
+
+Revision ID: 1591b7015bcc
+Revises: 62bb0cd3979f
+Create Date: 2026-10-19 12:47:09.112384
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1591b7015bcc'
+down_revision = '62bb0cd3979f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing questions are signed by `flask backfill-minhash`
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('minhash', sa.LargeBinary(), nullable=True))
+
+    op.create_table('question_lsh_band',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('band', sa.SmallInteger(), nullable=False),
+    sa.Column('bucket', sa.BigInteger(), nullable=False),
+    sa.Column('question_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['question_id'], ['question.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('question_lsh_band', schema=None) as batch_op:
+        batch_op.create_index('ix_question_lsh_band_bucket', ['band', 'bucket'], unique=False)
+        batch_op.create_index(batch_op.f('ix_question_lsh_band_question_id'), ['question_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('question_lsh_band', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_question_lsh_band_question_id'))
+        batch_op.drop_index('ix_question_lsh_band_bucket')
+
+    op.drop_table('question_lsh_band')
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.drop_column('minhash')
@@ -0,0 +1,37 @@
+"""add tag lookup indexes
+
+Revision ID: 1ad3ef93e10c
+Revises: 62b20b120bd2
+Create Date: 2026-10-19 11:20:37.551208
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1ad3ef93e10c'
+down_revision = '62b20b120bd2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # blog_tags was added to the models without a migration; databases built
+    # with `flask db upgrade` alone don't have it yet
+    if not sa.inspect(op.get_bind()).has_table('blog_tags'):
+        op.create_table('blog_tags',
+        sa.Column('blog_id', sa.Integer(), nullable=False),
+        sa.Column('tag_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['blog_id'], ['blog.id'], ),
+        sa.ForeignKeyConstraint(['tag_id'], ['tag.id'], ),
+        sa.PrimaryKeyConstraint('blog_id', 'tag_id')
+        )
+
+    op.create_index('ix_question_tags_tag_question', 'question_tags', ['tag_id', 'question_id'])
+    op.create_index('ix_blog_tags_tag_blog', 'blog_tags', ['tag_id', 'blog_id'])
+
+
+def downgrade():
+    op.drop_index('ix_blog_tags_tag_blog', table_name='blog_tags')
+    op.drop_index('ix_question_tags_tag_question', table_name='question_tags')
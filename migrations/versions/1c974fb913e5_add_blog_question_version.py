@@ -0,0 +1,32 @@
+"""add blog and question version
+
+Revision ID: 1c974fb913e5
+Revises: b60eb5068e6a
+Create Date: 2026-10-19 17:10:52.648130
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1c974fb913e5'
+down_revision = 'b60eb5068e6a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('blog', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.drop_column('version')
+
+    with op.batch_alter_table('blog', schema=None) as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,35 @@
+"""add blog rendered content
+
+Revision ID: 62b20b120bd2
+Revises: 7a4f7341ff2b
+Create Date: 2026-10-19 10:41:52.903114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '62b20b120bd2'
+down_revision = '7a4f7341ff2b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing rows stay NULL until `flask render-blogs` fills them in
+    with op.batch_alter_table('blog', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_html', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('excerpt', sa.String(length=300), nullable=True))
+        batch_op.add_column(sa.Column('reading_time', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('render_version', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('blog', schema=None) as batch_op:
+        batch_op.drop_column('render_version')
+        batch_op.drop_column('content_hash')
+        batch_op.drop_column('reading_time')
+        batch_op.drop_column('excerpt')
+        batch_op.drop_column('content_html')
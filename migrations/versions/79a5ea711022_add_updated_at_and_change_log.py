@@ -0,0 +1,59 @@
+"""add updated_at and change log
+
+Revision ID: 79a5ea711022
+Revises: b360af73eec2
+Create Date: 2026-10-19 16:21:37.902115
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '79a5ea711022'
+down_revision = 'b360af73eec2'
+branch_labels = None
+depends_on = None
+
+TABLES = ('tag', 'blog', 'question', 'comment')
+
+
+def upgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        if table == 'tag':
+            op.execute("UPDATE tag SET updated_at = CURRENT_TIMESTAMP")
+        else:
+            op.execute(f"UPDATE {table} SET updated_at = coalesce(created_at, CURRENT_TIMESTAMP)")
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.create_index(batch_op.f(f'ix_{table}_updated_at'), ['updated_at'], unique=False)
+
+    op.create_table('change_log',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('entity_type', sa.String(length=20), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('op', sa.String(length=10), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('change_log', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_change_log_changed_at'), ['changed_at'], unique=False)
+
+    # Seed the log so a client syncing from the start sees existing rows
+    for table in TABLES:
+        op.execute(f"""
+            INSERT INTO change_log (entity_type, entity_id, op, changed_at)
+            SELECT '{table}', id, 'upsert', updated_at FROM {table} ORDER BY updated_at, id
+        """)
+
+
+def downgrade():
+    with op.batch_alter_table('change_log', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_change_log_changed_at'))
+
+    op.drop_table('change_log')
+    for table in reversed(TABLES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(batch_op.f(f'ix_{table}_updated_at'))
+            batch_op.drop_column('updated_at')
@@ -0,0 +1,30 @@
+"""add username prefix index
+
+Revision ID: 7a4f7341ff2b
+Revises: 52285367b791
+Create Date: 2026-10-19 10:02:11.418230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a4f7341ff2b'
+down_revision = '52285367b791'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The unique index on user.username can't serve LIKE 'prefix%' under a
+    # non-C collation; a pattern_ops index lets unique_username() stay a
+    # single index range scan.
+    op.create_index(
+        'ix_user_username_pattern', 'user', ['username'],
+        postgresql_ops={'username': 'varchar_pattern_ops'},
+    )
+
+
+def downgrade():
+    op.drop_index('ix_user_username_pattern', table_name='user')
@@ -0,0 +1,42 @@
+"""add title trigram indexes
+
+Revision ID: 9b013931220b
+Revises: e9e93005a21a
+Create Date: 2026-10-19 18:06:21.530917
+
+GIN trigram indexes on lower(title) for /search/suggest. Built
+CONCURRENTLY so question and blog stay writable while they build. Postgres
+only: other databases use the in-memory index in app/suggest.py.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b013931220b'
+down_revision = 'e9e93005a21a'
+branch_labels = None
+depends_on = None
+
+TABLES = ('question', 'blog')
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_title_trgm "
+                f"ON {table} USING gin (lower(title) gin_trgm_ops)"
+            )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS ix_{table}_title_trgm")
@@ -0,0 +1,45 @@
+"""add question activity columns
+
+Revision ID: b60eb5068e6a
+Revises: 79a5ea711022
+Create Date: 2026-10-19 16:48:05.113964
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b60eb5068e6a'
+down_revision = '79a5ea711022'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('last_activity_at', sa.DateTime(), nullable=True))
+
+    # One pass here; `flask reconcile-question-stats` does the same in batches
+    op.execute("""
+        UPDATE question SET
+            comment_count = (SELECT count(*) FROM comment WHERE comment.question_id = question.id),
+            last_activity_at = coalesce(
+                (SELECT max(comment.created_at) FROM comment WHERE comment.question_id = question.id),
+                question.created_at, CURRENT_TIMESTAMP
+            )
+    """)
+
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.alter_column('last_activity_at', existing_type=sa.DateTime(), nullable=False)
+        batch_op.create_index('ix_question_comment_count', ['comment_count', 'id'], unique=False)
+        batch_op.create_index('ix_question_last_activity', ['last_activity_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('question', schema=None) as batch_op:
+        batch_op.drop_index('ix_question_last_activity')
+        batch_op.drop_index('ix_question_comment_count')
+        batch_op.drop_column('last_activity_at')
+        batch_op.drop_column('comment_count')
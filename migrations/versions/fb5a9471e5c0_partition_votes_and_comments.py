@@ -0,0 +1,230 @@
+"""partition votes and comments
+
+Revision ID: fb5a9471e5c0
+Revises: 1591b7015bcc
+Create Date: 2026-10-19 14:12:40.286511
+
+Converts question_vote / comment_vote to HASH partitioning on their target
+id and comment to monthly RANGE partitioning on created_at, without a long
+write lock:
+
+1. create a partitioned shadow table and a trigger mirroring every write
+   on the live table into it
+2. copy existing rows across in id-ranged batches, committing per batch
+3. take a brief ACCESS EXCLUSIVE lock, reconcile, and swap the names
+
+The old tables are kept as <table>_legacy for verification; drop them by
+hand once satisfied. Postgres only: other databases keep plain tables.
+
+Partition keys must be part of every unique constraint, so the primary keys
+become (id, <key>). Nothing can reference comment.id any more, so the
+comment.parent_id and comment_vote.comment_id foreign keys are dropped and
+those references are kept by the application.
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'fb5a9471e5c0'
+down_revision = '1591b7015bcc'
+branch_labels = None
+depends_on = None
+
+HASH_PARTITIONS = 8
+BATCH_SIZE = 10000
+MONTHS_AHEAD = 3
+
+
+def _month_starts(first, months_ahead):
+    now = datetime.utcnow()
+    year, month = first.year, first.month
+    end = (now.year * 12 + now.month - 1) + months_ahead
+    while year * 12 + month - 1 <= end:
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def _next_month(year, month):
+    return (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def _create_vote_shadow(table, key, unique_name, fks):
+    shadow = f"{table}_partitioned"
+    op.execute(f"""
+        CREATE TABLE {shadow} (LIKE {table} INCLUDING DEFAULTS)
+        PARTITION BY HASH ({key})
+    """)
+    op.execute(f"ALTER TABLE {shadow} ADD CONSTRAINT {shadow}_pkey PRIMARY KEY (id, {key})")
+    op.execute(f"ALTER TABLE {shadow} ADD CONSTRAINT {unique_name}_p UNIQUE (user_id, {key})")
+    op.execute(f"CREATE INDEX ix_{table}_{key}_p ON {shadow} ({key})")
+    for column, target in fks:
+        op.execute(f'ALTER TABLE {shadow} ADD FOREIGN KEY ({column}) REFERENCES "{target}" (id)')
+    for remainder in range(HASH_PARTITIONS):
+        op.execute(f"""
+            CREATE TABLE {table}_h{remainder} PARTITION OF {shadow}
+            FOR VALUES WITH (MODULUS {HASH_PARTITIONS}, REMAINDER {remainder})
+        """)
+
+
+def _create_comment_shadow(bind):
+    op.execute("UPDATE comment SET created_at = now() WHERE created_at IS NULL")
+    op.execute("""
+        CREATE TABLE comment_partitioned (LIKE comment INCLUDING DEFAULTS)
+        PARTITION BY RANGE (created_at)
+    """)
+    op.execute("ALTER TABLE comment_partitioned ALTER COLUMN created_at SET NOT NULL")
+    op.execute("ALTER TABLE comment_partitioned ADD CONSTRAINT comment_partitioned_pkey PRIMARY KEY (id, created_at)")
+    op.execute("CREATE INDEX ix_comment_question_created_p ON comment_partitioned (question_id, created_at)")
+    op.execute("CREATE INDEX ix_comment_parent_id_p ON comment_partitioned (parent_id)")
+    op.execute('ALTER TABLE comment_partitioned ADD FOREIGN KEY (user_id) REFERENCES "user" (id)')
+    op.execute('ALTER TABLE comment_partitioned ADD FOREIGN KEY (question_id) REFERENCES question (id)')
+
+    first = bind.execute(sa.text("SELECT min(created_at) FROM comment")).scalar() or datetime.utcnow()
+    for year, month in _month_starts(first, MONTHS_AHEAD):
+        ny, nm = _next_month(year, month)
+        op.execute(f"""
+            CREATE TABLE comment_y{year}m{month:02d} PARTITION OF comment_partitioned
+            FOR VALUES FROM ('{year}-{month:02d}-01') TO ('{ny}-{nm:02d}-01')
+        """)
+    # Catches rows beyond the pre-created months until `flask partitions ensure` runs
+    op.execute("CREATE TABLE comment_default PARTITION OF comment_partitioned DEFAULT")
+
+
+def _install_sync_trigger(table):
+    shadow = f"{table}_partitioned"
+    op.execute(f"""
+        CREATE FUNCTION {table}_sync() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM {shadow} WHERE id = OLD.id;
+            END IF;
+            IF TG_OP = 'DELETE' THEN
+                RETURN OLD;
+            END IF;
+            INSERT INTO {shadow} SELECT NEW.* ON CONFLICT DO NOTHING;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute(f"""
+        CREATE TRIGGER {table}_sync AFTER INSERT OR UPDATE OR DELETE ON {table}
+        FOR EACH ROW EXECUTE FUNCTION {table}_sync()
+    """)
+
+
+def _backfill(bind, table):
+    # Rows written after max_id are mirrored by the trigger
+    max_id = bind.execute(sa.text(f"SELECT coalesce(max(id), 0) FROM {table}")).scalar()
+    for low in range(0, max_id, BATCH_SIZE):
+        with op.get_context().autocommit_block():
+            bind.execute(sa.text(f"""
+                INSERT INTO {table}_partitioned
+                SELECT * FROM {table} WHERE id > :low AND id <= :high
+                ON CONFLICT DO NOTHING
+            """), {"low": low, "high": low + BATCH_SIZE})
+
+
+def _swap(table, renames):
+    op.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+    # A row deleted while its batch was being copied can survive in the shadow
+    op.execute(f"""
+        DELETE FROM {table}_partitioned n
+        WHERE NOT EXISTS (SELECT 1 FROM {table} o WHERE o.id = n.id)
+    """)
+    op.execute(f"DROP TRIGGER {table}_sync ON {table}")
+    op.execute(f"DROP FUNCTION {table}_sync()")
+    op.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+    op.execute(f"ALTER TABLE {table}_partitioned RENAME TO {table}")
+    op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+    for old, new in renames:
+        op.execute(f"ALTER INDEX {old} RENAME TO {new}")
+    # The legacy copy must not block deletes of users/questions
+    op.execute(f"""
+        DO $$ DECLARE fk record; BEGIN
+            FOR fk IN SELECT conname FROM pg_constraint
+                      WHERE conrelid = '{table}_legacy'::regclass AND contype = 'f' LOOP
+                EXECUTE format('ALTER TABLE {table}_legacy DROP CONSTRAINT %I', fk.conname);
+            END LOOP;
+        END $$
+    """)
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        # Plain tables elsewhere; just add the indexes the models declare
+        with op.batch_alter_table('question_vote', schema=None) as batch_op:
+            batch_op.create_index('ix_question_vote_question_id', ['question_id'], unique=False)
+        with op.batch_alter_table('comment_vote', schema=None) as batch_op:
+            batch_op.create_index('ix_comment_vote_comment_id', ['comment_id'], unique=False)
+        with op.batch_alter_table('comment', schema=None) as batch_op:
+            batch_op.create_index('ix_comment_question_created', ['question_id', 'created_at'], unique=False)
+        return
+
+    op.execute("ALTER TABLE comment_vote DROP CONSTRAINT IF EXISTS comment_vote_comment_id_fkey")
+    op.execute("ALTER TABLE comment DROP CONSTRAINT IF EXISTS comment_parent_id_fkey")
+
+    _create_vote_shadow('question_vote', 'question_id', 'unique_question_vote',
+                        [('user_id', 'user'), ('question_id', 'question')])
+    _create_vote_shadow('comment_vote', 'comment_id', 'unique_comment_vote',
+                        [('user_id', 'user')])
+    _create_comment_shadow(bind)
+    for table in ('question_vote', 'comment_vote', 'comment'):
+        _install_sync_trigger(table)
+
+    for table in ('question_vote', 'comment_vote', 'comment'):
+        _backfill(bind, table)
+
+    _swap('question_vote', [
+        ('unique_question_vote', 'unique_question_vote_legacy'),
+        ('unique_question_vote_p', 'unique_question_vote'),
+        ('ix_question_vote_question_id_p', 'ix_question_vote_question_id'),
+    ])
+    _swap('comment_vote', [
+        ('unique_comment_vote', 'unique_comment_vote_legacy'),
+        ('unique_comment_vote_p', 'unique_comment_vote'),
+        ('ix_comment_vote_comment_id_p', 'ix_comment_vote_comment_id'),
+    ])
+    _swap('comment', [
+        ('ix_comment_question_created_p', 'ix_comment_question_created'),
+        ('ix_comment_parent_id_p', 'ix_comment_parent_id'),
+    ])
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        with op.batch_alter_table('comment', schema=None) as batch_op:
+            batch_op.drop_index('ix_comment_question_created')
+        with op.batch_alter_table('comment_vote', schema=None) as batch_op:
+            batch_op.drop_index('ix_comment_vote_comment_id')
+        with op.batch_alter_table('question_vote', schema=None) as batch_op:
+            batch_op.drop_index('ix_question_vote_question_id')
+        return
+
+    # Copy current data back into the legacy tables and swap them in again
+    for table, renames in (
+        ('comment', []),
+        ('comment_vote', [('unique_comment_vote_legacy', 'unique_comment_vote')]),
+        ('question_vote', [('unique_question_vote_legacy', 'unique_question_vote')]),
+    ):
+        op.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+        op.execute(f"TRUNCATE {table}_legacy")
+        op.execute(f"INSERT INTO {table}_legacy SELECT * FROM {table}")
+        # Move the id sequence over first; dropping its owner would drop it
+        op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}_legacy.id")
+        op.execute(f"DROP TABLE {table} CASCADE")
+        op.execute(f"ALTER TABLE {table}_legacy RENAME TO {table}")
+        for old, new in renames:
+            op.execute(f"ALTER INDEX {old} RENAME TO {new}")
+
+    op.execute('ALTER TABLE comment ADD FOREIGN KEY (user_id) REFERENCES "user" (id)')
+    op.execute("ALTER TABLE comment ADD FOREIGN KEY (question_id) REFERENCES question (id)")
+    op.execute("ALTER TABLE comment ADD FOREIGN KEY (parent_id) REFERENCES comment (id)")
+    op.execute('ALTER TABLE comment_vote ADD FOREIGN KEY (user_id) REFERENCES "user" (id)')
+    op.execute("ALTER TABLE comment_vote ADD FOREIGN KEY (comment_id) REFERENCES comment (id)")
+    op.execute('ALTER TABLE question_vote ADD FOREIGN KEY (user_id) REFERENCES "user" (id)')
+    op.execute("ALTER TABLE question_vote ADD FOREIGN KEY (question_id) REFERENCES question (id)")
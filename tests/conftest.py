@@ -0,0 +1,127 @@
+import os
+import socketserver
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def app_env(tmp_path):
+    """Environment for an app on a throwaway SQLite database, with every on-disk path under tmp_path"""
+    return {
+        'DATABASE_URL': f"sqlite:///{tmp_path / 'test.db'}",
+        'OUTBOX_DISPATCHER': 'off',
+        'ADMISSION_CONTROL': 'off',
+        'SNAPSHOT_PATH': str(tmp_path / 'snapshot.bin'),
+        'TFIDF_INDEX_DIR': str(tmp_path / 'tfidf'),
+        'FEEDS_DIR': str(tmp_path / 'feeds'),
+        'PROFILE_DIR': str(tmp_path / 'profiles'),
+        'AVATAR_DIR': str(tmp_path / 'avatars'),
+        'VOTE_SPILL_PATH': str(tmp_path / 'vote-spill.jsonl'),
+        'OIDC_CACHE_PATH': str(tmp_path / 'google-oidc.json'),
+    }
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """An app configured by app_env()"""
+    for name, value in app_env(tmp_path).items():
+        monkeypatch.setenv(name, value)
+
+    from app import create_app, db
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def login(client, user_id):
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+
+
+class SMTPStub(socketserver.ThreadingTCPServer):
+    """Local SMTP server that records messages.
+
+    ``hangup_after`` drops the connection without a reply once that many
+    messages went over it; ``max_connections`` turns later connections away
+    with 421; mail to an address in ``refuse`` is rejected with 550.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.messages = []
+        self.connections = 0
+        self.hangup_after = None
+        self.max_connections = None
+        self.refuse = set()
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        if server.max_connections is not None and server.connections > server.max_connections:
+            self.reply('421 busy')
+            return
+        self.reply('220 stub')
+        sent, rcpt = 0, []
+        while True:
+            line = self.rfile.readline().decode().strip()
+            verb = line.split(' ', 1)[0].upper()
+            if not line or verb == 'QUIT':
+                self.reply('221 bye')
+                return
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250 stub')
+            elif verb == 'MAIL':
+                if server.hangup_after is not None and sent >= server.hangup_after:
+                    return  # hang up mid-session
+                rcpt = []
+                self.reply('250 ok')
+            elif verb == 'RCPT':
+                address = line.split(':', 1)[1].strip().strip('<>')
+                if address in server.refuse:
+                    self.reply('550 no such user')
+                else:
+                    rcpt.append(address)
+                    self.reply('250 ok')
+            elif verb == 'DATA':
+                self.reply('354 go ahead')
+                data = []
+                while (chunk := self.rfile.readline()) not in (b'.\r\n', b''):
+                    data.append(chunk)
+                server.messages.append((rcpt, b''.join(data)))
+                sent += 1
+                self.reply('250 queued')
+            else:
+                self.reply('250 ok')
+
+
+@pytest.fixture
+def smtp(app):
+    server = SMTPStub()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    app.config.update(
+        MAIL_SERVER='127.0.0.1', MAIL_PORT=server.server_address[1], MAIL_USE_TLS=False,
+        MAIL_DEFAULT_SENDER='noreply@studenthub.test', MAIL_SUPPRESS_SEND=False,
+    )
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,83 @@
+import pytest
+
+from app import create_app
+from app.admission import PRIORITIES, RouteClass, _overloaded_above, route_class
+
+
+def test_admission_control_is_off_by_default(app, monkeypatch):
+    monkeypatch.delenv('ADMISSION_CONTROL')
+    assert create_app().test_client().get('/admission/stats').status_code == 404
+
+
+def test_requests_are_admitted_by_their_route_class(app, monkeypatch):
+    monkeypatch.setenv('ADMISSION_CONTROL', 'on')
+    client = create_app().test_client()
+    client.get('/blogs')
+    client.get('/auth/me')
+    client.get('/blogs/1')
+
+    classes = client.get('/admission/stats').json['classes']
+    assert classes['bulk']['admitted'] == 1
+    assert classes['critical']['admitted'] == 1
+    assert classes['default']['admitted'] == 1
+
+
+def test_route_class_rejects_unknown_names():
+    with pytest.raises(ValueError):
+        route_class('urgent')
+
+
+def test_wait_of_a_higher_class_sheds_the_lower_ones():
+    classes = {name: RouteClass(name, 1, 100) for name in PRIORITIES}
+    classes['critical']._observe(1.0)
+    assert [_overloaded_above(classes, name, 0.1) for name in PRIORITIES] == [False, True, True]
+
+    classes = {name: RouteClass(name, 1, 100) for name in PRIORITIES}
+    classes['default']._observe(1.0)
+    assert [_overloaded_above(classes, name, 0.1) for name in PRIORITIES] == [False, False, True]
+
+    # Only the lowest class sheds on its own queueing
+    classes = {name: RouteClass(name, 1, 100) for name in PRIORITIES}
+    classes['bulk']._observe(1.0)
+    assert [_overloaded_above(classes, name, 0.1) for name in PRIORITIES] == [False, False, True]
+
+
+@pytest.fixture
+def busy_app(app, monkeypatch):
+    """Admission on with one slot per class and 50ms queue waits"""
+    monkeypatch.setenv('ADMISSION_CONTROL', 'on')
+    monkeypatch.setenv('ADMISSION_LIMITS', 'critical=1,default=1,bulk=1')
+    monkeypatch.setenv('ADMISSION_MAX_WAIT_MS', 'critical=50,default=50,bulk=50')
+    monkeypatch.setenv('ADMISSION_TARGET_MS', '5')
+    busy = create_app()
+    busy.config['TESTING'] = True
+    client = busy.test_client()
+
+    # Holds its class's only slot while making a request of the same class
+    @busy.route('/test/hold/<path:inner>')
+    @route_class('critical')
+    def hold(inner):
+        response = client.get(f'/{inner}')
+        return str(response.status_code), 200, {'X-Inner-Retry': response.headers.get('Retry-After', '')}
+
+    return client
+
+
+def test_queue_timeout_then_shedding_by_class(busy_app):
+    client = busy_app
+    # /auth/me is critical: the nested call waits 50ms for the held slot and gives up
+    response = client.get('/test/hold/auth/me')
+    assert response.data == b'503'
+    assert response.headers['X-Inner-Retry'] == '1'
+
+    # Critical is now over its wait target, so lower classes are refused at once
+    assert client.get('/blogs').status_code == 503
+    assert client.get('/blogs/1').status_code == 503
+    assert client.get('/auth/me').status_code == 401  # admitted, just not logged in
+
+    classes = client.get('/admission/stats').json['classes']
+    assert classes['critical']['timed_out'] == 1
+    assert classes['critical']['admitted'] == 2
+    assert (classes['default']['shed'], classes['bulk']['shed']) == (1, 1)
+    assert (classes['default']['admitted'], classes['bulk']['admitted']) == (0, 0)
+    assert classes['critical']['in_flight'] == 0
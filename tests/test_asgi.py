@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('aiosqlite')
+pytest.importorskip('asgiref')
+pytest.importorskip('greenlet')
+httpx = pytest.importorskip('httpx')
+
+from app.asgi import create_asgi_app
+from conftest import login
+
+PATHS = [
+    '/blogs',
+    '/questions/1', '/questions/99',
+    '/questions/1/comments', '/questions/99/comments',
+    '/search?q=python', '/search',
+    '/tags',
+]
+
+
+def test_async_handlers_match_the_flask_routes(app, client):
+    client.post('/signup', json={'username': 'ada', 'email': 'ada@example.com', 'password': 'secret123'})
+    login(client, 1)
+    client.post('/blogs', json={'title': 'Python tips', 'content': 'Use **sorted**'})
+    client.post('/questions', json={'title': 'Python lists?', 'description': 'How to sort'})
+    client.post('/questions/1/comments', json={'content': 'Use sorted'})
+    client.post('/questions/1/comments', json={'content': 'Thanks', 'parent_id': 1})
+    client.post('/questions/1/tags', json={'tag': 'python'})
+    client.get('/logout')
+
+    asgi_app = create_asgi_app()
+
+    async def fetch_all():
+        transport = httpx.ASGITransport(app=asgi_app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as async_client:
+            return [await async_client.get(path) for path in PATHS]
+
+    for path, async_response in zip(PATHS, asyncio.run(fetch_all())):
+        sync_response = client.get(path)
+        assert async_response.status_code == sync_response.status_code, path
+        assert async_response.headers['content-type'] == sync_response.content_type, path
+        assert async_response.content == sync_response.data, path
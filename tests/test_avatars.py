@@ -0,0 +1,191 @@
+import io
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+
+from app import db, outbox
+from app.avatars import AvatarStore, avatar_path, version
+from app.auth_routes import sync_avatar
+from app.models import User
+
+
+def png(color, size=(400, 300)):
+    out = io.BytesIO()
+    Image.new('RGB', size, color).save(out, 'PNG')
+    return out.getvalue()
+
+
+@pytest.fixture
+def gate():
+    """Holds the source's /slow/ requests while cleared"""
+    event = threading.Event()
+    event.set()
+    yield event
+    event.set()
+
+
+@pytest.fixture
+def source(gate):
+    """Local HTTP stub serving avatar images; counts requests per path"""
+    images = {'/red.png': png('red'), '/blue.png': png('blue')}
+    hits = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits[self.path] = hits.get(self.path, 0) + 1
+            if self.path.startswith('/slow/'):
+                gate.wait(10)
+                self.path = self.path[len('/slow'):]
+            if self.path == '/text':
+                body, kind = b'not an image', 'text/plain'
+            elif self.path in images:
+                body, kind = images[self.path], 'image/png'
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', kind)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    yield base, hits
+    gate.set()
+    server.shutdown()
+
+
+@pytest.fixture
+def avatar_app(app):
+    app.config['AVATAR_ALLOWED_HOSTS'] = ['127.0.0.1']
+    yield app
+    for name in ('studenthub.avatar_refresher', 'studenthub.avatar_pool'):
+        executor = app.extensions.get(name)
+        if executor is not None:
+            executor.shutdown()
+
+
+def wait_for_refreshes(app):
+    """Let queued background refreshes finish"""
+    refresher = app.extensions.pop('studenthub.avatar_refresher', None)
+    if refresher is not None:
+        refresher.shutdown(wait=True)
+
+
+def add_user(app, avatar_url):
+    with app.app_context():
+        user = User(username='ada', email='ada@example.com', avatar_url=avatar_url)
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def test_thumbnail_is_fetched_once_and_cached(avatar_app, source):
+    base, hits = source
+    user_id = add_user(avatar_app, f"{base}/red.png")
+    client = avatar_app.test_client()
+
+    first = client.get(f"/avatars/{user_id}")
+    assert first.status_code == 200
+    assert first.mimetype == 'image/png'
+    assert Image.open(io.BytesIO(first.data)).size == (96, 96)
+    assert first.cache_control.public and first.cache_control.max_age == 86400
+
+    again = client.get(f"/avatars/{user_id}?size=40")
+    assert again.status_code == 200
+    assert Image.open(io.BytesIO(again.data)).size == (48, 48)
+    assert hits == {'/red.png': 1}
+
+    # Revalidation by ETag
+    etag = first.headers['ETag']
+    assert client.get(f"/avatars/{user_id}", headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_versioned_url_is_immutable(avatar_app, source):
+    base, _ = source
+    user_id = add_user(avatar_app, f"{base}/red.png")
+    with avatar_app.app_context():
+        path = avatar_path(db.session.get(User, user_id))
+    assert path == f"/avatars/{user_id}?v={version(base + '/red.png')}"
+
+    response = avatar_app.test_client().get(path)
+    assert response.cache_control.max_age == 31536000
+    assert response.cache_control.immutable
+
+
+def test_bad_sources_are_refused(avatar_app, source):
+    base, hits = source
+    client = avatar_app.test_client()
+
+    user_id = add_user(avatar_app, f"{base}/text")
+    assert client.get(f"/avatars/{user_id}").status_code == 502
+    # A failed source isn't refetched straight away
+    assert client.get(f"/avatars/{user_id}").status_code == 502
+    assert hits == {'/text': 1}
+
+    avatar_app.config['AVATAR_ALLOWED_HOSTS'] = ['avatars.githubusercontent.com']
+    with avatar_app.app_context():
+        db.session.get(User, user_id).avatar_url = f"{base}/red.png"
+        db.session.commit()
+    assert client.get(f"/avatars/{user_id}").status_code == 502
+    assert '/red.png' not in hits
+
+
+def test_oauth_url_change_refreshes_in_background(avatar_app, source):
+    base, hits = source
+    user_id = add_user(avatar_app, f"{base}/red.png")
+
+    with avatar_app.test_request_context():
+        user = db.session.get(User, user_id)
+        sync_avatar(user, f"{base}/blue.png")
+        sync_avatar(user, f"{base}/blue.png")  # unchanged: no new event
+        outbox.drain()
+    wait_for_refreshes(avatar_app)
+    assert hits == {'/blue.png': 1}
+
+    response = avatar_app.test_client().get(f"/avatars/{user_id}")
+    assert response.status_code == 200
+    assert Image.open(io.BytesIO(response.data)).convert('RGB').getpixel((10, 10)) == (0, 0, 255)
+    assert hits == {'/blue.png': 1}
+
+
+def test_slow_source_does_not_hold_the_outbox_batch(avatar_app, source, gate):
+    base, hits = source
+    user_id = add_user(avatar_app, None)
+    gate.clear()
+
+    with avatar_app.test_request_context():
+        sync_avatar(db.session.get(User, user_id), f"{base}/slow/red.png")
+        # Delivered and acknowledged while the fetch is still waiting
+        assert outbox.drain() == 1
+        assert outbox.stats()['pending'] == 0
+    assert hits == {'/slow/red.png': 1}
+
+    gate.set()
+    wait_for_refreshes(avatar_app)
+    response = avatar_app.test_client().get(f"/avatars/{user_id}")
+    assert response.status_code == 200
+    assert hits == {'/slow/red.png': 1}
+
+
+def test_store_evicts_least_recently_served(tmp_path):
+    import os
+
+    store = AvatarStore(str(tmp_path), max_bytes=2500)
+    for i, url in enumerate(['a', 'b', 'c']):
+        store.put(url, f"{i:02d}" * 32, {48: b'x' * 1000})
+        path = store.blob_path(f"{i:02d}" * 32, 48)
+        os.utime(path, (1000 + i, 1000 + i))
+
+    store.evict()
+    assert store.lookup('a', 48) is None
+    assert store.lookup('b', 48) is not None
+    assert store.lookup('c', 48) is not None
@@ -0,0 +1,83 @@
+import pytest
+from sqlalchemy import update
+
+from app import db
+from app.models import Comment, Question
+from conftest import login
+
+
+@pytest.fixture
+def questions(app, client):
+    """Four questions; 2 has one comment, then 1 gets two"""
+    client.post('/signup', json={'username': 'ada', 'email': 'ada@example.com', 'password': 'secret123'})
+    login(client, 1)
+    for i in range(4):
+        client.post('/questions', json={'title': f'Question {i + 1}', 'description': 'Body'})
+    for qid in (2, 1, 1):
+        client.post(f'/questions/{qid}/comments', json={'content': 'Hi'})
+    return client
+
+
+def browse(client, sort, limit):
+    """Every page of a listing as a list of id lists"""
+    pages, after = [], None
+    while True:
+        url = f'/questions/browse?sort={sort}&limit={limit}'
+        page = client.get(url + (f'&after={after}' if after else '')).json
+        pages.append([q['id'] for q in page['questions']])
+        after = page['next']
+        if after is None:
+            return pages
+
+
+def stats(app, qid):
+    with app.app_context():
+        q = db.session.get(Question, qid)
+        return q.comment_count, q.last_activity_at, q.updated_at
+
+
+def test_browse_pages_through_each_sort(questions):
+    assert browse(questions, 'active', 2) == [[1, 2], [4, 3]]
+    assert browse(questions, 'recent', 3) == [[1, 2, 4], [3]]
+    assert browse(questions, 'recent', 1) == [[1], [2], [4], [3]]
+    assert browse(questions, 'unanswered', 1) == [[4], [3]]
+
+    first = questions.get('/questions/browse?sort=active&limit=1').json
+    assert first['questions'][0]['comment_count'] == 2
+    assert first['next'] == '2_1'
+
+
+@pytest.mark.parametrize('query', ['sort=popular', 'sort=active&after=x_1', 'sort=recent&after=yesterday_1',
+                                   'sort=unanswered&after=abc'])
+def test_browse_rejects_bad_parameters(questions, query):
+    assert questions.get(f'/questions/browse?{query}').status_code == 400
+
+
+def test_comments_keep_counts_in_step(app, questions):
+    count, activity, updated = stats(app, 1)
+    assert count == 2
+
+    # A reply must belong to the same question
+    assert questions.post('/questions/2/comments', json={'content': 'Hi', 'parent_id': 2}).status_code == 400
+    assert questions.post('/questions/9/comments', json={'content': 'Hi'}).status_code == 404
+    assert stats(app, 2)[0] == 1
+
+    # Deleting a comment lowers the count but isn't activity, and no counter change is an edit
+    questions.delete('/comments/2')
+    assert stats(app, 1) == (1, activity, updated)
+
+
+def test_reconcile_restores_drifted_counts(app, questions):
+    with app.app_context():
+        expected = [stats(app, qid) for qid in (1, 2, 3, 4)]
+        db.session.execute(update(Question).values(comment_count=7, updated_at=Question.updated_at))
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['reconcile-question-stats', '--batch-size', '3'])
+    assert 'Reconciled 4 questions' in result.output
+    assert [stats(app, qid)[0] for qid in (1, 2, 3, 4)] == [c for c, _, _ in expected]
+    # Activity comes back as the newest comment, or creation for uncommented questions
+    with app.app_context():
+        assert stats(app, 1)[1] == Comment.query.filter_by(question_id=1).order_by(Comment.id.desc()).first().created_at
+        assert stats(app, 3)[1] == db.session.get(Question, 3).created_at
+    assert [stats(app, qid)[2] for qid in (1, 2, 3, 4)] == [u for _, _, u in expected]
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+
+from app import changes, db
+from app.models import ChangeLog
+from app.outbox import drain
+from conftest import login
+
+
+def test_expiry_uses_pruned_watermark_not_oldest_id(app, client):
+    old = datetime.utcnow() - timedelta(days=100)
+    with app.app_context():
+        # Ids 3 and 4 were never committed (rolled back), so 5 follows 2
+        for id, changed_at in [(1, old), (2, old), (5, datetime.utcnow()), (6, datetime.utcnow())]:
+            db.session.add(ChangeLog(id=id, entity_type='tag', entity_id=id, op='delete',
+                                     changed_at=changed_at))
+        db.session.commit()
+        assert changes.prune(90) == 2
+        assert changes.pruned_through() == 2
+        assert changes.prune(90) == 0
+
+    # Read up to 2 before the prune: nothing was missed despite the gap
+    response = client.get('/changes?since=2')
+    assert response.status_code == 200
+    assert [c['position'] for c in response.json['changes']] == [5, 6]
+
+    assert client.get('/changes?since=1').status_code == 410
+    assert client.get('/changes').status_code == 200
+
+
+def sync(client, since=0, limit=2):
+    """Follow the feed to its end; returns (pages, position)"""
+    pages = []
+    while True:
+        page = client.get(f'/changes?since={since}&limit={limit}').json
+        pages.append([(c['type'], c['id'], c['op']) for c in page['changes']])
+        since = page['next']
+        if not page['has_more']:
+            return pages, since
+
+
+def test_feed_pages_in_order_and_ends_with_tombstones(app, client):
+    client.post('/signup', json={'username': 'ada', 'email': 'ada@example.com', 'password': 'secret123'})
+    login(client, 1)
+    client.post('/blogs', json={'title': 'Blog', 'content': 'Body'})
+    client.post('/questions', json={'title': 'Question', 'description': 'Body'})
+    client.post('/questions/1/comments', json={'content': 'Hi'})
+    with app.app_context():
+        drain()
+
+    pages, position = sync(client)
+    assert pages == [
+        [('blog', 1, 'upsert'), ('question', 1, 'upsert')],
+        [('comment', 1, 'upsert')],
+    ]
+    assert sync(client, position) == ([[]], position)
+
+    # Several changes to one entity within a page collapse to its latest position
+    client.put('/blogs/1', json={'title': 'Renamed', 'version': 1})
+    client.put('/blogs/1', json={'title': 'Renamed again', 'version': 2})
+    client.delete('/comments/1')
+    with app.app_context():
+        drain()
+    page = client.get(f'/changes?since={position}').json
+    assert [(c['type'], c['op']) for c in page['changes']] == [('blog', 'upsert'), ('comment', 'delete')]
+    blog, comment = page['changes']
+    assert blog['data']['title'] == 'Renamed again'
+    assert blog['position'] == position + 2
+    assert comment['data'] is None
+    assert page['next'] == comment['position']
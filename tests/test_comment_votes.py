@@ -0,0 +1,25 @@
+from app import db
+from app.models import CommentVote
+from conftest import login
+
+
+def setup_comment(client):
+    client.post('/signup', json={'username': 'ada', 'email': 'ada@example.com', 'password': 'secret123'})
+    login(client, 1)
+    client.post('/questions', json={'title': 'Question', 'description': 'Body'})
+    client.post('/questions/1/comments', json={'content': 'A comment'})
+
+
+def test_vote_on_missing_comment_is_404(client):
+    setup_comment(client)
+    assert client.post('/comments/99/vote', json={'value': 1}).status_code == 404
+
+
+def test_deleting_a_comment_deletes_its_votes(app, client):
+    setup_comment(client)
+    assert client.post('/comments/1/vote', json={'value': 1}).status_code == 200
+    assert client.delete('/comments/1').status_code == 200
+
+    with app.app_context():
+        assert db.session.query(CommentVote).count() == 0
+    assert client.get('/comments/1/votes').json == {'score': 0, 'total_votes': 0}
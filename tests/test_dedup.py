@@ -0,0 +1,58 @@
+import pytest
+
+from app import db, dedup
+from app.dedup import backfill_signatures, find_similar, signature, similarity
+from app.models import Question, QuestionLSHBand, User
+from app.outbox import drain
+from conftest import login
+
+
+@pytest.fixture(autouse=True)
+def empty_bucket_cache():
+    dedup._bucket_cache.clear()
+    yield
+    dedup._bucket_cache.clear()
+
+
+def test_signatures_estimate_title_similarity():
+    base = signature('How do I reverse a list in Python?')
+    assert similarity(base, signature('how do i reverse a list in python')) == 1.0  # normalized
+    assert similarity(base, signature('How can I reverse a list in Python?')) >= 0.5
+    assert similarity(base, signature('Borrow checker errors with Rust closures')) < 0.2
+    assert signature('?!') is None
+
+
+def test_posting_reports_near_duplicates(app, client):
+    client.post('/signup', json={'username': 'ada', 'email': 'ada@example.com', 'password': 'secret123'})
+    login(client, 1)
+    client.post('/questions', json={'title': 'How do I reverse a list in Python?', 'description': 'Body'})
+    client.post('/questions', json={'title': 'Borrow checker errors with Rust closures', 'description': 'Body'})
+    with app.app_context():
+        drain()
+
+    posted = client.post('/questions', json={'title': 'How can I reverse a list in Python', 'description': 'Body'})
+    assert [d['id'] for d in posted.json['possible_duplicates']] == [1]
+    assert client.get('/questions/similar?title=rust closure borrow checker errors').json[0]['id'] == 2
+    assert client.get('/questions/similar?title=Parsing dates in Go').json == []
+    assert client.get('/questions/similar').status_code == 400
+
+    # Deleting a question removes its buckets
+    client.delete('/questions/1')
+    with app.app_context():
+        assert QuestionLSHBand.query.filter_by(question_id=1).count() == 0
+        dedup._bucket_cache.clear()
+        assert find_similar('How do I reverse a list in Python?') == []
+
+
+def test_backfill_signs_only_unsigned_questions(app):
+    with app.app_context():
+        db.session.add(User(username='ada', email='ada@example.com'))
+        db.session.flush()
+        for title in ('Reverse a list in Python', 'Reverse a list in Python 3', '?!'):
+            db.session.add(Question(title=title, description='Body', user_id=1))
+        db.session.commit()
+
+        assert backfill_signatures(batch_size=2) == 3
+        assert backfill_signatures() == 1  # only the title with no signature
+        assert QuestionLSHBand.query.count() == 2 * dedup.BANDS
+        assert [q.id for q, _ in find_similar('Reverse a list in Python', exclude_id=1)] == [2]
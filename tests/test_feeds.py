@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+from app import db
+from app.feeds import build_feeds
+from app.models import Tag
+from conftest import login
+
+
+@pytest.fixture
+def posts(app, client):
+    app.config['SITEMAP_SHARD_SIZE'] = 2
+    client.post('/signup', json={'username': 'ada', 'email': 'ada@example.com', 'password': 'secret123'})
+    login(client, 1)
+    client.post('/blogs', json={'title': 'Lists & <tuples>', 'content': 'Body', 'tags': ['python']})
+    client.post('/blogs', json={'title': 'Ownership', 'content': 'Body', 'tags': ['rust']})
+    client.post('/blogs', json={'title': 'Generators', 'content': 'Body'})
+    client.post('/questions', json={'title': 'Why?', 'description': 'Body', 'tags': ['python']})
+    return client
+
+
+def build(app):
+    with app.app_context():
+        return build_feeds()
+
+
+def files(app):
+    """Every generated file, relative to FEEDS_DIR, with its mtime pushed into the past"""
+    root = app.config['FEEDS_DIR']
+    found = set()
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            os.utime(path, (0, 0))
+            found.add(os.path.relpath(path, root))
+    return found
+
+
+def rewritten(app):
+    root = app.config['FEEDS_DIR']
+    return {
+        os.path.relpath(os.path.join(directory, name), root)
+        for directory, _, names in os.walk(root) for name in names
+        if os.stat(os.path.join(directory, name)).st_mtime > 0
+    }
+
+
+def test_unchanged_fingerprints_are_skipped(app, posts):
+    # 2 global feeds, 4 tag feeds (blog, question, python, rust) x rss/atom,
+    # blog shards 0 and 1, question shard 0, tags shard, index
+    assert build(app) == 2 * 2 + 4 * 2 + 3 + 1 + 1
+    everything = files(app)
+    assert {'sitemap.xml', 'sitemaps/blog-0.xml', 'sitemaps/blog-1.xml', 'tags/python.rss'} <= everything
+    assert build(app) == 0
+    assert rewritten(app) == {'manifest.json'}
+
+    # Editing blog 2 touches its feeds and its shard only
+    assert posts.put('/blogs/2', json={'title': 'Borrowing', 'version': 1}).status_code == 200
+    files(app)
+    build(app)
+    assert rewritten(app) == {
+        'blogs.rss', 'blogs.atom', 'tags/blog.rss', 'tags/blog.atom', 'tags/rust.rss', 'tags/rust.atom',
+        'sitemaps/blog-1.xml', 'sitemap.xml', 'manifest.json',
+    }
+
+
+def test_feeds_follow_deletes(app, posts):
+    build(app)
+    posts.delete('/blogs/2')
+    with app.app_context():
+        db.session.delete(Tag.query.filter_by(name='rust').one())
+        db.session.commit()
+    build(app)
+    root = app.config['FEEDS_DIR']
+    assert not os.path.exists(os.path.join(root, 'tags/rust.rss'))
+    with open(os.path.join(root, 'blogs.rss')) as f:
+        blogs = f.read()
+    assert 'Ownership' not in blogs
+    assert '<title>Lists &amp; &lt;tuples&gt;</title>' in blogs
+
+
+def test_feed_routes_serve_files_with_validators(app, posts):
+    assert posts.get('/feeds/blogs.rss').status_code == 404
+    build(app)
+
+    response = posts.get('/feeds/tags/Python.atom')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/atom+xml'
+    assert b'Why?' in response.data
+    again = posts.get('/feeds/tags/Python.atom', headers={'If-None-Match': response.headers['ETag']})
+    assert again.status_code == 304
+
+    index = posts.get('/sitemap.xml').data.decode()
+    assert 'http://localhost:5000/sitemaps/blog-1.xml' in index
+    assert b'/blogs/3' in posts.get('/sitemaps/blog-1.xml').data
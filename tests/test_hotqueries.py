@@ -0,0 +1,58 @@
+import pytest
+from sqlalchemy import event
+
+from app import db, hotqueries
+from app.models import Comment, CommentVote, Question, QuestionVote, Tag, User
+
+
+@pytest.fixture
+def seeded(app):
+    with app.app_context():
+        for name in ('ada', 'bob'):
+            db.session.add(User(username=name, email=f'{name}@example.com'))
+        db.session.flush()
+        db.session.get(User, 1).email_verified = True
+        db.session.add(Question(title='Question', description='Body', user_id=1))
+        db.session.flush()
+        db.session.add(Comment(content='Hi', user_id=2, question_id=1))
+        db.session.add_all([Tag(name='python'), Tag(name='py_thon')])
+        db.session.flush()
+        db.session.add(QuestionVote(value=1, user_id=2, question_id=1))
+        db.session.add(CommentVote(value=-1, user_id=1, comment_id=1))
+        db.session.commit()
+    return app
+
+
+def test_user_lookups_match_the_orm(seeded):
+    with seeded.app_context():
+        for user_id in (1, 2, 99):
+            db.session.expunge_all()  # go to the database, not the identity map
+            assert hotqueries.user_by_id(user_id) is db.session.get(User, user_id)
+        for email in ('ada@example.com', 'bob@example.com', 'ADA@example.com', 'nobody@example.com'):
+            assert hotqueries.user_by_email(email) is User.query.filter_by(email=email).first()
+            user = User.query.filter_by(email=email).first()
+            expected = None if user is None else (user.id, user.email_verified)
+            row = hotqueries.email_status(email)
+            assert (None if row is None else tuple(row)) == expected
+
+
+def test_user_by_id_uses_the_identity_map(seeded):
+    with seeded.app_context():
+        user = db.session.get(User, 1)
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+        assert hotqueries.user_by_id(1) is user
+        assert statements == []
+
+
+def test_tag_and_vote_lookups_match_the_orm(seeded):
+    with seeded.app_context():
+        for name in ('python', 'py_thon', 'py%', 'rust'):
+            assert hotqueries.tag_by_name(name) is Tag.query.filter_by(name=name).first()
+        for user_id, target_id in ((1, 1), (2, 1), (2, 2)):
+            assert hotqueries.question_vote(user_id, target_id) is QuestionVote.query.filter_by(
+                user_id=user_id, question_id=target_id).first()
+            assert hotqueries.comment_vote(user_id, target_id) is CommentVote.query.filter_by(
+                user_id=user_id, comment_id=target_id).first()
+        assert hotqueries.question_vote(2, 1).value == 1
+        assert hotqueries.comment_vote(1, 1).value == -1
@@ -0,0 +1,122 @@
+from app import db
+from app.models import Comment, Notification, Question, User
+from app.notifications import mark_read, notify_comment, send_digests
+from conftest import login
+
+
+def add_thread(app, commenters=3):
+    """A question by user 1, commented on by users 2..n+1; returns comment ids"""
+    with app.app_context():
+        for i in range(commenters + 1):
+            db.session.add(User(username=f'user{i + 1}', email=f'user{i + 1}@example.com'))
+        db.session.flush()
+        db.session.add(Question(title='Question', description='Body', user_id=1))
+        db.session.flush()
+        ids = []
+        for i in range(commenters):
+            comment = Comment(content='Hi', user_id=i + 2, question_id=1)
+            db.session.add(comment)
+            db.session.flush()
+            ids.append(comment.id)
+        db.session.commit()
+        return ids
+
+
+def unread(app, user_id):
+    with app.app_context():
+        return db.session.get(User, user_id).unread_notifications
+
+
+def test_notify_comment_notifies_question_and_parent_authors(app):
+    add_thread(app, commenters=2)
+    with app.app_context():
+        reply = Comment(content='Reply', user_id=3, question_id=1, parent_id=1)
+        db.session.add(reply)
+        db.session.flush()
+        assert notify_comment(1) == 1
+        assert notify_comment(reply.id) == 2
+        assert notify_comment(reply.id) == 0  # replayed event
+        db.session.commit()
+        kinds = {(n.user_id, n.kind) for n in Notification.query.filter_by(comment_id=reply.id)}
+    assert kinds == {(1, 'comment'), (2, 'reply')}
+    assert unread(app, 1) == 2
+    assert unread(app, 2) == 1
+    assert unread(app, 3) == 0  # own comment
+
+
+def test_mark_read_keeps_unread_counter_in_step(app, client):
+    for comment_id in add_thread(app):
+        with app.app_context():
+            notify_comment(comment_id)
+            db.session.commit()
+    login(client, 1)
+    assert client.get('/notifications/unread-count').json == {'unread': 3}
+
+    with app.app_context():
+        first = Notification.query.order_by(Notification.id).first().id
+        assert mark_read(1, [first]) == 1
+        assert mark_read(1, [first]) == 0
+    assert client.get('/notifications/unread-count').json == {'unread': 2}
+
+    client.post('/notifications/read', json={})
+    assert client.get('/notifications/unread-count').json == {'unread': 0}
+    assert unread(app, 1) == 0
+
+
+def add_recipients(app, count):
+    """``count`` users, each with one unread notification"""
+    comment_ids = add_thread(app, commenters=count)
+    with app.app_context():
+        for i, comment_id in enumerate(comment_ids):
+            # Reply to each commenter so every user has something pending
+            reply = Comment(content='Reply', user_id=1, question_id=1, parent_id=comment_id)
+            db.session.add(reply)
+            db.session.flush()
+            notify_comment(reply.id)
+        db.session.commit()
+
+
+def pending(app):
+    with app.app_context():
+        return Notification.query.filter(Notification.emailed_at.is_(None)).count()
+
+
+def test_digests_share_one_connection(app, smtp):
+    add_recipients(app, 3)
+    with app.app_context():
+        assert send_digests(batch_size=2) == 3
+        assert send_digests() == 0
+    assert smtp.connections == 1
+    assert sorted(rcpt for rcpt, _ in smtp.messages) == [
+        ['user2@example.com'], ['user3@example.com'], ['user4@example.com']
+    ]
+    assert b'replied to your comment on' in smtp.messages[0][1]
+    assert pending(app) == 0
+
+
+def test_digests_reconnect_after_server_hangup(app, smtp):
+    add_recipients(app, 3)
+    smtp.hangup_after = 1
+    with app.app_context():
+        assert send_digests() == 3
+    assert smtp.connections == 3
+    assert pending(app) == 0
+
+
+def test_digests_stop_when_server_is_gone(app, smtp):
+    add_recipients(app, 3)
+    smtp.hangup_after = 1
+    smtp.max_connections = 1
+    with app.app_context():
+        assert send_digests() == 1
+    assert smtp.connections == 2  # one reconnect attempt, then the run stops
+    assert pending(app) == 2
+
+
+def test_refused_recipient_does_not_stop_the_run(app, smtp):
+    add_recipients(app, 3)
+    smtp.refuse = {'user3@example.com'}
+    with app.app_context():
+        assert send_digests() == 2
+    assert smtp.connections == 1
+    assert pending(app) == 1
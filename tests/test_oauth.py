@@ -0,0 +1,146 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("authlib")
+
+import app.auth_routes as auth_routes
+from app import db
+from app.auth_routes import create_oauth_user, unique_username
+from app.models import User
+from app.providers import get_oauth_client
+
+
+def add_users(app, *names):
+    with app.app_context():
+        for name in names:
+            db.session.add(User(username=name, email=f'{name}@example.com'))
+        db.session.commit()
+
+
+# -------------------- Usernames --------------------
+
+def test_unique_username_ignores_longer_names_sharing_the_prefix(app):
+    add_users(app, 'john', 'johnny', 'john2', 'john_smith')
+    with app.app_context():
+        assert unique_username('john') == 'john1'
+        assert unique_username('johnny') == 'johnny1'
+        assert unique_username('joh') == 'joh'
+
+
+def test_unique_username_escapes_like_wildcards(app):
+    add_users(app, 'a_n', 'axn1', 'a%', 'ab1')
+    with app.app_context():
+        # '_' and '%' match literally, so axn1 and ab1 don't claim suffix 1
+        assert unique_username('a_n') == 'a_n1'
+        assert unique_username('a%') == 'a%1'
+
+
+def test_unique_username_ignores_non_ascii_and_zero_padded_suffixes(app):
+    add_users(app, 'alice', 'alice²', 'alice٣', 'alice007', 'alice01')
+    with app.app_context():
+        assert unique_username('alice') == 'alice1'
+    add_users(app, 'alice1')
+    with app.app_context():
+        assert unique_username('alice') == 'alice2'
+
+
+def test_create_oauth_user_retries_after_losing_a_race(app, monkeypatch):
+    add_users(app, 'john')
+    real = auth_routes.unique_username
+    calls = []
+
+    def stale(base):
+        # The first pick is what a parallel signup just took
+        calls.append(base)
+        return 'john' if len(calls) == 1 else real(base)
+
+    monkeypatch.setattr(auth_routes, 'unique_username', stale)
+    with app.app_context():
+        user = create_oauth_user('john', email='new@example.com', oauth_provider='github')
+        assert user.username == 'john1'
+        assert len(calls) == 2
+        assert User.query.count() == 2
+
+
+def test_create_oauth_user_returns_account_made_by_parallel_callback(app, monkeypatch):
+    add_users(app, 'john')
+    monkeypatch.setattr(auth_routes, 'unique_username', lambda base: 'john')
+    with app.app_context():
+        user = create_oauth_user('john', email='john@example.com', oauth_provider='github')
+        assert user.username == 'john'
+        assert User.query.count() == 1
+
+
+def test_create_oauth_user_gives_up_eventually(app, monkeypatch):
+    add_users(app, 'john')
+    monkeypatch.setattr(auth_routes, 'unique_username', lambda base: 'john')
+    with app.app_context(), pytest.raises(RuntimeError):
+        create_oauth_user('john', email='other@example.com', oauth_provider='github')
+
+
+# -------------------- Pooled Provider Sessions --------------------
+
+@pytest.fixture
+def provider():
+    """Local stand-in for the provider API; counts TCP connections"""
+    stats = {'connections': 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive, so pooling is visible
+
+        def setup(self):
+            stats['connections'] += 1
+            super().setup()
+
+        def do_GET(self):
+            if self.path == '/slow':
+                time.sleep(1)
+            body = json.dumps({'login': 'octocat', 'id': 1}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/", stats
+    server.shutdown()
+    server.server_close()
+
+
+def github_client(app, base_url):
+    client = get_oauth_client('github')
+    client.api_base_url = base_url
+    return client
+
+
+def test_provider_calls_share_one_connection(app, provider):
+    base_url, stats = provider
+    token = {'access_token': 'token', 'token_type': 'bearer'}
+    with app.test_request_context():
+        github = github_client(app, base_url)
+        assert github.get('user', token=token).json()['login'] == 'octocat'
+        assert github.get('user', token=token).json()['login'] == 'octocat'
+    assert stats['connections'] == 1
+
+
+def test_provider_calls_time_out(app, provider):
+    import requests
+
+    base_url, _ = provider
+    app.config['OAUTH_HTTP_TIMEOUT'] = 0.2
+    with app.test_request_context():
+        github = github_client(app, base_url)
+        started = time.monotonic()
+        with pytest.raises(requests.Timeout):
+            github.get('slow', token={'access_token': 'token', 'token_type': 'bearer'})
+    assert time.monotonic() - started < 0.9
@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app import db, outbox
+from app.models import OutboxEvent, Tag
+from app.outbox import MAX_ATTEMPTS, dispatch, drain, record, requeue_dead, stats
+
+
+@pytest.fixture
+def delivered(monkeypatch):
+    """Subscribe a recorder to 'test.ping' and a consumer that fails on odd ids to 'test.flaky'"""
+    seen = []
+
+    def flaky(evt):
+        db.session.add(Tag(name=f'tag{evt.aggregate_id}'))  # rolled back with the failure
+        db.session.flush()
+        if evt.aggregate_id % 2:
+            raise ValueError(f'odd {evt.aggregate_id}')
+        seen.append(evt.aggregate_id)
+
+    monkeypatch.setitem(outbox._consumers, 'test.ping', [lambda evt: seen.append(evt.aggregate_id)])
+    monkeypatch.setitem(outbox._consumers, 'test.flaky', [flaky])
+    return seen
+
+
+def make_due():
+    db.session.execute(update(OutboxEvent).values(available_at=datetime.utcnow()))
+    db.session.commit()
+
+
+def test_events_exist_only_when_the_write_commits(app, delivered):
+    with app.app_context():
+        record('test.ping', 1)
+        db.session.rollback()
+        record('test.ping', 2, note='kept')
+        db.session.commit()
+        assert [(e.aggregate_type, e.payload) for e in OutboxEvent.query] == [('test', {'note': 'kept'})]
+        assert dispatch() == 1
+        assert delivered == [2]
+        assert OutboxEvent.query.count() == 0
+
+
+def test_drain_claims_in_id_order_across_batches(app, delivered):
+    with app.app_context():
+        for i in range(5):
+            record('test.ping', i)
+        db.session.commit()
+        assert drain(batch_size=2) == 5
+        assert delivered == [0, 1, 2, 3, 4]
+        assert stats()['pending'] == 0
+
+
+def test_failed_delivery_backs_off_without_blocking_the_batch(app, delivered):
+    with app.app_context():
+        before = stats()
+        for i in (1, 2):
+            record('test.flaky', i)
+        db.session.commit()
+
+        started = datetime.utcnow()
+        assert dispatch() == 2
+        assert delivered == [2]
+        failed = OutboxEvent.query.one()
+        assert (failed.aggregate_id, failed.attempts, failed.last_error) == (1, 1, 'odd 1')
+        assert failed.available_at >= started + timedelta(seconds=2)
+        # The failed consumer's writes are undone, the successful one's kept
+        assert [t.name for t in Tag.query] == ['tag2']
+
+        assert dispatch() == 0  # not due yet
+        make_due()
+        dispatch()
+        failed = OutboxEvent.query.one()
+        assert failed.attempts == 2
+        assert failed.available_at >= datetime.utcnow() + timedelta(seconds=3)
+
+        after = stats()
+        assert after['delivered'] - before['delivered'] == 1
+        assert after['failed'] - before['failed'] == 2
+        assert (after['pending'], after['retrying'], after['dead']) == (1, 1, 0)
+
+
+def test_exhausted_events_are_dead_until_requeued(app, delivered):
+    with app.app_context():
+        record('test.flaky', 1)
+        db.session.commit()
+        for _ in range(MAX_ATTEMPTS):
+            make_due()
+            assert dispatch() == 1
+        make_due()
+        assert dispatch() == 0
+        assert (stats()['pending'], stats()['dead']) == (0, 1)
+
+        assert requeue_dead() == 1
+        event = OutboxEvent.query.one()
+        assert event.attempts == 0
+        assert stats()['dead'] == 0
@@ -0,0 +1,62 @@
+import os
+import time
+
+import pytest
+
+from app.profiling import TOKEN_HEADER, collapsed, make_token, speedscope, token_valid
+
+
+@pytest.fixture
+def token(app):
+    app.config['PROFILE_SECRET'] = 'profile-secret'
+    return make_token('profile-secret', 60)
+
+
+def test_tokens_are_signed_and_expire(app, token):
+    with app.app_context():
+        assert token_valid(token)
+        expires, signature = token.split('.')
+        assert not token_valid(f"{expires}.{'0' * len(signature)}")
+        assert not token_valid(make_token('other-secret', 60))
+        assert not token_valid(f"{int(time.time()) - 1}.{signature}")
+        assert not token_valid('garbage')
+        app.config['PROFILE_SECRET'] = None
+        assert not token_valid(token)
+
+
+def test_token_profiles_a_request(app, client, token):
+    assert 'X-Profile-Id' not in client.get('/questions/2').headers
+
+    response = client.get('/questions/1', headers={TOKEN_HEADER: token})
+    profile_id = response.headers['X-Profile-Id']
+    assert client.get('/admin/profiles').status_code == 403
+    [summary] = client.get('/admin/profiles', headers={TOKEN_HEADER: token}).json
+    assert (summary['id'], summary['path'], summary['status']) == (profile_id, '/questions/1', 404)
+    assert summary['sql_count'] >= 1
+
+    profile = client.get(f'/admin/profiles/{profile_id}', headers={TOKEN_HEADER: token}).json
+    assert 'question' in profile['sql'][0]['statement']
+    assert client.get(f'/admin/profiles/{profile_id}').status_code == 403
+    assert client.get('/admin/profiles/..', headers={TOKEN_HEADER: token}).status_code == 404
+    assert client.get('/admin/profiles/0-missing', headers={TOKEN_HEADER: token}).status_code == 404
+
+
+def test_only_the_newest_profiles_are_kept(app, client, token):
+    app.config['PROFILE_MAX_FILES'] = 2
+    ids = [client.get('/tags', headers={TOKEN_HEADER: token}).headers['X-Profile-Id'] for _ in range(3)]
+    assert sorted(os.listdir(app.config['PROFILE_DIR'])) == [f'{i}.json' for i in sorted(ids)[1:]]
+
+
+def test_export_formats():
+    profile = {
+        'id': '1-abc', 'method': 'GET', 'path': '/tags', 'duration_ms': 30.0, 'samples': 3,
+        'stacks': {'main;view': 2, 'main;view;query': 1},
+    }
+    assert collapsed(profile) == 'main;view 2\nmain;view;query 1\n'
+
+    doc = speedscope(profile)
+    assert [f['name'] for f in doc['shared']['frames']] == ['main', 'view', 'query']
+    [sampled] = doc['profiles']
+    assert sampled['samples'] == [[0, 1], [0, 1, 2]]
+    assert sampled['weights'] == [20.0, 10.0]
+    assert sampled['endValue'] == 30.0
@@ -0,0 +1,28 @@
+from app import create_app, db
+from app.models import Question, User
+from app.readcache import write_snapshot
+from conftest import login
+
+
+def test_write_then_read_during_warmup_skips_snapshot(app):
+    with app.app_context():
+        db.session.add(User(username='ada', email='ada@example.com'))
+        db.session.flush()
+        db.session.add(Question(title='Old title', description='Old', user_id=1))
+        db.session.commit()
+        write_snapshot(app.config['SNAPSHOT_PATH'])
+
+    # A fresh worker that maps the snapshot and is still warming up
+    worker = create_app()
+    worker.config['TESTING'] = True
+    client = worker.test_client()
+    assert client.get('/questions/1').json['title'] == 'Old title'
+    assert worker.extensions['studenthub.read_cache'].stats()['snapshot_hits'] == 1
+
+    login(client, 1)
+    response = client.put('/questions/1', json={'title': 'New title', 'version': 1})
+    assert response.json['version'] == 2
+
+    question = client.get('/questions/1').json
+    assert question['title'] == 'New title'
+    assert question['version'] == 2
@@ -0,0 +1,68 @@
+import pytest
+
+pytest.importorskip("scipy")
+
+from scipy.sparse import csr_matrix
+
+from app import db
+from app.outbox import drain
+from app.related import rebuild_related, top_k_neighbours
+from conftest import login
+
+
+def test_top_k_neighbours_ranks_by_cosine_and_skips_self():
+    # Items x tags: 0 and 1 share both tags, 2 shares one with each, 3 shares none
+    matrix = csr_matrix([
+        [1, 1, 0, 0],
+        [1, 1, 0, 0],
+        [1, 0, 1, 0],
+        [0, 0, 0, 1],
+    ])
+    rows, cols, scores = (a.tolist() for a in
+                          next(top_k_neighbours(matrix, k=1, batch_size=2)))
+    assert list(zip(rows, cols)) == [(0, 1), (1, 0)]
+    assert scores == pytest.approx([1.0, 1.0])
+
+    batches = list(top_k_neighbours(matrix, k=5, batch_size=2))
+    pairs = {(r, c): s for rows, cols, scores in batches
+             for r, c, s in zip(rows.tolist(), cols.tolist(), scores.tolist())}
+    assert pairs[(0, 2)] == pytest.approx(0.5)  # 1 shared / sqrt(2 * 2)
+    assert not any(r == c or 3 in (r, c) for r, c in pairs)
+
+
+@pytest.fixture
+def tagged(app, client):
+    client.post('/signup', json={'username': 'ada', 'email': 'ada@example.com', 'password': 'secret123'})
+    login(client, 1)
+    for tags in (['python', 'flask'], ['python', 'flask'], ['python'], ['rust']):
+        client.post('/questions', json={'title': 'Question', 'description': 'Body', 'tags': tags})
+    client.post('/blogs', json={'title': 'Blog', 'content': 'Body', 'tags': ['flask']})
+    with app.app_context():
+        drain()
+    return client
+
+
+def related(client, path):
+    # Ties have no defined order
+    return sorted((item['type'], item['id'], item['score']) for item in client.get(path).json)
+
+
+def test_incremental_updates_match_a_full_rebuild(app, tagged):
+    incremental = related(tagged, '/questions/1/related')
+    assert ('question', 2, 1.0) in incremental
+    assert ('question', 4) not in [item[:2] for item in incremental]
+
+    with app.app_context():
+        rebuild_related()
+    assert related(tagged, '/questions/1/related') == incremental
+    assert related(tagged, '/blogs/1/related') == [
+        ('question', 1, 0.7071), ('question', 2, 0.7071)
+    ]
+    assert related(tagged, '/questions/4/related') == []
+
+
+def test_deleted_item_drops_out_of_neighbour_lists(app, tagged):
+    assert tagged.delete('/questions/2').status_code == 200
+    with app.app_context():
+        drain()
+    assert ('question', 2) not in [item[:2] for item in related(tagged, '/questions/1/related')]
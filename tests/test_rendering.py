@@ -0,0 +1,70 @@
+from datetime import datetime
+
+from app import db, rendering
+from app.models import Blog, User
+from app.rendering import RENDERER_VERSION, apply_render
+from conftest import login
+
+
+def test_blog_is_rendered_on_create_and_update(app, client):
+    client.post('/signup', json={'username': 'ada', 'email': 'ada@example.com', 'password': 'secret123'})
+    login(client, 1)
+    client.post('/blogs', json={'title': 'Blog', 'content': '# Hello\n\n<script>x</script>**bold** ' + 'word ' * 450})
+
+    with app.app_context():
+        blog = db.session.get(Blog, 1)
+        assert '<h1>Hello</h1>' in blog.content_html
+        assert '<strong>bold</strong>' in blog.content_html
+        assert '<script>' not in blog.content_html
+        assert blog.excerpt.startswith('Hello') and blog.excerpt.endswith('…')
+        assert len(blog.excerpt) <= rendering.EXCERPT_LENGTH + 1
+        assert blog.reading_time == 3
+        assert blog.render_version == RENDERER_VERSION
+
+    client.put('/blogs/1', json={'content': 'Short *edit*', 'version': 1})
+    with app.app_context():
+        blog = db.session.get(Blog, 1)
+        assert blog.content_html == '<p>Short <em>edit</em></p>'
+        assert blog.excerpt == 'Short edit'
+        assert blog.reading_time == 1
+
+
+def test_unchanged_content_is_not_rendered_again(app, monkeypatch):
+    calls = []
+    real = rendering.render_content
+    monkeypatch.setattr(rendering, 'render_content', lambda text: calls.append(text) or real(text))
+    monkeypatch.setattr(rendering, '_cache', rendering.OrderedDict())
+
+    first = Blog(title='A', content='Same *text*')
+    apply_render(first)
+    apply_render(first)  # stored hash and version match: skipped outright
+    second = Blog(title='B', content='Same *text*')
+    apply_render(second)  # new row, same content: served from the render cache
+
+    assert calls == ['Same *text*']
+    assert second.content_html == first.content_html == '<p>Same <em>text</em></p>'
+
+
+def test_render_blogs_only_touches_stale_rows(app):
+    stamp = datetime(2024, 1, 1)
+    with app.app_context():
+        db.session.add(User(username='ada', email='ada@example.com'))
+        db.session.flush()
+        for i, version in enumerate([RENDERER_VERSION - 1, RENDERER_VERSION, None]):
+            blog = Blog(title=f'Blog {i}', content=f'Body *{i}*', user_id=1)
+            apply_render(blog)
+            blog.render_version = version
+            blog.content_html = 'old'
+            blog.updated_at = stamp
+            db.session.add(blog)
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['render-blogs', '--workers', '1'])
+    assert 'Done: 2 blogs' in result.output
+
+    with app.app_context():
+        blogs = Blog.query.order_by(Blog.id).all()
+        assert [b.content_html for b in blogs] == ['<p>Body <em>0</em></p>', 'old', '<p>Body <em>2</em></p>']
+        assert all(b.render_version == RENDERER_VERSION for b in blogs)
+        # A re-render is not an edit
+        assert all(b.updated_at == stamp for b in blogs)
@@ -0,0 +1,49 @@
+import json
+import os
+import subprocess
+import sys
+
+from conftest import app_env
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from startup import BOOT, LAZY_MODULES  # noqa: E402
+
+
+def test_create_app_is_fast_and_leaves_heavy_modules_unloaded(tmp_path):
+    check = BOOT + f"; import sys, json; print(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))"
+    env = {**os.environ, **app_env(tmp_path)}
+    out = subprocess.run(
+        [sys.executable, '-c', check], cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stdout.splitlines()
+
+    create_app_ms = float(out[0].split('=')[1])
+    assert json.loads(out[1]) == []
+    assert create_app_ms < float(os.getenv('STARTUP_BUDGET_MS', 1500))
+
+
+def test_first_otp_email_is_sent(app, smtp):
+    from app.auth_routes import send_otp_email
+
+    # Flask-Mail is registered lazily, on this first send
+    assert 'studenthub.mail' not in app.extensions
+    with app.app_context():
+        assert send_otp_email('ada@example.com', '123456')
+    assert smtp.messages[0][0] == ['ada@example.com']
+    assert b'123456' in smtp.messages[0][1]
+
+
+def test_first_request_can_be_a_cached_read(tmp_path):
+    # In a fresh process nothing has configured the mappers yet, so
+    # backrefs like Question.author must exist straight after create_app
+    check = (
+        "from app import create_app, db; app = create_app(); "
+        "app.app_context().push(); db.create_all(); "
+        "print(app.test_client().get('/questions/1').status_code)"
+    )
+    env = {**os.environ, **app_env(tmp_path)}
+    out = subprocess.run(
+        [sys.executable, '-c', check], cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    assert out.stdout.strip() == '404', out.stderr
@@ -0,0 +1,70 @@
+import pytest
+
+from app import suggest
+from app.suggest import TitleIndex, trigrams
+from conftest import login
+
+TITLES = [
+    ('question', 1, 'Python decorators explained'),
+    ('question', 2, 'Why is my python loop slow?'),
+    ('blog', 1, 'Rust ownership in practice'),
+    ('blog', 2, 'Pythagoras for programmers'),
+]
+
+
+def test_trigrams_leave_the_last_word_open_while_typing():
+    assert trigrams('py') == {'  p', ' py', 'py '}
+    assert trigrams('py', partial=True) == {'  p', ' py'}
+    assert trigrams('Py_thon!') == trigrams('py thon')
+
+
+def test_index_tolerates_typos_and_ranks_prefixes_first():
+    index = TitleIndex(TITLES)
+    ids = lambda query, k=5: [(r['type'], r['id']) for r in index.search(query, k)]
+
+    assert ids('python d')[0] == ('question', 1)  # prefix of the title
+    assert ('question', 2) in ids('pyhton')       # swapped letters
+    assert ('blog', 1) not in ids('python')
+    assert set(ids('pyth')[:2]) == {('question', 1), ('blog', 2)}  # both start with it
+    assert len(ids('pyth', k=1)) == 1
+    assert ids('zzzz') == []
+
+
+@pytest.fixture
+def titles(app, client):
+    app.config['SUGGEST_INDEX_TTL'] = 0
+    client.post('/signup', json={'username': 'ada', 'email': 'ada@example.com', 'password': 'secret123'})
+    login(client, 1)
+    for kind, _, title in TITLES:
+        if kind == 'question':
+            client.post('/questions', json={'title': title, 'description': 'Body'})
+        else:
+            client.post('/blogs', json={'title': title, 'content': 'Body'})
+    return client
+
+
+def test_suggest_endpoint_caches_per_prefix(titles, monkeypatch):
+    loads = []
+    real = suggest._load
+    monkeypatch.setattr(suggest, '_load', lambda key: loads.append(key) or real(key))
+
+    first = titles.get('/search/suggest?q=Python  D&limit=2').json
+    assert [r['title'] for r in first][0] == 'Python decorators explained'
+    assert len(first) == 2
+    assert titles.get('/search/suggest?q=python d&limit=2').json == first
+    assert loads == [('python d', 2)]
+
+    assert titles.get('/search/suggest?q=p').json == []
+    assert titles.get('/search/suggest?q=%20%21').json == []
+    assert len(loads) == 1
+
+
+def test_suggest_endpoint_answers_empty_past_the_budget(titles, monkeypatch):
+    def slow(key):
+        raise suggest.SuggestTimeout('canceling statement due to statement timeout')
+
+    monkeypatch.setattr(suggest, '_load', slow)
+    assert titles.get('/search/suggest?q=rust').json == []
+    monkeypatch.undo()
+    # The timeout wasn't cached
+    assert titles.get('/search/suggest?q=rust').json[0]['title'] == 'Rust ownership in practice'
@@ -0,0 +1,60 @@
+import pytest
+
+from conftest import login
+
+
+def test_questions_by_tag_are_keyset_paginated(client):
+    client.post('/signup', json={'username': 'ada', 'email': 'ada@example.com', 'password': 'secret123'})
+    login(client, 1)
+    for i in range(5):
+        client.post('/questions', json={'title': f'Question {i}', 'description': 'Body'})
+        client.post(f'/questions/{i + 1}/tags', json={'tag': 'python'})
+
+    first = client.get('/tags/python/questions?limit=3').json
+    assert [q['id'] for q in first['items']] == [5, 4, 3]
+    rest = client.get(f"/tags/python/questions?limit=3&after={first['next']}").json
+    assert [q['id'] for q in rest['items']] == [2, 1]
+    assert rest['next'] is None
+
+    assert client.get('/tags/missing/questions').status_code == 404
+
+
+@pytest.fixture
+def tagged(client):
+    client.post('/signup', json={'username': 'ada', 'email': 'ada@example.com', 'password': 'secret123'})
+    login(client, 1)
+    for tags in (['python', 'flask'], ['python'], ['python', 'flask', 'sql'], ['sql'], ['python', 'sql']):
+        client.post('/questions', json={'title': 'Question', 'description': 'Body', 'tags': tags})
+        client.post('/blogs', json={'title': 'Blog', 'content': 'Body', 'tags': tags})
+    return client
+
+
+def pages(client, url, key, limit=2):
+    """Ids of every page of a keyset-paginated listing"""
+    result, after = [], None
+    while True:
+        page = client.get(f'{url}&limit={limit}' + (f'&after={after}' if after else '')).json
+        result.append([item['id'] for item in page[key]])
+        after = page['next']
+        if after is None:
+            return result
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('all=python,flask', [[3, 1]]),
+    ('all=python&none=sql', [[2, 1]]),
+    ('any=flask,sql', [[5, 4], [3, 1]]),
+    ('any=sql&all=python', [[5, 3]]),
+    ('all=%23Python, FLASK', [[3, 1]]),       # normalized like create_question
+    ('all=python,rust', [[]]),                # unknown 'all' tag matches nothing
+    ('any=rust', [[]]),
+    ('any=rust,flask&none=rust', [[3, 1]]),  # unknown 'any'/'none' tags are ignored
+])
+def test_tag_filters_page_through_matches(tagged, query, expected):
+    assert pages(tagged, f'/tags/questions?{query}', 'questions') == expected
+    assert pages(tagged, f'/tags/blogs?{query}', 'blogs') == expected
+
+
+def test_tag_filters_need_all_or_any(tagged):
+    assert tagged.get('/tags/questions?none=sql').status_code == 400
+    assert tagged.get('/tags/blogs').status_code == 400
@@ -0,0 +1,43 @@
+import os
+
+from app import db, tfidf
+from app.models import Question, User
+
+
+def test_reader_parses_only_appended_delta_lines(app, monkeypatch):
+    with app.app_context():
+        db.session.add(User(username='ada', email='ada@example.com'))
+        db.session.flush()
+        db.session.add(Question(title='Sorting lists in python', description='sorted vs sort', user_id=1))
+        db.session.commit()
+        tfidf.build_index()
+
+        vectorized = []
+        real = tfidf.IndexReader.vectorize
+        monkeypatch.setattr(tfidf.IndexReader, 'vectorize',
+                            lambda self, text: vectorized.append(text) or real(self, text))
+
+        tfidf.append_document('question', 2, 'python list sorting by key')
+        assert tfidf.get_reader() is not None
+        assert vectorized == ['python list sorting by key']
+
+        # Unchanged file: nothing is parsed again
+        tfidf.get_reader()
+        tfidf.append_document('blog', 1, 'reversing a python list')
+        tfidf.remove_document('question', 2)
+        reader = tfidf.get_reader()
+        assert vectorized == ['python list sorting by key', 'reversing a python list']
+        assert reader.delta[tfidf.doc_key('question', 2)] is None
+
+        # A line still being written is picked up once it is complete
+        path = os.path.join(app.config['TFIDF_INDEX_DIR'], 'delta.jsonl')
+        with open(path, 'a') as f:
+            f.write('{"type": "blog", "id": 2, "text": "half')
+        tfidf.get_reader()
+        with open(path, 'a') as f:
+            f.write(' written", "ts": 0}\n')
+        assert tfidf.doc_key('blog', 2) in tfidf.get_reader().delta
+        assert vectorized[-1] == 'half written'
+
+        results = tfidf.similar('question', 1, 'python list sorting')
+        assert ('blog', 1) in [(kind, item_id) for kind, item_id, _ in results]
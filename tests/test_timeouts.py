@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeout
+from sqlalchemy.orm import Session
+
+
+class QueryCanceled(Exception):
+    """Stands in for psycopg's QueryCanceled (SQLSTATE 57014)"""
+    sqlstate = pgcode = '57014'
+
+
+def canceled(*args, **kwargs):
+    raise OperationalError('SELECT ...', {}, QueryCanceled('canceling statement due to statement timeout'))
+
+
+def pool_exhausted(*args, **kwargs):
+    raise PoolTimeout('QueuePool limit of size 5 overflow 10 reached')
+
+
+def test_statement_timeout_is_504_and_counted(client, monkeypatch):
+    monkeypatch.setattr(Session, 'execute', canceled)
+    response = client.get('/search?q=a')
+    monkeypatch.undo()
+
+    assert response.status_code == 504
+    assert response.json == {"message": "The database took too long to answer"}
+    stats = client.get('/timeouts/stats').json
+    assert stats['endpoints']['search'] == {
+        "statement_timeouts": 1, "client_cancels": 0, "pool_timeouts": 0, "timeout_ms": 3000,
+    }
+
+
+def test_pool_timeout_is_503_with_retry_after(client, monkeypatch):
+    monkeypatch.setattr(Session, 'execute', pool_exhausted)
+    response = client.get('/questions/browse')
+    monkeypatch.undo()
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert client.get('/timeouts/stats').json['endpoints']['browse_questions']['pool_timeouts'] == 1
+
+
+def test_other_database_errors_are_not_mapped(client, monkeypatch):
+    def broken(*args, **kwargs):
+        raise OperationalError('SELECT ...', {}, Exception('disk I/O error'))
+
+    monkeypatch.setattr(Session, 'execute', broken)
+    # Re-raised to Flask's default handling (propagated under TESTING)
+    with pytest.raises(OperationalError, match='disk I/O error'):
+        client.get('/search?q=a')
+
+
+def test_async_path_maps_timeouts_the_same_way(app, monkeypatch):
+    pytest.importorskip('aiosqlite')
+    pytest.importorskip('greenlet')
+    pytest.importorskip('asgiref')
+    httpx = pytest.importorskip('httpx')
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from app.asgi import create_asgi_app
+
+    asgi_app = create_asgi_app()
+
+    async def get(path):
+        transport = httpx.ASGITransport(app=asgi_app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            return await client.get(path)
+
+    async def raise_canceled(*args, **kwargs):
+        canceled()
+
+    async def raise_pool_exhausted(*args, **kwargs):
+        pool_exhausted()
+
+    monkeypatch.setattr(AsyncSession, 'scalars', raise_canceled)
+    response = asyncio.run(get('/search?q=a'))
+    assert response.status_code == 504
+    assert response.json() == {"message": "The database took too long to answer"}
+
+    monkeypatch.setattr(AsyncSession, 'scalars', raise_pool_exhausted)
+    response = asyncio.run(get('/tags'))
+    assert response.status_code == 503
+    assert response.headers['retry-after'] == '1'
+    monkeypatch.undo()
+
+    # The Flask app behind the async path reports both
+    endpoints = asyncio.run(get('/timeouts/stats')).json()['endpoints']
+    assert endpoints['search']['statement_timeouts'] == 1
+    assert endpoints['get_tags']['pool_timeouts'] == 1
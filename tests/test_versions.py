@@ -0,0 +1,30 @@
+import pytest
+
+from conftest import login
+
+
+@pytest.fixture
+def author(client):
+    client.post('/signup', json={'username': 'ada', 'email': 'ada@example.com', 'password': 'secret123'})
+    login(client, 1)
+    client.post('/blogs', json={'title': 'Blog', 'content': 'Body'})
+    client.post('/questions', json={'title': 'Question', 'description': 'Body'})
+    return client
+
+
+@pytest.mark.parametrize('path', ['/blogs/1', '/questions/1'])
+@pytest.mark.parametrize('version', ['1', 1.0, True, None, [1]])
+def test_put_rejects_non_integer_version(author, path, version):
+    response = author.put(path, json={'title': 'Changed', 'version': version})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('path', ['/blogs/1', '/questions/1'])
+def test_put_with_integer_version(author, path):
+    assert author.put(path, json={'title': 'Changed', 'version': 1}).json['version'] == 2
+    assert author.put(path, json={'title': 'Again', 'version': 1}).status_code == 409
+
+
+def test_patch_rejects_boolean_version(author):
+    ops = [{'op': 'replace', 'path': '/title', 'value': 'Changed'}]
+    assert author.patch('/questions/1', json={'version': True, 'ops': ops}).status_code == 400
@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+pytest.importorskip("numpy")
+
+from app import db
+from app.models import VoteEvent, VoteRollup
+from app.votelog import pick_resolution, prune, rollup
+from conftest import login
+
+DAY = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+
+
+def add_events(app, *events):
+    """(target_type, target_id, value, previous, created_at) rows"""
+    with app.app_context():
+        db.session.add_all([
+            VoteEvent(target_type=kind, target_id=target, user_id=1, value=value,
+                      previous=previous, created_at=created)
+            for kind, target, value, previous, created in events
+        ])
+        db.session.commit()
+
+
+def rollups(app, resolution, kind='question', target=1):
+    with app.app_context():
+        return [
+            (r.bucket, r.upvotes, r.downvotes, r.score, r.events)
+            for r in VoteRollup.query.filter_by(resolution=resolution, target_type=kind, target_id=target)
+            .order_by(VoteRollup.bucket)
+        ]
+
+
+def test_rollups_sum_events_per_bucket_across_batches(app):
+    at = lambda h, m, s: DAY + timedelta(hours=h, minutes=m, seconds=s)
+    add_events(
+        app,
+        ('question', 1, 1, 0, at(10, 0, 10)),    # new upvote
+        ('question', 1, -1, 1, at(10, 0, 50)),   # switched to down
+        ('comment', 1, 1, 0, at(10, 0, 55)),
+        ('question', 1, 0, -1, at(10, 1, 5)),    # removed
+        ('question', 1, 1, 0, at(11, 30, 0)),
+        ('question', 1, 1, 0, datetime.utcnow()),  # within the lag, left for later
+    )
+    with app.app_context():
+        assert rollup(batch_size=3) == 3
+        assert rollup(batch_size=3) == 2
+        assert rollup(batch_size=3) == 0
+
+    assert rollups(app, 'minute') == [
+        (at(10, 0, 0), 1, 1, -1, 2),
+        (at(10, 1, 0), 0, 0, 1, 1),
+        (at(11, 30, 0), 1, 0, 1, 1),
+    ]
+    assert rollups(app, 'hour') == [(at(10, 0, 0), 1, 1, 0, 3), (at(11, 0, 0), 1, 0, 1, 1)]
+    assert rollups(app, 'day') == [(DAY, 2, 1, 1, 4)]
+    assert rollups(app, 'day', 'comment') == [(DAY, 1, 0, 1, 1)]
+
+
+def test_prune_keeps_coarse_buckets_and_unrolled_events(app):
+    old = DAY - timedelta(days=100)
+    add_events(app, ('question', 1, 1, 0, old), ('question', 1, -1, 0, DAY - timedelta(days=5)))
+    with app.app_context():
+        rollup()
+        add_events(app, ('question', 2, 1, 0, old))  # logged late, not rolled up yet
+        # minute and hour buckets of both events, plus the rolled-up old event
+        assert prune(minute_days=2, hour_days=90, event_days=30) == 2 + 1 + 1
+        assert VoteEvent.query.count() == 2
+    assert [r[0] for r in rollups(app, 'hour')] == [DAY - timedelta(days=5)]
+    assert len(rollups(app, 'day')) == 2
+
+
+@pytest.mark.parametrize('start_days, span, expected', [
+    (1, timedelta(hours=12), 'minute'),
+    (1, timedelta(hours=13), 'hour'),
+    (3, timedelta(hours=1), 'hour'),     # minute buckets already pruned
+    (40, timedelta(days=31), 'day'),     # too many hour points
+    (100, timedelta(hours=1), 'day'),    # hour buckets already pruned
+])
+def test_pick_resolution(start_days, span, expected):
+    start = datetime.utcnow() - timedelta(days=start_days)
+    assert pick_resolution(start, start + span, minute_days=2, hour_days=90) == expected
+
+
+def test_vote_history_endpoint(app, client):
+    client.post('/signup', json={'username': 'ada', 'email': 'ada@example.com', 'password': 'secret123'})
+    login(client, 1)
+    client.post('/questions', json={'title': 'Question', 'description': 'Body'})
+    client.post('/questions/1/vote', json={'value': 1})
+    client.post('/questions/1/vote', json={'value': -1})
+    with app.app_context():
+        db.session.execute(update(VoteEvent).values(created_at=DAY + timedelta(hours=9)))
+        db.session.commit()
+        rollup()
+
+    start = (DAY + timedelta(hours=8)).isoformat()
+    end = (DAY + timedelta(hours=10)).isoformat()
+    history = client.get(f'/questions/1/vote-history?from={start}Z&to={end}Z').json
+    assert history['resolution'] == 'minute'
+    assert history['points'] == [{
+        'bucket': (DAY + timedelta(hours=9)).isoformat(),
+        'upvotes': 1, 'downvotes': 1, 'score': -1, 'events': 2,
+    }]
+    assert client.get(f'/questions/1/vote-history?from={start}&to={end}&resolution=day').json['points'][0][
+        'bucket'] == DAY.isoformat()
+
+    assert client.get(f'/questions/1/vote-history?from={end}&to={start}').status_code == 400
+    assert client.get('/questions/1/vote-history?from=soon').status_code == 400
+    assert client.get('/questions/1/vote-history?resolution=week').status_code == 400
+    assert client.get('/questions/9/vote-history').status_code == 404
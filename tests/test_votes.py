@@ -0,0 +1,23 @@
+import pytest
+
+from app.votes import check_buffer_mode, server_workers
+
+
+def test_server_workers_reads_flags_and_env():
+    assert server_workers({}, ['gunicorn', 'app:app']) == 1
+    assert server_workers({'WEB_CONCURRENCY': '3'}, ['gunicorn']) == 3
+    assert server_workers({}, ['gunicorn', '-w', '4', 'app:app']) == 4
+    assert server_workers({'WEB_CONCURRENCY': '3'}, ['uvicorn', '--workers=2']) == 2
+
+
+def test_memory_buffer_refuses_several_workers(app, monkeypatch):
+    app.config['VOTE_BUFFER'] = 'memory'
+    monkeypatch.setenv('WEB_CONCURRENCY', '4')
+    with pytest.raises(RuntimeError, match='per-process but 4 workers'):
+        check_buffer_mode(app)
+
+    monkeypatch.setenv('WEB_CONCURRENCY', '1')
+    check_buffer_mode(app)
+    app.config['VOTE_BUFFER'] = 'redis'
+    monkeypatch.setenv('WEB_CONCURRENCY', '4')
+    check_buffer_mode(app)